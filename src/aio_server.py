@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from logger import log
+from message import MessageHandler
+from protocol import INVALID_MESSAGE_ERRORS, FrameDecoder
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def raise_fd_limit():
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class StreamReplier:
+    # Expoe sendall() para que MessageHandler responda pelo StreamWriter
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+
+    def sendall(self, data):
+        self.loop.call_soon_threadsafe(self.writer.write, data)
+
+
+class AsyncPeerServer:
+    def __init__(self, address, port, peer_node, read_limit=64 * 1024):
+        self.address = address
+        self.port = int(port)
+        self.peer_node = peer_node
+        self.read_limit = read_limit
+        self.message_handler = MessageHandler(peer_node)
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+
+    def start(self):
+        raise_fd_limit()
+        threading.Thread(target=self.run, daemon=True).start()
+        self.ready.wait()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(
+                self.handle_client,
+                self.address,
+                self.port,
+                limit=self.read_limit,
+                backlog=1024,
+            )
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        log(f"Servidor asyncio iniciado em {self.address}:{self.port}")
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def handle_client(self, reader, writer):
+        replier = StreamReplier(self.loop, writer)
+        decoder = FrameDecoder(self.read_limit)
+        try:
+            while True:
+                data = await reader.read(self.read_limit)
+                if not data:
+                    break
+                self.peer_node.stats.record_received(len(data))
+                for parts in decoder.feed(data):
+                    # Uma mensagem malformada e descartada sem derrubar a conexao
+                    try:
+                        self.submit(parts, replier)
+                    except INVALID_MESSAGE_ERRORS as e:
+                        log("Mensagem invalida: %s", "WARNING", e)
+        except Exception as e:
+            log(f"Conexao encerrada com erro: {e}")
+        finally:
+            writer.close()
+
+    def submit(self, parts, replier):
+        if parts[3] == "BYE":
+            # O BYE fecha a conexao de saida, esperando o lock que uma thread
+            # de envio segura ate o prazo da escrita
+            self.loop.run_in_executor(None, self.peer_node.dispatcher.submit, parts, replier)
+            return
+        # A fila limitada do dispatcher aplica a politica de descarte; o loop
+        # nunca bloqueia processando mensagens.
+        self.peer_node.dispatcher.submit(parts, replier)
+
+    def close(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.shutdown)
+
+    def shutdown(self):
+        self.server.close()
+        self.loop.stop()
@@ -0,0 +1,59 @@
+# Inicializacao dos vizinhos nas topologias de infra/, com nos reais em
+# 127.0.0.1 e VIZINHOS_TRAVADOS que nunca respondem ao HELLO: um HELLO por vez
+# contra a inicializacao paralela.
+# Uso (a partir de src/): python -m benchmarks.bench_bootstrap [VIZINHOS_TRAVADOS] [PRAZO_HELLO]
+import socket
+import time
+from simulator import bench_args, load_topology, quiet_log, start_nodes, stop_nodes
+
+TOPOLOGIES = ("topologia_arvore_binaria", "topologia_tres_triangulos")
+
+
+def hung_listeners(count):
+    listeners = []
+    for _ in range(count):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(64)
+        listeners.append(sock)
+    return listeners
+
+
+def start_network(graph, hung, concurrency, hello_timeout):
+    nodes = start_nodes(
+        graph,
+        hello_timeout=hello_timeout,
+        bootstrap_concurrency=concurrency,
+        bootstrap_retries=0,
+    )
+    started = time.perf_counter()
+    for number, node in nodes.items():
+        neighbors = [f"127.0.0.1:{nodes[neighbor].port}" for neighbor in graph[number]]
+        neighbors += [f"127.0.0.1:{sock.getsockname()[1]}" for sock in hung]
+        node.bootstrap.start(neighbors)
+    for node in nodes.values():
+        node.bootstrap.wait()
+    elapsed = time.perf_counter() - started
+    return nodes, elapsed
+
+
+def run(hung_count, hello_timeout):
+    hung = hung_listeners(hung_count)
+    for name in TOPOLOGIES:
+        graph = load_topology(name)
+        for concurrency in (1, 8):
+            with quiet_log():
+                nodes, elapsed = start_network(graph, hung, concurrency, hello_timeout)
+                startup = [node.bootstrap.startup_time for node in nodes.values()]
+                connected = sum(node.bootstrap.snapshot()["ok"] for node in nodes.values())
+                stop_nodes(nodes)
+            print(
+                f"{name:28} concorrencia {concurrency}: rede pronta em {elapsed:6.3f}s  "
+                f"por no max {max(startup):6.3f}s  HELLOs aceitos: {connected}"
+            )
+    for sock in hung:
+        sock.close()
+
+
+if __name__ == "__main__":
+    run(*bench_args(2, 0.5))
@@ -0,0 +1,46 @@
+# Trafego economizado pelo CANCEL em buscas com first=1 por uma chave
+# existente e uma ausente, no simulador, sem e com --cancel-searches. KW fica
+# de fora: os caminhantes ja param na consulta seguinte a origem.
+# Uso (a partir de src/): python -m benchmarks.bench_cancel [BUSCAS] [SEMENTE]
+import random
+from simulator import SimulatedNetwork, bench_args, grid_graph, random_graph
+
+GRAPHS = {
+    "grade 10x10": lambda: grid_graph(10, 10),
+    "aleatorio 200": lambda: random_graph(200, 4, random.Random(1)),
+}
+MODES = ("FL", "RW", "BP")
+
+
+def measure(graph, mode, searches, seed, cancel):
+    network = SimulatedNetwork(graph, seed=seed, cancel_searches=cancel)
+    endpoints = sorted(network.nodes)
+    rng = random.Random(seed)
+    found = 0
+    for search in range(searches):
+        # Semente por busca: o CANCEL nao desalinha as buscas seguintes
+        random.seed(f"{seed}-{mode}-{search}")
+        origin, holder = rng.sample(endpoints, 2)
+        record = network.search(origin, [network.keys[holder], "ausente"], mode, first=1)
+        found += bool(record.results)
+    cancels = sum(
+        node.stats.sent.get(("CANCEL", mode), 0) for node in network.nodes.values()
+    )
+    return network.counters["sent"] / searches, cancels / searches, found / searches
+
+
+def run(searches, seed):
+    for name, build in GRAPHS.items():
+        graph = build()
+        for mode in MODES:
+            base, _, base_found = measure(graph, mode, searches, seed, False)
+            total, cancels, found = measure(graph, mode, searches, seed, True)
+            print(
+                f"{name:14} {mode}  mensagens/busca: {base:8.1f} -> {total:8.1f} "
+                f"({total / base - 1:+6.1%}, {cancels:6.1f} CANCEL)  "
+                f"sucesso: {base_found:6.1%} -> {found:6.1%}"
+            )
+
+
+if __name__ == "__main__":
+    run(*bench_args(200, 1))
@@ -0,0 +1,28 @@
+# Mensagens por busca da BP nas topologias de infra/, com 1 e 2 filhos por vez.
+# Uso (a partir de src/): python -m benchmarks.bench_depth_first [BUSCAS] [SEMENTE]
+from simulator import SimulatedNetwork, bench_args, load_topology
+
+TOPOLOGIES = (
+    "topologia_ciclo_3",
+    "topologia_grid3x3",
+    "topologia_tres_triangulos",
+    "topologia_arvore_binaria",
+)
+
+
+def run(searches, seed):
+    for name in TOPOLOGIES:
+        graph = load_topology(name)
+        for branches in (1, 2):
+            network = SimulatedNetwork(graph, seed=seed, depth_branches=branches)
+            result = network.run("BP", searches)
+            print(
+                f"{name:26} filhos {branches}  "
+                f"sucesso: {result['success_rate']:6.1%}  "
+                f"saltos: media {result['mean_hops'] or 0:5.2f}  "
+                f"mensagens/busca: {result['messages_per_search']:6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run(*bench_args(500, 1))
@@ -0,0 +1,85 @@
+# Envio em leque pelas filas de saida para 8 vizinhos reais (sockets locais
+# que descartam o que leem): uma mensagem por escrita contra lotes de ate 64,
+# e um nono vizinho que nunca le, cortado pelo prazo de escrita.
+# Uso (a partir de src/): python -m benchmarks.bench_fanout [N]
+import socket
+import threading
+import time
+import protocol
+from connection_pool import ConnectionPool
+from dispatcher import OutboundQueues
+from simulator import bench_args, quiet_log
+
+NEIGHBORS = 8
+
+
+def sink(server, stalled):
+    while True:
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        if stalled:
+            continue
+        threading.Thread(target=drain, args=(conn,), daemon=True).start()
+
+
+def drain(conn):
+    with conn:
+        while conn.recv(1 << 16):
+            pass
+
+
+def start_sink(stalled=False):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    threading.Thread(target=sink, args=(server, stalled), daemon=True).start()
+    return server, f"127.0.0.1:{server.getsockname()[1]}"
+
+
+def fan_out(number, batch, stalled=False):
+    servers = [start_sink() for _ in range(NEIGHBORS)]
+    neighbors = [neighbor for _, neighbor in servers]
+    slow = start_sink(stalled=True) if stalled else None
+    pool = ConnectionPool(send_timeout=0.5)
+    outbound = OutboundQueues(pool, queue_size=number, batch_size=batch)
+    frames = [
+        protocol.encode_binary(
+            ["127.0.0.1:5000", seq_no, 50, "SEARCH", "FL", 5000, f"chave{seq_no}", 3]
+        )
+        for seq_no in range(number)
+    ]
+    big = b"x" * (1 << 16)
+    started = time.perf_counter()
+    for data in frames:
+        for neighbor in neighbors:
+            outbound.send(neighbor, data)
+        if slow:
+            outbound.send(slow[1], big)
+    for neighbor in neighbors:
+        outbound.queue_for(neighbor).wait_idle(timeout=60)
+    elapsed = time.perf_counter() - started
+    snapshot = outbound.snapshot()
+    p50 = max(snapshot[f"{neighbor} latency_p50_ms"] for neighbor in neighbors)
+    p99 = max(snapshot[f"{neighbor} latency_p99_ms"] for neighbor in neighbors)
+    timeouts = pool.snapshot()["timeouts"]
+    pool.close_all()
+    for server, _ in servers + ([slow] if slow else []):
+        server.close()
+    return number * NEIGHBORS / elapsed, p50, p99, timeouts
+
+
+def run(number):
+    with quiet_log():
+        results = [(f"lote {batch:2}", fan_out(number, batch)) for batch in (1, 64)]
+        results.append(("lote 64 + vizinho parado", fan_out(number, 64, stalled=True)))
+    for name, (rate, p50, p99, timeouts) in results:
+        print(
+            f"{name:25} envios: {rate:10,.0f}/s  latencia na fila (ms) "
+            f"p50 {p50:8.1f} p99 {p99:8.1f}  timeouts: {timeouts}"
+        )
+
+
+if __name__ == "__main__":
+    run(*bench_args(20000))
@@ -0,0 +1,51 @@
+# Vazao de repasse de SEARCH (inundacao) em cada nivel de log, com 4 vizinhos
+# e saida descartada; o log vai para /dev/null.
+# Uso (a partir de src/): python -m benchmarks.bench_logging [N]
+import os
+import tempfile
+import time
+import logger
+from simulator import bench_args, relay_node
+
+NEIGHBORS = [f"127.0.0.1:{5001 + n}" for n in range(4)]
+
+
+def relay(number, repeat=3, **options):
+    # Melhor de `repeat` rodadas; a fila assincrona e esvaziada dentro do
+    # tempo medido
+    best = 0
+    for _ in range(repeat):
+        node = relay_node(NEIGHBORS)
+        messages = [
+            [NEIGHBORS[0], seq_no, 50, "SEARCH", "FL", 5001, f"chave{seq_no}", 3]
+            for seq_no in range(number)
+        ]
+        with open(os.devnull, "w") as devnull:
+            logger.configure(stream=devnull, **options)
+            started = time.perf_counter()
+            for parts in messages:
+                node.message_handler.process_parts(parts, None)
+            logger.shutdown()
+            elapsed = time.perf_counter() - started
+        logger.configure()
+        best = max(best, number / elapsed)
+    return best
+
+
+def run(number):
+    with tempfile.TemporaryDirectory() as directory:
+        events = os.path.join(directory, "eventos.jsonl")
+        cases = [
+            ("DEBUG", {"level": "DEBUG"}),
+            ("DEBUG assincrono", {"level": "DEBUG", "async_output": True}),
+            ("INFO", {"level": "INFO"}),
+            ("WARNING", {"level": "WARNING"}),
+            ("WARNING + eventos 1%", {"level": "WARNING", "event_file": events, "event_sample": 0.01}),
+            ("WARNING + eventos 100%", {"level": "WARNING", "event_file": events, "event_sample": 1}),
+        ]
+        for name, options in cases:
+            print(f"{name:24} {relay(number, **options):10,.0f} SEARCH/s")
+
+
+if __name__ == "__main__":
+    run(*bench_args(20000))
@@ -0,0 +1,40 @@
+# Vazao de codificacao/decodificacao dos formatos texto e binario, pelos
+# mesmos caminhos usados nos nos (encode_text/encode_binary e FrameDecoder).
+# Uso (a partir de src/): python -m benchmarks.bench_protocol [N]
+import timeit
+import protocol
+from simulator import bench_args
+
+SEARCH = ["127.0.0.1:5001", 123456, 99, "SEARCH", "FL", 5003, "ach2147", 7]
+VAL = ["127.0.0.1:5009", 42, 100, "VAL", "FL", "ach2147", "SistemasDistribuidos", 7]
+
+
+def decode(decoder, data):
+    parts = decoder.feed(data)[0]
+    return parts[0], int(parts[1]), int(parts[2]), int(parts[7])
+
+
+def run(number):
+    decoder = protocol.FrameDecoder()
+    cases = []
+    for parts in (SEARCH, VAL):
+        operation = parts[3]
+        text_frame = protocol.encode_text(parts)
+        binary_frame = protocol.encode_binary(parts)
+        print(
+            f"Tamanho {operation}: texto {len(text_frame)} B, "
+            f"binario {len(binary_frame)} B"
+        )
+        cases += [
+            (f"texto   encode {operation}", lambda p=parts: protocol.encode_text(p)),
+            (f"binario encode {operation}", lambda p=parts: protocol.encode_binary(p)),
+            (f"texto   decode {operation}", lambda f=text_frame: decode(decoder, f)),
+            (f"binario decode {operation}", lambda f=binary_frame: decode(decoder, f)),
+        ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=number, repeat=5))
+        print(f"{name}: {number / seconds:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    run(*bench_args(100000))
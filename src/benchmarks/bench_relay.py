@@ -0,0 +1,38 @@
+# Vazao de repasse de SEARCH binario (inundacao) em um no com 8 vizinhos,
+# a partir de quadros ja decodificados e com a saida descartada.
+# Uso (a partir de src/): python -m benchmarks.bench_relay [N]
+import time
+import protocol
+from simulator import bench_args, quiet_log, relay_node
+
+NEIGHBORS = [f"127.0.0.1:{5001 + n}" for n in range(8)]
+
+
+def relay(number, repeat=3):
+    best = 0
+    for _ in range(repeat):
+        node = relay_node(NEIGHBORS)
+        decoder = protocol.FrameDecoder()
+        frames = b"".join(
+            protocol.encode_binary(
+                [NEIGHBORS[0], seq_no, 50, "SEARCH", "FL", 5001, f"chave{seq_no}", 3]
+            )
+            for seq_no in range(number)
+        )
+        messages = decoder.feed(frames)
+        started = time.perf_counter()
+        for parts in messages:
+            node.message_handler.process_parts(parts, None)
+        elapsed = time.perf_counter() - started
+        best = max(best, number / elapsed)
+    return best
+
+
+def run(number):
+    with quiet_log():
+        rate = relay(number)
+    print(f"SEARCH repassados: {rate:,.0f}/s ({rate * (len(NEIGHBORS) - 1):,.0f} envios/s)")
+
+
+if __name__ == "__main__":
+    run(*bench_args(20000))
@@ -0,0 +1,65 @@
+# Respostas VAL diretas e pelo caminho reverso nas topologias de infra/, com
+# nos reais em 127.0.0.1: conexoes TCP abertas e latencia das respostas.
+# Uso (a partir de src/): python -m benchmarks.bench_reply_path [RODADAS]
+import time
+from peer_node import REPLY_MODES
+from search_strategy import FloodingSearchStrategy
+from simulator import bench_args, list_topologies, load_topology, quiet_log, start_nodes, stop_nodes
+
+
+def start_network(graph, reply_mode):
+    nodes = start_nodes(graph, reply_mode=reply_mode)
+    for number, node in nodes.items():
+        node.add_key_value(f"chave{number} valor{number}")
+    for number, neighbors in graph.items():
+        for neighbor in neighbors:
+            if neighbor > number:
+                nodes[number].add_neighbor(f"127.0.0.1:{nodes[neighbor].port}")
+    return nodes
+
+
+def run_searches(nodes, rounds):
+    latencies = []
+    lost = 0
+    for _ in range(rounds):
+        for origin in nodes.values():
+            for number, holder in nodes.items():
+                if holder is origin:
+                    continue
+                strategy = FloodingSearchStrategy(origin)
+                record = origin.start_search(strategy, [f"chave{number}"])
+                if record.wait(2):
+                    latencies.append(record.results[0]["elapsed"])
+                else:
+                    lost += 1
+    return latencies, lost
+
+
+def run(rounds):
+    for name in list_topologies():
+        graph = load_topology(name)
+        for reply_mode in REPLY_MODES:
+            with quiet_log():
+                nodes = start_network(graph, reply_mode)
+                time.sleep(0.1)
+                before = sum(n.connection_pool.counters["misses"] for n in nodes.values())
+                latencies, lost = run_searches(nodes, rounds)
+                for node in nodes.values():
+                    node.outbound.flush(1)
+                opened = (
+                    sum(n.connection_pool.counters["misses"] for n in nodes.values())
+                    - before
+                )
+                stop_nodes(nodes)
+            latencies.sort()
+            median = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            worst = latencies[-1] * 1000 if latencies else 0
+            print(
+                f"{name:28} {reply_mode:8} conexoes abertas: {opened:4}  "
+                f"latencia mediana: {median:6.2f} ms  max: {worst:6.2f} ms  "
+                f"perdidas: {lost}"
+            )
+
+
+if __name__ == "__main__":
+    run(*bench_args(2))
@@ -0,0 +1,30 @@
+# RW/BP com escolha uniforme de vizinho e com --routing-hints, no simulador,
+# com as mesmas buscas (mesma semente).
+# Uso (a partir de src/): python -m benchmarks.bench_routing_hints [BUSCAS] [SEMENTE]
+from simulator import SimulatedNetwork, bench_args, grid_graph, load_topology
+
+GRAPHS = {
+    "topologia_grid3x3": lambda: load_topology("topologia_grid3x3"),
+    "topologia_tres_triangulos": lambda: load_topology("topologia_tres_triangulos"),
+    "grade 10x10": lambda: grid_graph(10, 10),
+}
+
+
+def run(searches, seed):
+    for name, build in GRAPHS.items():
+        graph = build()
+        for mode in ("RW", "BP"):
+            for hints in (False, True):
+                network = SimulatedNetwork(graph, seed=seed, routing_hints=hints)
+                result = network.run(mode, searches)
+                print(
+                    f"{name:26} {mode} {'dicas   ' if hints else 'uniforme'} "
+                    f"sucesso: {result['success_rate']:6.1%}  "
+                    f"saltos: media {result['mean_hops'] or 0:6.2f} "
+                    f"max {result['max_hops'] or 0:4}  "
+                    f"mensagens/busca: {result['messages_per_search']:7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    run(*bench_args(500, 1))
@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger import log
+
+
+class Bootstrapper:
+    # HELLO inicial para os vizinhos do arquivo, em paralelo e com no maximo
+    # `concurrency` apertos de mao simultaneos. Quem falha e tentado de novo
+    # em segundo plano, com espera exponencial, ate `retries` vezes; um HELLO
+    # recebido do proprio vizinho tambem conta como conexao feita.
+    def __init__(self, peer_node, concurrency=8, retries=5, retry_base=1.0, retry_max=30.0):
+        self.peer_node = peer_node
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.executor = None
+        self.futures = set()
+        self.closed = False
+        self.state = {}
+        self.pending = 0
+        self.started = None
+        self.startup_time = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def start(self, neighbors):
+        neighbors = [neighbor for neighbor in dict.fromkeys(neighbors) if neighbor]
+        self.started = time.monotonic()
+        with self.lock:
+            self.pending = len(neighbors)
+            for neighbor in neighbors:
+                self.state[neighbor] = {"status": "pending", "attempts": 0, "rtt": None}
+        if not neighbors:
+            self.finish()
+        for neighbor in neighbors:
+            self.peer_node.neighbors.add(neighbor)
+            log(f"Tentando adicionar vizinho {neighbor}")
+            self.submit(neighbor)
+
+    def submit(self, neighbor):
+        with self.lock:
+            if self.closed:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix="hello"
+                )
+            future = self.executor.submit(self.handshake, neighbor)
+            self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+
+    def handshake(self, neighbor):
+        state = self.state[neighbor]
+        if state["status"] == "ok" and state["attempts"]:
+            return
+        started = time.monotonic()
+        ok = self.peer_node.message_handler.send_hello(neighbor)
+        with self.lock:
+            state["attempts"] += 1
+            first = state["attempts"] == 1
+            if ok:
+                state["status"] = "ok"
+                state["rtt"] = time.monotonic() - started
+            elif state["status"] != "ok":
+                state["status"] = "retrying" if state["attempts"] <= self.retries else "failed"
+            retry = state["status"] == "retrying"
+            attempts = state["attempts"]
+        if first:
+            self.finish_one()
+        if retry and neighbor in self.peer_node.neighbors:
+            delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+            log(f"HELLO para {neighbor} falhou, nova tentativa em {delay:.1f}s")
+            self.peer_node.schedule(delay, self.submit, neighbor)
+        elif state["status"] == "failed":
+            log(f"Desistindo do vizinho {neighbor} apos {attempts} tentativas", "ERROR")
+
+    def connected(self, neighbor):
+        # O vizinho mandou HELLO: nao precisa de mais tentativas
+        with self.lock:
+            state = self.state.get(neighbor)
+            if state is not None:
+                state["status"] = "ok"
+
+    def finish_one(self):
+        with self.lock:
+            self.pending -= 1
+            if self.pending:
+                return
+        self.finish()
+
+    def finish(self):
+        self.startup_time = time.monotonic() - self.started
+        self.done.set()
+        log(f"Inicializacao dos vizinhos concluida em {self.startup_time:.3f}s")
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            executor = self.executor
+            futures = list(self.futures)
+        # shutdown(cancel_futures=True) so existe a partir do Python 3.9
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def snapshot(self):
+        with self.lock:
+            statuses = [state["status"] for state in self.state.values()]
+            rtts = [state["rtt"] for state in self.state.values() if state["rtt"] is not None]
+            snapshot = {
+                status: statuses.count(status)
+                for status in ("ok", "pending", "retrying", "failed")
+            }
+            snapshot["attempts"] = sum(state["attempts"] for state in self.state.values())
+            snapshot["max_rtt"] = max(rtts) if rtts else None
+        snapshot["startup_time"] = self.startup_time
+        return snapshot
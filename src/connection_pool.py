@@ -0,0 +1,171 @@
+import select
+import socket
+import threading
+import time
+
+from logger import log
+
+
+def send_buffers(sock, buffers):
+    # Escrita vetorial: varias mensagens em um unico sendmsg, sem junta-las
+    # antes; o resto de um envio parcial segue com sendall
+    if len(buffers) == 1 or not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+    sent = sock.sendmsg(buffers)
+    if sent < sum(len(buffer) for buffer in buffers):
+        sock.sendall(b"".join(buffers)[sent:])
+
+
+class PooledConnection:
+    def __init__(self, neighbor):
+        self.neighbor = neighbor
+        self.sock = None
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect_timeout=2.0,
+        backoff_base=0.5,
+        backoff_max=30.0,
+        busy_backoff=0.05,
+        send_timeout=5.0,
+    ):
+        self.connect_timeout = connect_timeout
+        # Prazo de cada escrita: um vizinho que parou de ler nao prende a
+        # thread de envio dele para sempre
+        self.send_timeout = send_timeout
+        self.busy_backoff = busy_backoff
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "failures": 0,
+            "skipped": 0,
+            "busy": 0,
+            "timeouts": 0,
+        }
+
+    def send(self, neighbor, *buffers):
+        conn = self.get_connection(neighbor)
+        with conn.lock:
+            if conn.sock is not None and not self.read_replies(conn):
+                self.close_connection(conn)
+
+            if conn.sock is not None:
+                self.count("hits")
+                try:
+                    send_buffers(conn.sock, buffers)
+                    return True
+                except socket.timeout:
+                    # Escrita pela metade: a conexao nao serve mais e o
+                    # vizinho fica em espera como se a conexao tivesse falhado
+                    self.close_connection(conn)
+                    self.record_failure(conn)
+                    self.count("timeouts")
+                    raise
+                except OSError:
+                    # O vizinho fechou a conexao desde o ultimo envio
+                    self.close_connection(conn)
+
+            if time.monotonic() < conn.retry_at:
+                self.count("skipped")
+                raise ConnectionError(
+                    f"Vizinho {neighbor} indisponivel, aguardando nova tentativa"
+                )
+
+            self.count("misses")
+            try:
+                conn.sock = self.connect(neighbor)
+                send_buffers(conn.sock, buffers)
+            except OSError:
+                self.close_connection(conn)
+                self.record_failure(conn)
+                raise
+
+            conn.failures = 0
+            conn.retry_at = 0.0
+            return True
+
+    def get_connection(self, neighbor):
+        with self.lock:
+            conn = self.connections.get(neighbor)
+            if conn is None:
+                conn = PooledConnection(neighbor)
+                self.connections[neighbor] = conn
+            return conn
+
+    def connect(self, neighbor):
+        neighbor_address, neighbor_port = neighbor.split(":")
+        sock = socket.create_connection(
+            (neighbor_address, int(neighbor_port)), timeout=self.connect_timeout
+        )
+        sock.settimeout(self.send_timeout or None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        log(f"Conexao persistente aberta para {neighbor}")
+        return sock
+
+    def read_replies(self, conn):
+        # O unico dado esperado nas conexoes de saida e um BUSY do vizinho
+        # sobrecarregado. Retorna False se a conexao foi encerrada.
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+            if not readable:
+                return True
+            data = conn.sock.recv(4096)
+        except (OSError, ValueError):
+            return False
+        if not data:
+            return False
+        busy = data.count(b" BUSY")
+        if busy:
+            self.count("busy", busy)
+            time.sleep(self.busy_backoff)
+        return True
+
+    def record_failure(self, conn):
+        conn.failures += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (conn.failures - 1))
+        conn.retry_at = time.monotonic() + delay
+        self.count("failures")
+
+    def close_connection(self, conn):
+        if conn.sock is not None:
+            try:
+                conn.sock.close()
+            except OSError:
+                pass
+            conn.sock = None
+
+    def drop(self, neighbor):
+        with self.lock:
+            conn = self.connections.pop(neighbor, None)
+        if conn is not None:
+            with conn.lock:
+                self.close_connection(conn)
+            log(f"Conexao persistente com {neighbor} encerrada")
+
+    def close_all(self):
+        with self.lock:
+            neighbors = list(self.connections)
+        for neighbor in neighbors:
+            self.drop(neighbor)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot["open"] = sum(
+                1 for conn in self.connections.values() if conn.sock is not None
+            )
+        return snapshot
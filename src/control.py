@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from logger import log
+from metrics import PrometheusWriter
+from protocol import MAX_BATCH_SIZE, encode_keys
+from search_strategy import STRATEGIES
+
+MAX_WAIT = 30.0
+
+
+class ControlError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def positive_int(value, name):
+    # Campo opcional de uma busca: None usa o padrao do no
+    if value is None:
+        return None
+    value = int(value)
+    if value < 1:
+        raise ControlError(f"{name} deve ser positivo")
+    return value
+
+
+class ControlServer:
+    # API HTTP/JSON local para operar o no sem o menu interativo:
+    #   POST /search    {"searches": [{"key": ..., "mode": "FL", "ttl": 10}]}
+    #                   ou {"keys": [...], "mode": "FL"} -> {"request_ids": [...]}
+    #                   com "batch": true (ou "keys" dentro de uma busca), as
+    #                   chaves seguem juntas em um unico MSEARCH
+    #                   -> {"request_ids": [id]}
+    #                   cada busca aceita "deadline" (s) e "first" (encerra
+    #                   no first-esimo resultado)
+    #   GET  /search?ids=1,2&wait=2  resultados das buscas (espera ate wait s)
+    #   GET  /neighbors, GET /stats, GET /ttl, POST /ttl {"ttl": 50}
+    #   GET  /metrics   metricas no formato texto do Prometheus
+    # A API nao tem autenticacao: quem alcanca o endereco controla o no. Por
+    # isso ela escuta so em 127.0.0.1, a menos que --control-address diga outro.
+    def __init__(self, peer_node, address="127.0.0.1", port=0):
+        self.peer_node = peer_node
+        self.address = address
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.address, self.port), ControlRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.peer_node = self.peer_node
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        log(f"API de controle em http://{self.address}:{self.port}")
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch(
+            {
+                "/neighbors": self.get_neighbors,
+                "/stats": self.get_stats,
+                "/ttl": self.get_ttl,
+                "/search": self.get_search,
+                "/metrics": self.get_metrics,
+            }
+        )
+
+    def do_POST(self):
+        self.dispatch({"/ttl": self.post_ttl, "/search": self.post_search})
+
+    def dispatch(self, routes):
+        url = urlparse(self.path)
+        route = routes.get(url.path)
+        try:
+            if route is None:
+                raise ControlError(f"Rota desconhecida: {url.path}", 404)
+            status, body = route(parse_qs(url.query))
+        except ControlError as e:
+            status, body = e.status, {"error": str(e)}
+        except (ValueError, TypeError, KeyError) as e:
+            status, body = 400, {"error": f"Requisicao invalida: {e}"}
+        self.reply(status, body)
+
+    def reply(self, status, body):
+        content_type = "application/json"
+        if isinstance(body, str):
+            data = body.encode()
+            content_type = PrometheusWriter.CONTENT_TYPE
+        else:
+            data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ControlError("O corpo da requisicao deve ser um objeto JSON")
+        return body
+
+    @property
+    def peer_node(self):
+        return self.server.peer_node
+
+    def get_neighbors(self, query):
+        return 200, {"neighbors": list(self.peer_node.neighbors)}
+
+    def get_stats(self, query):
+        return 200, self.peer_node.stats.snapshot()
+
+    def get_metrics(self, query):
+        return 200, self.peer_node.stats.prometheus()
+
+    def get_ttl(self, query):
+        return 200, {"ttl": self.peer_node.ttl_default}
+
+    def post_ttl(self, query):
+        ttl = int(self.read_json()["ttl"])
+        if ttl < 1:
+            raise ControlError("TTL deve ser positivo")
+        self.peer_node.ttl_default = ttl
+        return 200, {"ttl": ttl}
+
+    def post_search(self, query):
+        body = self.read_json()
+        searches = body.get("searches")
+        if not searches and body.get("batch"):
+            searches = [body]
+        elif not searches:
+            if not isinstance(body.get("keys", []), list):
+                raise ControlError('"keys" deve ser uma lista')
+            searches = [
+                {"key": key, "mode": body.get("mode", "FL"), "ttl": body.get("ttl")}
+                for key in body.get("keys", [])
+            ]
+        if not searches:
+            raise ControlError("Nenhuma busca informada")
+        if not isinstance(searches, list) or not all(isinstance(s, dict) for s in searches):
+            raise ControlError('"searches" deve ser uma lista de objetos')
+        # Tudo e validado e convertido antes de iniciar qualquer busca
+        launches = []
+        for search in searches:
+            if not isinstance(search.get("keys", []), list):
+                raise ControlError('"keys" deve ser uma lista')
+            # O MSEARCH leva todas as chaves em um unico quadro
+            if len(encode_keys(str(key) for key in search.get("keys", []))) > MAX_BATCH_SIZE:
+                raise ControlError("Lote de chaves grande demais para uma mensagem")
+            if search.get("mode", "FL") not in STRATEGIES:
+                raise ControlError(f"Modo de busca invalido: {search['mode']}")
+            keys = [str(key) for key in search.get("keys") or [search["key"]]]
+            deadline = search.get("deadline", body.get("deadline"))
+            if deadline is not None:
+                deadline = float(deadline)
+                if deadline < 0:
+                    raise ControlError("deadline nao pode ser negativo")
+            launches.append(
+                (
+                    search.get("mode", "FL"),
+                    keys,
+                    positive_int(search.get("ttl"), "ttl"),
+                    deadline,
+                    positive_int(search.get("first", body.get("first")), "first"),
+                )
+            )
+
+        request_ids = []
+        for mode, keys, ttl, deadline, first in launches:
+            strategy = STRATEGIES[mode](self.peer_node, batched=len(keys) > 1)
+            record = self.peer_node.start_search(strategy, keys, ttl, deadline, first)
+            request_ids.append(record.seq_no)
+        return 202, {"request_ids": request_ids}
+
+    def get_search(self, query):
+        ids = [int(i) for value in query.get("ids", []) for i in value.split(",") if i]
+        wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT)
+        deadline = time.monotonic() + wait
+        results = []
+        for seq_no in ids:
+            record = self.peer_node.searches.get(seq_no)
+            if record is None:
+                results.append({"request_id": seq_no, "status": "unknown"})
+                continue
+            record.wait(max(0.0, deadline - time.monotonic()))
+            results.append(record.to_dict())
+        return 200, {"searches": results}
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,197 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from node_state import StripedLock
+
+
+class ExpiringDict:
+    # Dicionario limitado por tamanho e por tempo de vida. Como todas as
+    # entradas tem o mesmo TTL e sao movidas para o fim ao serem gravadas, a
+    # mais antiga esta sempre no inicio da OrderedDict.
+    def __init__(self, max_entries=100000, ttl=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.evictions = {"ttl": 0, "size": 0}
+
+    def __setitem__(self, key, value):
+        now = self.clock()
+        self.entries[key] = (now + self.ttl, value)
+        self.entries.move_to_end(key)
+        self.expire(now)
+
+    def __getitem__(self, key):
+        item = self.entries[key]
+        if item[0] <= self.clock():
+            self.expire()
+            raise KeyError(key)
+        return item[1]
+
+    def __contains__(self, key):
+        item = self.entries.get(key)
+        return item is not None and item[0] > self.clock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=None):
+        item = self.entries.pop(key, None)
+        return default if item is None else item[1]
+
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        while self.entries:
+            key, (expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now:
+                break
+            del self.entries[key]
+            self.evictions["ttl"] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions["size"] += 1
+
+    def memory_usage(self):
+        size = sys.getsizeof(self.entries)
+        for key, item in self.entries.items():
+            size += sys.getsizeof(key) + sys.getsizeof(item)
+            if isinstance(key, tuple):
+                size += sum(sys.getsizeof(field) for field in key)
+        return size
+
+    def snapshot(self):
+        return {
+            "entries": len(self.entries),
+            "memory_bytes": self.memory_usage(),
+            "evicted_ttl": self.evictions["ttl"],
+            "evicted_size": self.evictions["size"],
+        }
+
+
+class StripedExpiringDict:
+    # ExpiringDict dividida em faixas, cada uma com seu proprio lock, para que
+    # threads tratando mensagens diferentes nao disputem o mesmo lock.
+    def __init__(self, max_entries=100000, ttl=300.0, stripes=16, clock=time.monotonic):
+        stripes = max(1, min(stripes, max_entries))
+        self.locks = StripedLock(stripes)
+        self.shards = [
+            ExpiringDict(max(1, max_entries // stripes), ttl, clock)
+            for _ in range(stripes)
+        ]
+
+    def lock_for(self, key):
+        return self.locks.lock_for(key)
+
+    def shard(self, key):
+        return self.shards[self.locks.index(key)]
+
+    def __setitem__(self, key, value):
+        with self.lock_for(key):
+            self.shard(key)[key] = value
+
+    def __getitem__(self, key):
+        with self.lock_for(key):
+            return self.shard(key)[key]
+
+    def __contains__(self, key):
+        with self.lock_for(key):
+            return key in self.shard(key)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def get(self, key, default=None):
+        with self.lock_for(key):
+            return self.shard(key).get(key, default)
+
+    def pop(self, key, default=None):
+        with self.lock_for(key):
+            return self.shard(key).pop(key, default)
+
+    def snapshot(self):
+        totals = {}
+        for lock, shard in zip(self.locks.locks, self.shards):
+            with lock:
+                for name, value in shard.snapshot().items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+
+class DedupCache:
+    # Supressao de duplicatas por (origem, seq_no). Com window, guarda por
+    # origem apenas o maior seq_no visto e um bitmap dos window anteriores;
+    # mensagens mais antigas que a janela sao tratadas como repetidas.
+    def __init__(
+        self, max_entries=100000, ttl=300.0, window=None, stripes=16, clock=time.monotonic
+    ):
+        self.window = window
+        self.entries = StripedExpiringDict(max_entries, ttl, stripes, clock)
+        self.stale = 0
+        self.duplicates = 0
+        self.counter_lock = threading.Lock()
+
+    def check_and_add(self, msg_id):
+        if self.window:
+            with self.entries.lock_for(msg_id[0]):
+                seen = self.check_window(*msg_id)
+        else:
+            with self.entries.lock_for(msg_id):
+                seen = msg_id in self.entries
+                if not seen:
+                    self.entries[msg_id] = True
+        if seen:
+            with self.counter_lock:
+                self.duplicates += 1
+        return seen
+
+    def check_window(self, origin, seq_no):
+        seq_no = int(seq_no)
+        state = self.entries.get(origin)
+        if state is None:
+            self.entries[origin] = (seq_no, 1)
+            return False
+
+        highest, mask = state
+        if seq_no > highest:
+            shift = seq_no - highest
+            mask = (mask << shift | 1) & ((1 << self.window) - 1) if shift < self.window else 1
+            self.entries[origin] = (seq_no, mask)
+            return False
+
+        offset = highest - seq_no
+        if offset >= self.window:
+            with self.counter_lock:
+                self.stale += 1
+            return True
+        if mask >> offset & 1:
+            return True
+        self.entries[origin] = (highest, mask | 1 << offset)
+        return False
+
+    def __contains__(self, msg_id):
+        if not self.window:
+            return msg_id in self.entries
+        origin, seq_no = msg_id
+        state = self.entries.get(origin)
+        if state is None:
+            return False
+        offset = state[0] - int(seq_no)
+        return offset >= self.window or (offset >= 0 and bool(state[1] >> offset & 1))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def snapshot(self):
+        snapshot = self.entries.snapshot()
+        snapshot["duplicates"] = self.duplicates
+        if self.window:
+            snapshot["window"] = self.window
+            snapshot["stale"] = self.stale
+        return snapshot
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import math
+import threading
+from protocol import MAX_DIGEST_BITS
+
+
+class BloomFilter:
+    def __init__(self, size, hashes):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate, max_size=MAX_DIGEST_BITS):
+        # m = -n ln p / (ln 2)^2 bits e k = m/n ln 2 funcoes de hash; acima de
+        # max_size bits o filtro fica no limite e a taxa de falsos positivos
+        # sobe
+        capacity = max(capacity, 1)
+        size = min(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2), max_size)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def positions(self, key):
+        # Hash duplo sobre blake2b: estavel entre processos, ao contrario de hash()
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] >> (p & 7) & 1 for p in self.positions(key))
+
+    def false_positive_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def encode(self):
+        data = base64.b64encode(bytes(self.bits)).decode()
+        return f"{self.size}:{self.hashes}:{self.count}:{data}"
+
+    @classmethod
+    def decode(cls, text):
+        size, hashes, count, data = text.split(":", 3)
+        bloom = cls(int(size), int(hashes))
+        bits = base64.b64decode(data)
+        if len(bits) != len(bloom.bits):
+            raise ValueError("Tamanho do filtro nao confere")
+        bloom.bits[:] = bits
+        bloom.count = int(count)
+        return bloom
+
+
+class KeyDigests:
+    # Filtro de Bloom das chaves locais, enviado aos vizinhos no HELLO e em
+    # mensagens DIGEST, e os filtros recebidos de cada vizinho. O filtro
+    # local nunca passa de max_bits: com mais chaves ele para de crescer e a
+    # taxa de falsos positivos sobe (fp_rate_estimated no snapshot).
+    def __init__(self, capacity=1024, fp_rate=0.01, max_bits=MAX_DIGEST_BITS):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.max_bits = max_bits
+        self.local = BloomFilter.for_capacity(capacity, fp_rate, max_bits)
+        self.neighbors = {}
+        self.lock = threading.Lock()
+        self.counters = {"received": 0, "published": 0, "routed": 0, "invalid": 0}
+
+    def add_local(self, key, keys):
+        with self.lock:
+            if self.local.count >= self.capacity and self.local.size < self.max_bits:
+                # Filtro cheio: reconstroi com o dobro da capacidade para
+                # manter a taxa de falsos positivos configurada
+                self.capacity *= 2
+                self.local = BloomFilter.for_capacity(self.capacity, self.fp_rate, self.max_bits)
+                for existing in keys:
+                    self.local.add(existing)
+            else:
+                self.local.add(key)
+
+    def rebuild(self, keys, count):
+        with self.lock:
+            # No limite de bits, o numero de hashes sai da quantidade real de
+            # chaves, o que minimiza os falsos positivos para aquele tamanho
+            self.capacity = max(self.capacity, count)
+            self.local = BloomFilter.for_capacity(self.capacity, self.fp_rate, self.max_bits)
+            for key in keys:
+                self.local.add(key)
+
+    def encode(self):
+        with self.lock:
+            self.counters["published"] += 1
+            return self.local.encode()
+
+    def update(self, neighbor, text):
+        try:
+            bloom = BloomFilter.decode(text)
+        except (ValueError, TypeError) as e:
+            with self.lock:
+                self.counters["invalid"] += 1
+            raise ValueError(f"Resumo de chaves invalido de {neighbor}: {e}")
+        with self.lock:
+            self.neighbors[neighbor] = bloom
+            self.counters["received"] += 1
+
+    def drop(self, neighbor):
+        with self.lock:
+            self.neighbors.pop(neighbor, None)
+
+    def matches(self, key, candidates):
+        with self.lock:
+            digests = [(neighbor, self.neighbors.get(neighbor)) for neighbor in candidates]
+        return [neighbor for neighbor, bloom in digests if bloom is not None and key in bloom]
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot["bits"] = self.local.size
+            snapshot["hashes"] = self.local.hashes
+            snapshot["keys"] = self.local.count
+            snapshot["fp_rate"] = self.fp_rate
+            snapshot["fp_rate_estimated"] = self.local.false_positive_rate()
+            snapshot["neighbor_digests"] = len(self.neighbors)
+        return snapshot
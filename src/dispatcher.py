@@ -0,0 +1,239 @@
+import threading
+import time
+from collections import deque
+from logger import log
+from metrics import Summary
+
+SHED_POLICIES = ("drop_oldest", "reject")
+# HELLO, BYE e CANCEL sao baratos e nao podem ser descartados; so buscas e
+# respostas passam pela fila. O CANCEL, tratado na hora, passa na frente das
+# buscas ainda enfileiradas.
+QUEUED_OPERATIONS = ("SEARCH", "VAL", "MSEARCH", "MVAL", "CHECK", "WALK")
+
+
+class BoundedQueue:
+    def __init__(self, maxsize=1024, policy="drop_oldest"):
+        if policy not in SHED_POLICIES:
+            raise ValueError(f"Politica de descarte invalida: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.high_watermark = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.condition:
+            if self.closed:
+                return False
+            if len(self.items) >= self.maxsize:
+                if self.policy == "reject":
+                    self.rejected += 1
+                    return False
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.high_watermark = max(self.high_watermark, len(self.items))
+            self.condition.notify()
+            return True
+
+    def get(self):
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+            self.in_flight += 1
+            return self.items.popleft()
+
+    def get_batch(self, limit):
+        # Retira de uma vez tudo o que estiver na fila, ate limit itens; lista
+        # vazia quando a fila foi fechada
+        with self.condition:
+            while not self.items and not self.closed:
+                self.condition.wait()
+            batch = [self.items.popleft() for _ in range(min(limit, len(self.items)))]
+            self.in_flight += len(batch)
+            return batch
+
+    def task_done(self, count=1):
+        with self.condition:
+            self.in_flight -= count
+            self.condition.notify_all()
+
+    def clear(self):
+        with self.condition:
+            self.dropped += len(self.items)
+            self.items.clear()
+
+    def close(self):
+        # Descarta o que falta e acorda quem espera em get_batch
+        with self.condition:
+            self.closed = True
+            self.dropped += len(self.items)
+            self.items.clear()
+            self.condition.notify_all()
+
+    def wait_idle(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: not self.items and not self.in_flight, timeout
+            )
+
+    def __len__(self):
+        return len(self.items)
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                "depth": len(self.items),
+                "max_depth": self.high_watermark,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+            }
+
+
+class InboundDispatcher:
+    def __init__(self, peer_node, workers=8, queue_size=1024, policy="drop_oldest"):
+        self.peer_node = peer_node
+        self.workers = workers
+        self.queue = BoundedQueue(queue_size, policy)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.processed = 0
+
+    def start(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(target=self.run, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, parts, client_socket):
+        if parts[3] not in QUEUED_OPERATIONS:
+            self.peer_node.message_handler.process_parts(parts, client_socket)
+            return True
+        if not self.threads:
+            self.start()
+        if self.queue.put((parts, client_socket)):
+            return True
+        self.reply_busy(client_socket)
+        return False
+
+    def reply_busy(self, client_socket):
+        message = (
+            f"{self.peer_node.address}:{self.peer_node.port} "
+            f"{self.peer_node.next_sequence_number()} 1 BUSY\n"
+        )
+        try:
+            client_socket.sendall(message.encode())
+        except OSError as e:
+            log("Erro ao responder BUSY: %s", "WARNING", e)
+
+    def run(self):
+        while True:
+            parts, client_socket = self.queue.get()
+            try:
+                self.peer_node.message_handler.process_parts(parts, client_socket)
+            except Exception as e:
+                log(f"Erro ao processar mensagem: {e}", "ERROR")
+            finally:
+                with self.lock:
+                    self.processed += 1
+                self.queue.task_done()
+
+    def snapshot(self):
+        snapshot = self.queue.snapshot()
+        snapshot["workers"] = len(self.threads)
+        snapshot["processed"] = self.processed
+        return snapshot
+
+
+class OutboundQueues:
+    # Uma fila e uma thread de envio por vizinho: um vizinho lento so atrasa
+    # as mensagens destinadas a ele. A thread junta o que se acumulou na fila
+    # (ate batch_size mensagens) em uma unica escrita e mede, por vizinho, o
+    # tempo de cada mensagem da entrada na fila ate o fim da escrita. drop()
+    # fecha a fila e encerra a thread do vizinho que saiu.
+    def __init__(self, connection_pool, queue_size=1024, policy="drop_oldest", batch_size=64):
+        self.connection_pool = connection_pool
+        self.queue_size = queue_size
+        self.policy = policy
+        self.batch_size = batch_size
+        self.queues = {}
+        self.latencies = {}
+        # Descartes das filas ja encerradas, para os totais nao voltarem atras
+        self.retired = {"dropped": 0, "rejected": 0}
+        self.lock = threading.Lock()
+
+    def send(self, neighbor, data):
+        return self.queue_for(neighbor).put((data, time.monotonic()))
+
+    def queue_for(self, neighbor):
+        with self.lock:
+            queue = self.queues.get(neighbor)
+            if queue is None:
+                queue = BoundedQueue(self.queue_size, self.policy)
+                latency = Summary()
+                self.queues[neighbor] = queue
+                self.latencies[neighbor] = latency
+                threading.Thread(
+                    target=self.run, args=(neighbor, queue, latency), daemon=True
+                ).start()
+            return queue
+
+    def run(self, neighbor, queue, latency):
+        while True:
+            batch = queue.get_batch(self.batch_size)
+            if not batch:
+                return
+            try:
+                self.connection_pool.send(neighbor, *(data for data, _ in batch))
+                done = time.monotonic()
+                with self.lock:
+                    for _, queued_at in batch:
+                        latency.add((done - queued_at) * 1e6)
+            except Exception as e:
+                log(
+                    "Erro ao enviar %d mensagem(ns) para %s: %s", "WARNING", len(batch), neighbor, e
+                )
+            finally:
+                queue.task_done(len(batch))
+
+    def drop(self, neighbor):
+        with self.lock:
+            queue = self.queues.pop(neighbor, None)
+            self.latencies.pop(neighbor, None)
+        if queue is not None:
+            queue.close()
+            values = queue.snapshot()
+            with self.lock:
+                self.retired["dropped"] += values["dropped"]
+                self.retired["rejected"] += values["rejected"]
+
+    def flush(self, timeout=None):
+        with self.lock:
+            queues = list(self.queues.values())
+        return all(queue.wait_idle(timeout) for queue in queues)
+
+    def snapshot(self):
+        with self.lock:
+            queues = dict(self.queues)
+            latencies = {
+                neighbor: latency.snapshot(scale=1e-3)
+                for neighbor, latency in self.latencies.items()
+            }
+            snapshot = {"depth": 0, **self.retired}
+        for neighbor, queue in queues.items():
+            values = queue.snapshot()
+            snapshot["depth"] += values["depth"]
+            snapshot["dropped"] += values["dropped"]
+            snapshot["rejected"] += values["rejected"]
+            snapshot[f"{neighbor} depth"] = values["depth"]
+            latency = latencies.get(neighbor)
+            if latency and latency["count"]:
+                snapshot[f"{neighbor} sent"] = latency["count"]
+                for name in ("p50", "p99", "max"):
+                    snapshot[f"{neighbor} latency_{name}_ms"] = latency[name]
+        return snapshot
@@ -0,0 +1,141 @@
+import threading
+import time
+from logger import log
+
+
+class Liveness:
+    # Batimentos entre vizinhos: a cada `interval` segundos manda PING pelas
+    # conexoes do pool para cada vizinho e espera o PONG por `timeout`
+    # segundos. Depois de `threshold` PINGs seguidos sem resposta o vizinho
+    # sai da lista (as buscas deixam de usa-lo), mas continua recebendo
+    # PING; o primeiro PONG (ou HELLO) o readmite.
+    def __init__(self, peer_node, interval=5.0, timeout=2.0, threshold=3, clock=time.monotonic):
+        self.peer_node = peer_node
+        self.interval = interval
+        self.timeout = timeout
+        self.threshold = threshold
+        self.clock = clock
+        self.state = {}
+        self.evicted = set()
+        self.running = False
+        self.lock = threading.Lock()
+        self.counters = {"pings": 0, "pongs": 0, "misses": 0, "evicted": 0, "readmitted": 0}
+
+    def start(self):
+        self.running = True
+        self.peer_node.schedule(self.interval, self.tick)
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        if not self.running:
+            return
+        self.ping_all()
+        self.peer_node.schedule(self.timeout, self.check)
+        self.peer_node.schedule(self.interval, self.tick)
+
+    def neighbor_state(self, neighbor):
+        state = self.state.get(neighbor)
+        if state is None:
+            state = self.state[neighbor] = {
+                "rtt": None,
+                "last_rtt": None,
+                "failures": 0,
+                "misses": 0,
+                "pending": {},
+            }
+        return state
+
+    def ping_all(self):
+        with self.lock:
+            targets = list(self.peer_node.neighbors) + sorted(self.evicted)
+        for neighbor in targets:
+            self.ping(neighbor)
+
+    def ping(self, neighbor):
+        seq_no = self.peer_node.next_sequence_number()
+        with self.lock:
+            self.neighbor_state(neighbor)["pending"][seq_no] = self.clock()
+            self.counters["pings"] += 1
+        self.peer_node.message_handler.send_message(
+            f"{self.peer_node.address}:{self.peer_node.port} {seq_no} 1 PING\n", neighbor
+        )
+
+    def check(self):
+        # PINGs sem PONG ha mais de `timeout` segundos contam como falha
+        now = self.clock()
+        evict = []
+        with self.lock:
+            for neighbor, state in self.state.items():
+                expired = [seq for seq, sent in state["pending"].items() if now - sent >= self.timeout]
+                for seq in expired:
+                    del state["pending"][seq]
+                if not expired:
+                    continue
+                state["failures"] += len(expired)
+                state["misses"] += len(expired)
+                self.counters["misses"] += len(expired)
+                if state["failures"] >= self.threshold and neighbor not in self.evicted:
+                    evict.append(neighbor)
+        for neighbor in evict:
+            self.evict(neighbor)
+
+    def evict(self, neighbor):
+        if not self.peer_node.neighbors.discard(neighbor):
+            return
+        with self.lock:
+            self.evicted.add(neighbor)
+            self.counters["evicted"] += 1
+        # Mensagens enfileiradas para um vizinho morto so gastariam tempo
+        self.peer_node.outbound.drop(neighbor)
+        self.peer_node.connection_pool.drop(neighbor)
+        log(f"Vizinho {neighbor} sem resposta a {self.threshold} PINGs, removido", "ERROR")
+
+    def pong(self, neighbor, seq_no):
+        now = self.clock()
+        with self.lock:
+            state = self.state.get(neighbor)
+            if state is None or seq_no not in state["pending"]:
+                return
+            rtt = now - state["pending"].pop(seq_no)
+            state["last_rtt"] = rtt
+            # Media movel exponencial, como o SRTT do TCP
+            state["rtt"] = rtt if state["rtt"] is None else 0.875 * state["rtt"] + 0.125 * rtt
+            state["failures"] = 0
+            self.counters["pongs"] += 1
+        self.alive(neighbor)
+
+    def alive(self, neighbor):
+        with self.lock:
+            if neighbor not in self.evicted:
+                return
+            self.evicted.discard(neighbor)
+            self.counters["readmitted"] += 1
+            self.neighbor_state(neighbor)["failures"] = 0
+        self.peer_node.neighbors.add(neighbor)
+        log(f"Vizinho {neighbor} voltou a responder, readmitido")
+
+    def forget(self, neighbor):
+        # BYE: o vizinho saiu de proposito, nao ha o que readmitir
+        with self.lock:
+            self.evicted.discard(neighbor)
+            self.state.pop(neighbor, None)
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot["evicted_neighbors"] = sorted(self.evicted)
+            snapshot["neighbors"] = {
+                neighbor: {
+                    "rtt_ms": state["rtt"] * 1000 if state["rtt"] is not None else None,
+                    "last_rtt_ms": (
+                        state["last_rtt"] * 1000 if state["last_rtt"] is not None else None
+                    ),
+                    "failures": state["failures"],
+                    "misses": state["misses"],
+                    "alive": neighbor not in self.evicted,
+                }
+                for neighbor, state in self.state.items()
+            }
+        return snapshot
@@ -0,0 +1,138 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import zlib
+
+node_name = "-"
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+FORMAT = "[%(asctime)s] [%(node)s] [%(levelname)s]: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+logger = logging.getLogger("p2p")
+logger.propagate = False
+# Eventos estruturados (uma linha JSON por mensagem) para rastrear buscas
+events = logging.getLogger("p2p.events")
+events.propagate = False
+listeners = []
+# Limiar de amostragem dos eventos sobre o crc32 de (origem, seq_no); 0 desliga
+event_threshold = 0
+
+
+class NodeFilter(logging.Filter):
+    def filter(self, record):
+        record.node = node_name
+        return True
+
+
+class StdoutHandler(logging.StreamHandler):
+    # Resolve sys.stdout a cada escrita, para redirect_stdout e a captura de
+    # saida dos testes continuarem funcionando
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # O QueueHandler padrao formata a mensagem antes de enfileirar; aqui a
+    # formatacao fica toda na thread do QueueListener. Os argumentos nao
+    # podem ser alterados depois da chamada de log.
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, default=str)
+
+
+def attach(target, handler, async_output):
+    target.handlers.clear()
+    if not async_output:
+        target.addHandler(handler)
+        return
+    records = queue.SimpleQueue()
+    target.addHandler(DeferredQueueHandler(records))
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    listeners.append(listener)
+
+
+def configure(level="INFO", stream=None, async_output=False, event_file=None, event_sample=1.0):
+    # level: DEBUG mostra cada mensagem recebida e enviada; INFO so eventos
+    # do no (vizinhos, resultados); WARNING/ERROR quase nada.
+    global event_threshold
+    shutdown()
+    handler = StdoutHandler() if stream is None else logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(FORMAT, DATE_FORMAT))
+    logger.setLevel(level.upper())
+    attach(logger, handler, async_output)
+
+    event_threshold = 0
+    events.handlers.clear()
+    if event_file:
+        if event_file == "-":
+            event_handler = logging.StreamHandler(sys.stdout)
+        else:
+            event_handler = logging.FileHandler(event_file)
+        event_handler.setFormatter(JsonFormatter())
+        events.setLevel(logging.INFO)
+        attach(events, event_handler, async_output)
+        event_threshold = int(min(max(event_sample, 0.0), 1.0) * 2**32)
+
+
+def shutdown():
+    # Esvazia as filas dos handlers assincronos
+    while listeners:
+        listeners.pop().stop()
+
+
+def set_node_name(address, port):
+    global node_name
+    node_name = f"{address}:{port}"
+
+
+def log(message, prefix="INFO", *args):
+    logger.log(logging.getLevelName(prefix.upper()), message, *args)
+
+
+def debug(message, *args):
+    logger.debug(message, *args)
+
+
+def enabled(prefix="DEBUG"):
+    return logger.isEnabledFor(logging.getLevelName(prefix))
+
+
+def tracing():
+    return event_threshold > 0
+
+
+def sampled(origin, seq_no):
+    # Amostragem pela busca, nao pela mensagem: todos os nos com a mesma
+    # taxa registram (ou nao) todos os eventos da mesma busca
+    return zlib.crc32(f"{origin}/{seq_no}".encode()) < event_threshold
+
+
+def event(kind, origin, seq_no, **fields):
+    record = {
+        "ts": time.time(),
+        "node": node_name,
+        "event": kind,
+        "origin": origin,
+        "seq": int(seq_no),
+    }
+    record.update(fields)
+    events.info(record)
+
+
+logger.addFilter(NodeFilter())
+configure()
+atexit.register(shutdown)
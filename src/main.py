@@ -1,21 +1,243 @@
-import sys
-from datetime import datetime
-from peer_node import PeerNode
+import argparse
+from dispatcher import SHED_POLICIES
+from logger import LEVELS, configure, set_node_name
+from peer_node import REPLY_MODES, PeerNode
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(
-            "Uso: python3 peer_node.py <IP>:<PORT> [<NEIGHBORS_FILE>] [<KEY_VALUE_FILE>]"
-        )
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        usage="python3 peer_node.py <IP>:<PORT> [<NEIGHBORS_FILE>] [<KEY_VALUE_FILE>]"
+    )
+    parser.add_argument("endpoint")
+    parser.add_argument("neighbors_file", nargs="?")
+    parser.add_argument("key_value_file", nargs="?")
+    parser.add_argument(
+        "--runtime",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="threads: uma thread por conexao; asyncio: loop de eventos unico",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument(
+        "--shed-policy",
+        choices=SHED_POLICIES,
+        default="drop_oldest",
+        help="o que fazer com a fila cheia: descartar a mais antiga ou responder BUSY",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="roda sem o menu interativo, controlado pela API HTTP local",
+    )
+    parser.add_argument(
+        "--control-port",
+        type=int,
+        default=0,
+        help="porta da API HTTP local (/search, /stats, /metrics); sem --daemon so sobe se informada",
+    )
+    parser.add_argument(
+        "--control-address",
+        default="127.0.0.1",
+        help="endereco da API HTTP; ela nao tem autenticacao, entao so exponha em rede confiavel",
+    )
+    parser.add_argument(
+        "--result-cache",
+        type=int,
+        default=0,
+        metavar="ENTRIES",
+        help="guarda ate ENTRIES respostas VAL vistas para responder buscas repetidas",
+    )
+    parser.add_argument("--result-cache-ttl", type=float, default=60.0)
+    parser.add_argument(
+        "--ring-ttl", type=int, default=2, help="TTL da primeira rodada do modo ER"
+    )
+    parser.add_argument("--ring-growth", type=int, default=2)
+    parser.add_argument(
+        "--ring-timeout",
+        type=float,
+        default=0.5,
+        help="segundos sem VAL antes de repetir a busca ER com TTL maior",
+    )
+    parser.add_argument("--walkers", type=int, default=4, help="caminhantes do modo KW")
+    parser.add_argument(
+        "--walk-check",
+        type=int,
+        default=4,
+        help="saltos entre consultas de um caminhante KW a origem",
+    )
+    parser.add_argument(
+        "--routing-hints",
+        action="store_true",
+        help="RW/BP/KW preferem vizinhos que ja levaram a respostas para a chave",
+    )
+    parser.add_argument(
+        "--key-digests",
+        action="store_true",
+        help="troca filtros de Bloom das chaves com os vizinhos para encurtar buscas",
+    )
+    parser.add_argument("--digest-capacity", type=int, default=1024)
+    parser.add_argument("--digest-fp-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--store",
+        default="dict",
+        help="dict (memoria) ou sqlite:<arquivo> para indice ordenado em disco",
+    )
+    parser.add_argument(
+        "--prefix-limit",
+        type=int,
+        default=32,
+        help="chaves por resposta a uma busca por prefixo (chave*)",
+    )
+    parser.add_argument(
+        "--prefix-max-results",
+        type=int,
+        default=256,
+        help="chaves aceitas pela origem em cada busca por prefixo",
+    )
+    parser.add_argument(
+        "--hello-timeout",
+        type=float,
+        default=2.0,
+        help="prazo em segundos para conectar e receber HELLO_OK",
+    )
+    parser.add_argument(
+        "--bootstrap-concurrency",
+        type=int,
+        default=8,
+        help="HELLOs simultaneos na inicializacao",
+    )
+    parser.add_argument(
+        "--bootstrap-retries",
+        type=int,
+        default=5,
+        help="novas tentativas em segundo plano para vizinhos que falharam",
+    )
+    parser.add_argument(
+        "--heartbeat-interval",
+        type=float,
+        default=0.0,
+        help="segundos entre PINGs aos vizinhos (0 desliga)",
+    )
+    parser.add_argument(
+        "--heartbeat-timeout",
+        type=float,
+        default=2.0,
+        help="prazo em segundos para o PONG",
+    )
+    parser.add_argument(
+        "--heartbeat-threshold",
+        type=int,
+        default=3,
+        help="PINGs seguidos sem resposta ate remover o vizinho",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LEVELS,
+        default="INFO",
+        help="DEBUG mostra cada mensagem recebida e encaminhada",
+    )
+    parser.add_argument(
+        "--log-sync",
+        action="store_true",
+        help="escreve o log na propria thread, sem a fila do handler assincrono",
+    )
+    parser.add_argument(
+        "--trace-file",
+        help="grava eventos JSON de SEARCH/VAL neste arquivo (- para a saida padrao)",
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=float,
+        default=0.01,
+        help="fracao das buscas rastreadas em --trace-file",
+    )
+    parser.add_argument(
+        "--send-timeout",
+        type=float,
+        default=5.0,
+        help="prazo em segundos de cada escrita para um vizinho (0 sem prazo)",
+    )
+    parser.add_argument(
+        "--send-batch",
+        type=int,
+        default=64,
+        help="mensagens enfileiradas para um vizinho juntadas em uma escrita",
+    )
+    parser.add_argument(
+        "--bp-branches",
+        type=int,
+        default=1,
+        help="vizinhos explorados ao mesmo tempo por cada no na busca BP",
+    )
+    parser.add_argument(
+        "--search-deadline",
+        type=float,
+        default=0.0,
+        help="prazo em segundos das buscas iniciadas neste no (0 desliga)",
+    )
+    parser.add_argument(
+        "--cancel-searches",
+        action="store_true",
+        help="envia CANCEL pelo caminho da busca quando ela termina na origem",
+    )
+    parser.add_argument(
+        "--reply-mode",
+        choices=REPLY_MODES,
+        default="reverse",
+        help="reverse: VAL volta pelo caminho da busca; direct: conexao direta com a origem",
+    )
+    args = parser.parse_args()
+    if args.walkers < 1 or args.walk_check < 1:
+        parser.error("--walkers e --walk-check precisam ser pelo menos 1")
+    if args.ring_growth < 2:
+        parser.error("--ring-growth precisa ser pelo menos 2")
 
-    address, port = sys.argv[1].split(":")
-    neighbors_file = sys.argv[2] if len(sys.argv) > 2 else None
-    key_value_file = sys.argv[3] if len(sys.argv) > 3 else None
+    address, port = args.endpoint.split(":")
 
-    def log(message, prefix="INFO"):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        prefix = prefix.upper()
-        print(f"[{timestamp}] [{address}:{port}] [{prefix}]: {message}")
-
-    PeerNode(address, port, neighbors_file, key_value_file, start_server=True)
+    set_node_name(address, port)
+    configure(
+        args.log_level,
+        async_output=not args.log_sync,
+        event_file=args.trace_file,
+        event_sample=args.trace_sample,
+    )
+    PeerNode(
+        address,
+        port,
+        args.neighbors_file,
+        args.key_value_file,
+        start_server=True,
+        runtime=args.runtime,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        shed_policy=args.shed_policy,
+        daemon=args.daemon,
+        control_port=args.control_port,
+        control_address=args.control_address,
+        result_cache_size=args.result_cache,
+        result_cache_ttl=args.result_cache_ttl,
+        reply_mode=args.reply_mode,
+        ring_initial_ttl=args.ring_ttl,
+        ring_growth=args.ring_growth,
+        ring_timeout=args.ring_timeout,
+        walkers=args.walkers,
+        walk_check_interval=args.walk_check,
+        routing_hints=args.routing_hints,
+        key_digests=args.key_digests,
+        digest_capacity=args.digest_capacity,
+        digest_fp_rate=args.digest_fp_rate,
+        store=args.store,
+        prefix_limit=args.prefix_limit,
+        prefix_max_results=args.prefix_max_results,
+        hello_timeout=args.hello_timeout,
+        bootstrap_concurrency=args.bootstrap_concurrency,
+        bootstrap_retries=args.bootstrap_retries,
+        heartbeat_interval=args.heartbeat_interval,
+        heartbeat_timeout=args.heartbeat_timeout,
+        heartbeat_threshold=args.heartbeat_threshold,
+        search_deadline=args.search_deadline,
+        cancel_searches=args.cancel_searches,
+        depth_branches=args.bp_branches,
+        send_timeout=args.send_timeout,
+        send_batch=args.send_batch,
+    )
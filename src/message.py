@@ -1,4 +1,9 @@
 import socket
+import time
+import logger
+import protocol
+from logger import debug, log
+from search_strategy import STRATEGIES
 
 
 class MessageHandler:
@@ -6,69 +11,286 @@ class MessageHandler:
         self.peer_node = peer_node
 
     def send_hello(self, neighbor):
+        digest = ""
+        if self.peer_node.key_digests is not None:
+            digest = f" {protocol.DIGEST_PREFIX}{self.peer_node.key_digests.encode()}"
+        return self.send_message(
+            f"{self.peer_node.address}:{self.peer_node.port} {self.peer_node.next_sequence_number()} 1 HELLO {protocol.CAPABILITY}{digest}\n",
+            neighbor,
+        )
+
+    def send_digest(self, neighbor):
         self.send_message(
-            f"{self.peer_node.address}:{self.peer_node.port} {self.peer_node.sequence_number} 1 HELLO\n",
+            f"{self.peer_node.address}:{self.peer_node.port} {self.peer_node.next_sequence_number()} 1 DIGEST {self.peer_node.key_digests.encode()}\n",
             neighbor,
         )
-        self.peer_node.sequence_number += 1
 
     def send_message(self, message, neighbor):
+        if not isinstance(message, str) or message.split()[3:4] != ["HELLO"]:
+            self.send_pooled(message, neighbor)
+            return
+        # HELLO: conexao propria, com prazo para conectar e para o HELLO_OK;
+        # retorna se o vizinho respondeu
         try:
             neighbor_address, neighbor_port = neighbor.split(":")
             with socket.create_connection(
-                (neighbor_address, int(neighbor_port))
+                (neighbor_address, int(neighbor_port)), timeout=self.peer_node.hello_timeout
             ) as sock:
-                log(f"Encaminhando mensagem {message.strip()} para {neighbor}")
+                # O resumo de chaves (base64) fica fora do log
+                text = message.strip().split(f" {protocol.DIGEST_PREFIX}")[0]
+                log(f"Encaminhando mensagem {text} para {neighbor}")
                 sock.sendall(message.encode())
-                response = sock.recv(1024).decode().strip()
-                if response == "HELLO_OK":
-                    log(f"Envio feito com sucesso: {message.strip()}")
-                else:
-                    log(f"Erro ao enviar mensagem: {message.strip()}")
+                response = sock.recv(1024).decode().split()
+                if response[:1] == ["HELLO_OK"]:
+                    if protocol.CAPABILITY in response:
+                        self.peer_node.binary_neighbors.add(neighbor)
+                    log(f"Envio feito com sucesso: {text}")
+                    return True
+                log(f"Erro ao enviar mensagem: {text}")
         except Exception as e:
-            log(f"Erro ao conectar-se ao vizinho {neighbor}: {e}")
+            log("Erro ao conectar-se ao vizinho %s: %s", "WARNING", neighbor, e)
+        return False
+
+    def send_pooled(self, message, neighbor):
+        if isinstance(message, str):
+            data = message.encode()
+        else:
+            data = protocol.encode(message, neighbor in self.peer_node.binary_neighbors)
+        self.send_data(message, data, neighbor)
+
+    def forward(self, message, neighbors, source=None):
+        # Repasse da mesma mensagem para varios vizinhos: cada formato e
+        # codificado uma vez (o binario a partir do quadro recebido em
+        # source, quando possivel) e os mesmos bytes vao para todos
+        binary_neighbors = self.peer_node.binary_neighbors
+        tracing = logger.tracing()
+        debugging = logger.enabled()
+        encoded = {}
+        sent = size = 0
+        for neighbor in neighbors:
+            binary = neighbor in binary_neighbors
+            data = encoded.get(binary)
+            if data is None:
+                data = protocol.relay_frame(source, message) if binary else None
+                if data is None:
+                    data = protocol.encode(message, binary)
+                encoded[binary] = data
+            if tracing:
+                self.trace("send", message, neighbor)
+            if debugging:
+                debug("Encaminhando mensagem %s para %s", protocol.describe(message), neighbor)
+            self.enqueue(message, data, neighbor)
+            sent += 1
+            size += len(data)
+        if sent:
+            self.peer_node.stats.record_sent(message[3], message[4], size, sent)
+
+    def send_data(self, message, data, neighbor):
+        if isinstance(message, str):
+            text = message.strip()
+            operation, mode = text.split(None, 4)[3], "-"
+        else:
+            text = None
+            operation, mode = message[3], message[4]
+            if logger.tracing():
+                self.trace("send", message, neighbor)
+        self.peer_node.stats.record_sent(operation, mode, len(data))
+        if logger.enabled():
+            debug("Encaminhando mensagem %s para %s", text or protocol.describe(message), neighbor)
+        self.enqueue(message, data, neighbor)
+
+    def enqueue(self, message, data, neighbor):
+        if not self.peer_node.outbound.send(neighbor, data):
+            log(
+                "Fila de saida para %s cheia, descartando: %s",
+                "WARNING",
+                neighbor,
+                message.strip() if isinstance(message, str) else protocol.describe(message),
+            )
+
+    def trace(self, kind, parts, neighbor=None):
+        # Evento JSON amostrado, identificado pela busca (origem, seq_no);
+        # nas respostas a busca e a do seq_no opcional e da rota (ou do
+        # proprio destino, quando a resposta vai direto a origem)
+        operation = parts[3]
+        if operation in protocol.REPLY_OPERATIONS:
+            if len(parts) <= 8:
+                return
+            me = f"{self.peer_node.address}:{self.peer_node.port}"
+            origin = protocol.reply_route(parts) or (neighbor if kind == "send" else me)
+            seq_no, key = parts[8], parts[5]
+        elif operation in protocol.SEARCH_LAYOUT:
+            origin, seq_no, key = parts[0], parts[1], parts[6]
+        else:
+            return
+        if not logger.sampled(origin, seq_no):
+            return
+        logger.event(
+            kind,
+            origin,
+            seq_no,
+            op=operation,
+            mode=parts[4],
+            ttl=int(parts[2]),
+            hop=int(parts[7]),
+            key=key,
+            sender=parts[0],
+            neighbor=neighbor,
+        )
 
     def process_message(self, message, client_socket):
-        log(f"Recebido: {message}")
-        parts = message.split()
+        self.process_parts(protocol.decode_text(message), client_socket)
+
+    def process_parts(self, parts, client_socket):
+        if logger.enabled():
+            debug("Recebido: %s", protocol.describe(parts))
+        if logger.tracing():
+            self.trace("receive", parts)
         origin = parts[0]
         seq_no = int(parts[1])
         ttl = int(parts[2])
         operation = parts[3]
 
         if operation == "HELLO":
-            self.handle_hello(origin, client_socket)
-        elif operation == "SEARCH":
+            self.handle_hello(origin, client_socket, parts[4:])
+        elif operation in protocol.SEARCH_OPERATIONS:
+            self.peer_node.stats.increment_count(parts[4])
             self.handle_search(parts, client_socket)
         elif operation == "VAL":
-            self.peer_node.stats.record_hop(parts[4], int(parts[7]))
-            log(f"Valor encontrado! Chave: {parts[5]} valor: {parts[6]}")
+            self.handle_val(parts)
+        elif operation == "MVAL":
+            self.handle_batched_val(parts)
+        elif operation == "CHECK":
+            STRATEGIES[parts[4]](self.peer_node).check_back(parts)
+        elif operation == "WALK":
+            STRATEGIES[parts[4]](self.peer_node).resume(parts)
+        elif operation == protocol.CANCEL:
+            STRATEGIES[parts[4]](self.peer_node).cancel(parts)
+        elif operation == "DIGEST":
+            self.handle_digest(origin, parts[4])
+        elif operation == "PING":
+            self.send_message(
+                f"{self.peer_node.address}:{self.peer_node.port} {seq_no} 1 PONG\n", origin
+            )
+        elif operation == "PONG":
+            if self.peer_node.liveness is not None:
+                self.peer_node.liveness.pong(origin, seq_no)
         elif operation == "BYE":
             self.handle_bye(origin)
 
-    def handle_hello(self, origin, client_socket):
-        if origin not in self.peer_node.neighbors:
-            self.peer_node.neighbors.append(origin)
+    def handle_hello(self, origin, client_socket, capabilities=()):
+        if self.peer_node.neighbors.add(origin):
             log(f"Adicionando vizinho na tabela: {origin}")
         else:
             log(f"Vizinho já está na tabela: {origin}")
-        client_socket.sendall(b"HELLO_OK\n")
+        self.peer_node.bootstrap.connected(origin)
+        if self.peer_node.liveness is not None:
+            self.peer_node.liveness.alive(origin)
+        if protocol.CAPABILITY in capabilities:
+            self.peer_node.binary_neighbors.add(origin)
+            client_socket.sendall(f"HELLO_OK {protocol.CAPABILITY}\n".encode())
+        else:
+            self.peer_node.binary_neighbors.discard(origin)
+            client_socket.sendall(b"HELLO_OK\n")
+        for capability in capabilities:
+            if capability.startswith(protocol.DIGEST_PREFIX):
+                # O vizinho mandou seu resumo; responde com o nosso
+                self.handle_digest(origin, capability[len(protocol.DIGEST_PREFIX) :])
+                if self.peer_node.key_digests is not None:
+                    self.send_digest(origin)
+
+    def handle_digest(self, origin, digest):
+        if self.peer_node.key_digests is None:
+            return
+        try:
+            self.peer_node.key_digests.update(origin, digest)
+        except ValueError as e:
+            log(str(e), "ERROR")
 
     def handle_search(self, parts, client_socket):
-        origin = parts[0]
-        method = parts[4]
         key = parts[6]
-        if method == "FL":
-            strategy = FloodingSearchStrategy(self.peer_node)
-        elif method == "BP":
-            strategy = DepthFirstSearchStrategy(self.peer_node)
-        elif method == "RW":
-            strategy = RandomWalkSearchStrategy(self.peer_node)
-        self.peer_node.search_context.set_strategy(strategy)
-        self.peer_node.search_context.search(key, parts, client_socket)
+        self.record_reverse_path(parts)
+        strategy = STRATEGIES[parts[4]](self.peer_node)
+        # Uma estrategia por mensagem: ela guarda estado da mensagem
+        # (last_hop_port, batched) e as threads do no processam buscas em paralelo
+        strategy.search(key, parts, client_socket)
+
+    def handle_val(self, parts):
+        if self.handle_reply(parts, [parts[5]], [parts[6]]):
+            log(f"Valor encontrado! Chave: {parts[5]} valor: {parts[6]}")
+
+    def handle_batched_val(self, parts):
+        keys = protocol.decode_keys(parts[5])
+        values = protocol.decode_keys(parts[6])
+        if self.handle_reply(parts, keys, values):
+            log(f"Valores encontrados em {parts[0]}: {dict(zip(keys, values))}")
+
+    def record_reverse_path(self, parts):
+        # Guarda so o primeiro salto anterior: na BP a mensagem volta a passar
+        # pelo no ao retroceder, e o caminho ate a origem e o da primeira vez.
+        if int(parts[7]) == 0:
+            return
+        msg_id = (parts[0], int(parts[1]))
+        paths = self.peer_node.reverse_paths
+        with paths.lock_for(msg_id):
+            if msg_id not in paths:
+                paths[msg_id] = self.peer_node.neighbor_for_port(parts[5])
+
+    def relay_reply(self, parts, route):
+        next_hop = self.peer_node.reverse_paths.get((route, int(parts[8])))
+        if next_hop is None:
+            # Caminho expirado ou desconhecido: entrega direto na origem
+            log("Sem caminho reverso para a busca %s de %s", "WARNING", parts[8], route)
+            next_hop = route
+        self.send_message(parts, next_hop)
+
+    def handle_reply(self, parts, keys, values):
+        hop_count = int(parts[7])
+        cached = protocol.is_cached(parts)
+        route = protocol.reply_route(parts)
+        relayed = route is not None and route != (
+            f"{self.peer_node.address}:{self.peer_node.port}"
+        )
+        result_cache = self.peer_node.result_cache
+        hints = self.peer_node.routing_hints
+        if hints is not None and len(parts) > 8:
+            search_origin = route or f"{self.peer_node.address}:{self.peer_node.port}"
+            hints.learn(
+                (search_origin, int(parts[8])), keys, parts[0], self.peer_node.neighbors
+            )
+        for key, value in zip(keys, values):
+            # Respostas vindas de cache nao sao recacheadas, para nao
+            # prolongar a validade de um valor ja antigo.
+            if result_cache is not None and not cached:
+                result_cache.store(key, value, parts[0], hop_count)
+            if relayed:
+                continue
+            self.peer_node.stats.record_hop(parts[4], hop_count, cached)
+            if len(parts) > 8:
+                record = self.peer_node.searches.resolve(
+                    int(parts[8]), parts[0], key, value, hop_count, cached
+                )
+                if record is not None:
+                    self.peer_node.stats.record_latency(
+                        parts[4], time.monotonic() - record.started
+                    )
+                walker = record.walkers.get(int(parts[8])) if record else None
+                if walker is not None:
+                    self.peer_node.stats.record_walker("hits", walker["walker"])
+        if not relayed and keys and protocol.has_more(parts):
+            self.peer_node.searches.page_truncated(int(parts[8]), keys[-1])
+        if relayed:
+            self.relay_reply(parts, route)
+        return not relayed
 
     def handle_bye(self, origin):
         log(f"Mensagem recebida: BYE de {origin}")
-        if origin in self.peer_node.neighbors:
-            self.peer_node.neighbors.remove(origin)
+        if self.peer_node.neighbors.discard(origin):
             log(f"Removendo vizinho da tabela: {origin}")
+        self.peer_node.binary_neighbors.discard(origin)
+        if self.peer_node.key_digests is not None:
+            self.peer_node.key_digests.drop(origin)
+        if self.peer_node.liveness is not None:
+            self.peer_node.liveness.forget(origin)
+        self.peer_node.outbound.drop(origin)
+        self.peer_node.connection_pool.drop(origin)
@@ -0,0 +1,140 @@
+import math
+import re
+
+
+class RunningStats:
+    # Media e variancia de Welford: memoria constante e estavel
+    # numericamente, sem guardar as amostras
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def stdev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class Histogram:
+    # Buckets log-lineares no estilo do HdrHistogram, para inteiros >= 0:
+    # valores abaixo de 2**(precision + 1) sao exatos e cada potencia de 2
+    # acima disso e dividida em 2**precision buckets, entao o erro relativo
+    # de um percentil fica abaixo de 2**-precision. O numero de buckets
+    # depende so da faixa de valores, nao do numero de amostras.
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.counts = {}
+        self.count = 0
+
+    def bucket(self, value):
+        shift = max(0, value.bit_length() - self.precision - 1)
+        return (value >> shift) << shift, 1 << shift
+
+    def add(self, value):
+        lower, _ = self.bucket(max(0, int(value)))
+        self.counts[lower] = self.counts.get(lower, 0) + 1
+        self.count += 1
+
+    def percentile(self, q):
+        # Maior valor equivalente ao bucket onde cai o percentil q (0-100)
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for lower in sorted(self.counts):
+            seen += self.counts[lower]
+            if seen >= rank:
+                return lower + self.bucket(lower)[1] - 1
+        return None
+
+
+class Summary:
+    QUANTILES = (50, 90, 99)
+
+    def __init__(self, precision=5):
+        self.stats = RunningStats()
+        self.histogram = Histogram(precision)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.histogram.add(value)
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    def snapshot(self, scale=1):
+        stats = self.stats
+        snapshot = {
+            "count": stats.count,
+            "mean": stats.mean * scale,
+            "stdev": stats.stdev() * scale,
+            "min": stats.min * scale if stats.min is not None else None,
+            "max": stats.max * scale if stats.max is not None else None,
+        }
+        for q in self.QUANTILES:
+            value = self.histogram.percentile(q)
+            snapshot[f"p{q}"] = min(value, stats.max) * scale if value is not None else None
+        return snapshot
+
+
+def metric_name(text):
+    # "fila de entrada" -> "fila_de_entrada"
+    name = re.sub(r"[^a-zA-Z0-9_]+", "_", text.strip()).strip("_").lower()
+    return name if name and not name[0].isdigit() else f"_{name}"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class PrometheusWriter:
+    # Formato de exposicao em texto do Prometheus (versao 0.0.4). As amostras
+    # ficam agrupadas sob o HELP/TYPE da sua familia, em qualquer ordem em que
+    # forem escritas.
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    SUFFIXES = ("_sum", "_count")
+
+    def __init__(self, prefix="p2p"):
+        self.prefix = prefix
+        self.families = {}
+
+    def family(self, name, kind, help_text):
+        name = f"{self.prefix}_{name}"
+        if name not in self.families:
+            self.families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        return name
+
+    def sample(self, name, value, **labels):
+        if value is None:
+            return
+        family = name
+        if family not in self.families:
+            family = next(name[: -len(suffix)] for suffix in self.SUFFIXES if name.endswith(suffix))
+        if labels:
+            text = ",".join(f'{key}="{escape(label)}"' for key, label in labels.items())
+            name = f"{name}{{{text}}}"
+        self.families[family].append(f"{name} {value}")
+
+    def summary(self, name, summary, scale=1, **labels):
+        for q in Summary.QUANTILES:
+            value = summary.histogram.percentile(q)
+            if value is not None:
+                value = min(value, summary.stats.max) * scale
+            self.sample(name, value, quantile=f"{q / 100:g}", **labels)
+        self.sample(f"{name}_sum", summary.stats.total * scale, **labels)
+        self.sample(f"{name}_count", summary.stats.count, **labels)
+
+    def text(self):
+        return "\n".join(line for lines in self.families.values() for line in lines) + "\n"
@@ -0,0 +1,112 @@
+import threading
+
+
+class SequenceAllocator:
+    def __init__(self, start=0):
+        self.value = start
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            value = self.value
+            self.value += 1
+            return value
+
+    def peek(self):
+        return self.value
+
+    def reset(self, value):
+        with self.lock:
+            self.value = value
+
+
+def endpoint_port(endpoint):
+    try:
+        return int(endpoint.rsplit(":", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class NeighborSet:
+    # Lista de vizinhos copy-on-write: escritas trocam a tupla inteira sob o
+    # lock e leitores iteram sobre um snapshot imutavel, sem travar. A porta
+    # de cada vizinho e extraida uma vez, na admissao, para os filtros de
+    # ultimo salto do repasse.
+    def __init__(self, neighbors=()):
+        self.lock = threading.Lock()
+        self.replace(tuple(dict.fromkeys(neighbors)))
+
+    def replace(self, items):
+        # Chamado com o lock (ou no construtor); items e ports trocam juntos
+        self.entries = tuple((item, endpoint_port(item)) for item in items)
+        self.items = items
+
+    def add(self, neighbor):
+        with self.lock:
+            if neighbor in self.items:
+                return False
+            self.replace(self.items + (neighbor,))
+            return True
+
+    def discard(self, neighbor):
+        with self.lock:
+            if neighbor not in self.items:
+                return False
+            self.replace(tuple(item for item in self.items if item != neighbor))
+            return True
+
+    def excluding_port(self, port):
+        # Vizinhos exceto o ultimo salto, que o protocolo so identifica pela
+        # porta
+        if port is None:
+            return list(self.items)
+        port = int(port)
+        return [neighbor for neighbor, neighbor_port in self.entries if neighbor_port != port]
+
+    def for_port(self, port):
+        port = int(port)
+        for neighbor, neighbor_port in self.entries:
+            if neighbor_port == port:
+                return neighbor
+        return None
+
+    def append(self, neighbor):
+        self.add(neighbor)
+
+    def remove(self, neighbor):
+        if not self.discard(neighbor):
+            raise ValueError(f"{neighbor} nao esta na lista de vizinhos")
+
+    def snapshot(self):
+        return self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, neighbor):
+        return neighbor in self.items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.items[index])
+        return self.items[index]
+
+    def __eq__(self, other):
+        return list(self.items) == list(other)
+
+    def __repr__(self):
+        return repr(list(self.items))
+
+
+class StripedLock:
+    def __init__(self, stripes=16):
+        self.locks = [threading.RLock() for _ in range(stripes)]
+
+    def index(self, key):
+        return hash(key) % len(self.locks)
+
+    def lock_for(self, key):
+        return self.locks[self.index(key)]
@@ -1,13 +1,38 @@
+import signal
 import sys
+import threading
+from aio_server import AsyncPeerServer
+from bootstrap import Bootstrapper
+from connection_pool import ConnectionPool
+from control import ControlServer
+from dedup import DedupCache, StripedExpiringDict
+from digest import KeyDigests
+from dispatcher import InboundDispatcher, OutboundQueues
+from liveness import Liveness
+from logger import log
 from message import MessageHandler
+from node_state import NeighborSet, SequenceAllocator
+from protocol import CANCEL
+from result_cache import ResultCache
+from routing import RoutingHints
 from search_strategy import (
-    SearchStrategyContext,
     FloodingSearchStrategy,
     RandomWalkSearchStrategy,
     DepthFirstSearchStrategy,
+    ExpandingRingSearchStrategy,
+    KRandomWalkSearchStrategy,
+    STRATEGIES,
 )
+from searches import SearchTable
 from server import PeerServer
 from statistics import Statistics
+from storage import open_store, parse_key_value, parse_prefix_query, prefix_page
+
+# reverse: respostas voltam pelo caminho da busca; direct: o no que tem a
+# chave abre uma conexao direta com a origem
+REPLY_MODES = ("reverse", "direct")
+# Espera antes de anunciar o resumo de chaves, para agrupar varias insercoes
+DIGEST_DELAY = 0.5
 
 
 class PeerNode:
@@ -18,46 +43,211 @@ class PeerNode:
         neighbors_file=None,
         key_value_file=None,
         start_server=False,
+        runtime="threads",
+        dedup_max_entries=100000,
+        dedup_ttl=300.0,
+        dedup_window=None,
+        workers=8,
+        queue_size=1024,
+        shed_policy="drop_oldest",
+        daemon=False,
+        control_port=0,
+        control_address="127.0.0.1",
+        result_cache_size=0,
+        result_cache_ttl=60.0,
+        reply_mode="reverse",
+        ring_initial_ttl=2,
+        ring_growth=2,
+        ring_timeout=0.5,
+        walkers=4,
+        walk_check_interval=4,
+        routing_hints=False,
+        key_digests=False,
+        digest_capacity=1024,
+        digest_fp_rate=0.01,
+        store="dict",
+        prefix_limit=32,
+        prefix_max_results=256,
+        hello_timeout=2.0,
+        bootstrap_concurrency=8,
+        bootstrap_retries=5,
+        heartbeat_interval=0.0,
+        heartbeat_timeout=2.0,
+        heartbeat_threshold=3,
+        search_deadline=0.0,
+        cancel_searches=False,
+        depth_branches=1,
+        send_timeout=5.0,
+        send_batch=64,
     ):
         self.address = address
         self.port = int(port)
-        self.neighbors = []
-        self.key_value_store = {}
-        self.sequence_number = 0
+        self.neighbors = NeighborSet()
+        self.binary_neighbors = set()
+        # "dict" (memoria) ou "sqlite:<arquivo>"; ver storage.open_store
+        self.key_value_store = open_store(store)
+        self.sequence = SequenceAllocator()
         self.ttl_default = 100
-        self.seen_messages = set()
-        self.depth_search_info = {}
+        self.ring_initial_ttl = ring_initial_ttl
+        self.ring_growth = ring_growth
+        self.ring_timeout = ring_timeout
+        self.walkers = walkers
+        self.walk_check_interval = walk_check_interval
+        self.seen_messages = DedupCache(
+            max_entries=dedup_max_entries, ttl=dedup_ttl, window=dedup_window
+        )
+        # Estado de cada busca BP vista e filhos explorados ao mesmo tempo
+        # (1: busca em profundidade classica)
+        self.depth_search_info = StripedExpiringDict(
+            max_entries=dedup_max_entries, ttl=dedup_ttl
+        )
+        self.depth_branches = depth_branches
+        # Buscas por prefixo: chaves por resposta de cada no e total aceito
+        # pela origem por consulta
+        self.prefix_limit = prefix_limit
+        self.searches = SearchTable(max_matches=prefix_max_results)
+        # Prazo padrao das buscas iniciadas aqui (0: sem prazo) e envio de
+        # CANCEL quando elas terminam
+        self.search_deadline = search_deadline
+        self.cancel_searches = cancel_searches
+        # Buscas canceladas pela origem e proximo salto de cada caminhante,
+        # para o CANCEL seguir o mesmo caminho
+        self.cancelled_searches = DedupCache(max_entries=dedup_max_entries, ttl=dedup_ttl)
+        self.forward_paths = StripedExpiringDict(
+            max_entries=dedup_max_entries, ttl=dedup_ttl
+        )
+        if reply_mode not in REPLY_MODES:
+            raise ValueError(f"Modo de resposta invalido: {reply_mode}")
+        self.reply_mode = reply_mode
+        # Salto anterior de cada busca vista, para devolver as respostas
+        # pelo caminho reverso
+        self.reverse_paths = StripedExpiringDict(
+            max_entries=dedup_max_entries, ttl=dedup_ttl
+        )
         self.stats = Statistics()
+        # Cache de respostas VAL, desligado por padrao (result_cache_size=0)
+        self.result_cache = None
+        if result_cache_size:
+            self.result_cache = ResultCache(result_cache_size, result_cache_ttl)
+            self.stats.register_source("cache de resultados", self.result_cache.snapshot)
+        self.stats.register_source("mensagens vistas", self.seen_messages.snapshot)
+        self.stats.register_source("estado BP", self.depth_search_info.snapshot)
+        self.stats.register_source("caminhos reversos", self.reverse_paths.snapshot)
+        self.stats.register_source("buscas", self.searches.snapshot)
+        self.stats.register_source("buscas canceladas", self.cancelled_searches.snapshot)
+        self.stats.register_source("caminhos de ida", self.forward_paths.snapshot)
+        # Indice de roteamento aprendido com as respostas, usado por RW/BP/KW
+        self.routing_hints = RoutingHints() if routing_hints else None
+        if self.routing_hints is not None:
+            self.stats.register_source("dicas de roteamento", self.routing_hints.snapshot)
+        self.key_digests = None
+        self.digest_pending = False
+        if key_digests:
+            self.key_digests = KeyDigests(digest_capacity, digest_fp_rate)
+            self.stats.register_source("resumos de chaves", self.key_digests.snapshot)
+        self.connection_pool = ConnectionPool(send_timeout=send_timeout)
+        self.stats.register_source("conexoes", self.connection_pool.snapshot)
+        self.dispatcher = InboundDispatcher(self, workers, queue_size, shed_policy)
+        # Envio em paralelo: uma fila por vizinho, escritas em lote de ate
+        # send_batch mensagens
+        self.outbound = OutboundQueues(
+            self.connection_pool, queue_size, shed_policy, send_batch
+        )
+        self.stats.register_source("fila de entrada", self.dispatcher.snapshot)
+        self.stats.register_source("filas de saida", self.outbound.snapshot)
 
-        if neighbors_file:
-            self.load_file(neighbors_file, self.add_neighbor)
-        if key_value_file:
-            self.load_file(key_value_file, self.add_key_value)
-
-        self.server = PeerServer(self.address, self.port, self)
+        if runtime == "asyncio":
+            self.server = AsyncPeerServer(self.address, self.port, self)
+        else:
+            self.server = PeerServer(self.address, self.port, self)
         self.message_handler = MessageHandler(self)
-        self.search_context = SearchStrategyContext()
+        # Prazo de cada HELLO e inicializacao paralela dos vizinhos do arquivo
+        self.hello_timeout = hello_timeout
+        self.bootstrap = Bootstrapper(self, bootstrap_concurrency, bootstrap_retries)
+        self.stats.register_source("inicializacao", self.bootstrap.snapshot)
+        # PING/PONG periodico entre vizinhos, desligado por padrao
+        # (heartbeat_interval=0)
+        self.liveness = None
+        if heartbeat_interval:
+            self.liveness = Liveness(
+                self, heartbeat_interval, heartbeat_timeout, heartbeat_threshold
+            )
+            self.stats.register_source("vivacidade", self.liveness.snapshot)
+
+        if key_value_file:
+            self.load_key_values(key_value_file)
 
+        # O servidor sobe antes dos HELLOs: o no ja atende enquanto os
+        # vizinhos lentos ou fora do ar ainda sao contatados
         if start_server:
             self.start_server()
-            self.show_menu()
+        if neighbors_file:
+            self.bootstrap.start(self.read_neighbors(neighbors_file))
+
+        if start_server:
+            if daemon:
+                self.run_daemon(control_address, control_port)
+            else:
+                # Com o menu, a API (e o /metrics) so sobe com porta explicita
+                if control_port:
+                    ControlServer(self, control_address, control_port).start()
+                self.show_menu()
+
+    @property
+    def sequence_number(self):
+        return self.sequence.peek()
 
-    def load_file(self, file_path, handler):
+    @sequence_number.setter
+    def sequence_number(self, value):
+        self.sequence.reset(value)
+
+    def next_sequence_number(self):
+        return self.sequence.next()
+
+    def read_neighbors(self, file_path):
         with open(file_path, "r") as file:
-            for line in file:
-                handler(line.strip())
+            return [line.strip() for line in file]
+
+    def load_key_values(self, file_path):
+        count = self.key_value_store.load_file(file_path)
+        log(f"{count} chaves disponiveis em {file_path}")
+        if self.key_digests is not None:
+            self.key_digests.rebuild(self.key_value_store, count)
+            self.schedule_digest()
 
     def add_neighbor(self, neighbor):
-        self.neighbors.append(neighbor)
-        main.log(f"Tentando adicionar vizinho {neighbor}")
+        self.neighbors.add(neighbor)
+        log(f"Tentando adicionar vizinho {neighbor}")
         self.message_handler.send_hello(neighbor)
 
+    def neighbor_for_port(self, port):
+        # O protocolo so identifica o ultimo salto pela porta
+        neighbor = self.neighbors.for_port(port)
+        return neighbor if neighbor is not None else f"{self.address}:{port}"
+
     def add_key_value(self, key_value):
-        key, value = key_value.split()
+        key, value = parse_key_value(key_value)
         self.key_value_store[key] = value
+        if self.key_digests is not None:
+            self.key_digests.add_local(key, self.key_value_store)
+            self.schedule_digest()
+
+    def schedule_digest(self):
+        if self.neighbors and not self.digest_pending:
+            self.digest_pending = True
+            self.schedule(DIGEST_DELAY, self.publish_digest)
+
+    def publish_digest(self):
+        self.digest_pending = False
+        for neighbor in self.neighbors:
+            self.message_handler.send_digest(neighbor)
 
     def start_server(self):
+        self.dispatcher.start()
         self.server.start()
+        self.port = self.server.port
+        if self.liveness is not None:
+            self.liveness.start()
 
     def show_menu(self):
         while True:
@@ -70,6 +260,8 @@ class PeerNode:
                 "[4] SEARCH (busca em profundidade)\n"
                 "[5] Estatisticas\n"
                 "[6] Alterar valor padrao de TTL\n"
+                "[7] SEARCH (inundacao em aneis crescentes)\n"
+                "[8] SEARCH (k caminhantes aleatorios)\n"
                 "[9] Sair\n"
             )
             if choice == "0":
@@ -87,6 +279,10 @@ class PeerNode:
                 self.stats.show_statistics()
             elif choice == "6":
                 self.ttl_default = int(input("Digite novo valor de TTL\n"))
+            elif choice == "7":
+                self.initiate_search(ExpandingRingSearchStrategy(self))
+            elif choice == "8":
+                self.initiate_search(KRandomWalkSearchStrategy(self))
             elif choice == "9":
                 self.exit_network()
                 break
@@ -97,17 +293,106 @@ class PeerNode:
             log(neighbor)
 
     def initiate_search(self, strategy):
-        key = input("Digite a chave a ser buscada\n")
-        self.search_context.set_strategy(strategy)
-        self.search_context.search(key)
+        # "prefixo*" busca todas as chaves com o prefixo
+        keys = input("Digite a(s) chave(s) a ser(em) buscada(s)\n").split()
+        if len(keys) > 1:
+            strategy.batched = True
+        self.start_search(strategy, keys)
+
+    def start_search(
+        self, strategy, keys, ttl=None, deadline=None, first=None, callback=None
+    ):
+        # deadline em segundos (None: o padrao do no); first encerra a busca
+        # no first-esimo resultado; callback(record) roda quando ela termina
+        if isinstance(keys, str):
+            keys = [keys]
+        seq_no = self.next_sequence_number()
+        record = self.searches.register(seq_no, keys, strategy.mode, first)
+        if callback is not None:
+            record.add_done_callback(callback)
+        remaining = []
+        for key in keys:
+            if record.finished:
+                break
+            if parse_prefix_query(key) is not None:
+                pairs, more = prefix_page(self.key_value_store, key, self.prefix_limit)
+                for match, value in pairs:
+                    record.add_result(f"{self.address}:{self.port}", match, value, 0)
+                if more:
+                    record.page_truncated(pairs[-1][0])
+                remaining.append(key)
+                continue
+            value = self.key_value_store.get(key)
+            if value is not None:
+                log(f"Chave {key} encontrada localmente: {value}")
+                record.add_result(f"{self.address}:{self.port}", key, value, 0)
+                continue
+            hit = self.result_cache.lookup(key) if self.result_cache else None
+            if hit is not None:
+                value, holder, hop_count = hit
+                log(f"Chave {key} encontrada no cache: {value} ({holder})")
+                record.add_result(holder, key, value, hop_count, cached=True)
+                self.stats.record_hop(strategy.mode, 0, cached=True)
+            else:
+                remaining.append(key)
+        if remaining and not record.finished:
+            strategy.launch(record, remaining, ttl or self.ttl_default)
+            deadline = self.search_deadline if deadline is None else deadline
+            if deadline:
+                self.schedule(deadline, self.expire_search, record)
+            # Uma busca por prefixo segue juntando as paginas que ainda chegam
+            # depois de encerrada, entao nao e cancelada
+            if self.cancel_searches and strategy.cancellable and not record.prefixes:
+                record.add_done_callback(self.cancel_search)
+        return record
+
+    def expire_search(self, record):
+        if record.finish("expired"):
+            log(
+                "Busca %s expirou com %d resultado(s)",
+                "INFO",
+                record.seq_no,
+                len(record.results),
+            )
+
+    def cancel_search(self, record):
+        # A busca terminou: avisa os nos que ainda a repassam
+        origin = f"{self.address}:{self.port}"
+        strategy = STRATEGIES[record.mode](self)
+        for seq_no in record.seq_nos:
+            strategy.cancel(
+                [origin, seq_no, self.ttl_default, CANCEL, record.mode, self.port, "-", 0]
+            )
+
+    def schedule(self, delay, callback, *args):
+        timer = threading.Timer(delay, callback, args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def run_daemon(self, control_address="127.0.0.1", control_port=0):
+        control = ControlServer(self, control_address, control_port)
+        control.start()
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        while not stop.wait(1):
+            pass
+        control.close()
+        self.exit_network()
 
     def exit_network(self):
         log("Saindo...")
         for neighbor in self.neighbors:
-            message = f"{self.address}:{self.port} {self.sequence_number} 1 BYE\n"
-            self.sequence_number += 1
+            message = f"{self.address}:{self.port} {self.next_sequence_number()} 1 BYE\n"
             self.message_handler.send_message(message, neighbor)
+        self.bootstrap.close()
+        if self.liveness is not None:
+            self.liveness.stop()
+        self.outbound.flush(timeout=2)
+        self.connection_pool.close_all()
         self.server.close()
+        self.key_value_store.close()
         if hasattr(sys, "_called_from_test"):
             return
         sys.exit(0)
@@ -0,0 +1,339 @@
+import socket
+import string
+import struct
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+# Quadros binarios comecam com MAGIC, um byte que nunca inicia uma mensagem
+# de texto (mensagens de texto comecam pelo endereco de origem).
+MAGIC = 0xB7
+VERSION = 1
+CAPABILITY = "BIN1"
+MAX_FRAME_SIZE = 64 * 1024
+# Resumo (filtro de Bloom) das chaves do no, anexado ao HELLO como
+# DIGEST=<bits>:<hashes>:<chaves>:<base64> e enviado em mensagens DIGEST
+DIGEST_PREFIX = "DIGEST="
+# O resumo vai em uma unica linha de texto: em base64 (4 caracteres a cada 3
+# bytes) ele precisa caber em um quadro, com folga para o cabecalho
+MAX_DIGEST_BITS = (MAX_FRAME_SIZE - 4096) // 4 * 3 * 8
+# Espaco de um quadro para as listas de chaves e valores de um MSEARCH/MVAL,
+# com folga para o cabecalho e os campos opcionais
+MAX_BATCH_SIZE = MAX_FRAME_SIZE - 1024
+
+FRAME_HEADER = struct.Struct("!BBH")
+# operacao, modo, ip de origem, porta de origem, seq_no, ttl, porta do ultimo
+# salto, hop_count
+MESSAGE_HEADER = struct.Struct("!BB4sHIHHH")
+LENGTH = struct.Struct("!H")
+# Cabecalho da mensagem seguido do tamanho da chave, lidos de uma vez, e o
+# quadro de uma busca inteiro ate a chave, escrito de uma vez
+KEYED_HEADER = struct.Struct("!BB4sHIHHHH")
+SEARCH_FRAME = struct.Struct("!BBHBB4sHIHHHH")
+SEARCH_SEQ = struct.Struct("!I")
+# Campos que mudam a cada salto (ttl, porta do ultimo salto, hop_count), em
+# posicao fixa no quadro: o repasse os reescreve sem recodificar o resto
+RELAY_FIELDS = struct.Struct("!HHH")
+RELAY_OFFSET = FRAME_HEADER.size + struct.calcsize("!BB4sHI")
+
+OPERATIONS = {
+    "SEARCH": 1,
+    "VAL": 2,
+    "MSEARCH": 3,
+    "MVAL": 4,
+    "CHECK": 5,
+    "WALK": 6,
+    "CANCEL": 7,
+}
+# MSEARCH/MVAL sao as variantes em lote: o campo de chave (e o de valor, no
+# MVAL) carrega uma lista codificada por encode_keys.
+SEARCH_OPERATIONS = ("SEARCH", "MSEARCH")
+REPLY_OPERATIONS = ("VAL", "MVAL")
+# Consulta de um caminhante do modo KW a origem (CHECK) e a resposta da
+# origem mandando-o seguir (WALK); ambas tem o formato de um MSEARCH.
+WALK_OPERATIONS = ("CHECK", "WALK")
+# Cancelamento de uma busca ja encerrada na origem, repassado pelo mesmo
+# caminho da busca; tambem tem o formato de um SEARCH.
+CANCEL = "CANCEL"
+SEARCH_LAYOUT = SEARCH_OPERATIONS + WALK_OPERATIONS + (CANCEL,)
+MODES = {"FL": 1, "RW": 2, "BP": 3, "ER": 4, "KW": 5}
+# Campos opcionais das respostas, depois do seq_no da busca:
+#   CACHED        resposta servida a partir do cache de resultados
+#   MORE          pagina de uma busca por prefixo com mais chaves depois dela
+#   TO=<ip:porta> origem da busca; a resposta volta pelo caminho reverso
+# No quadro binario, cada um e um bit do byte de operacao (a origem segue o
+# seq_no, empacotada como a origem do cabecalho).
+CACHED = "CACHED"
+MORE = "MORE"
+ROUTE_PREFIX = "TO="
+CACHED_FLAG = 0x80
+ROUTED_FLAG = 0x40
+MORE_FLAG = 0x20
+ORIGIN = struct.Struct("!4sH")
+OPERATION_NAMES = {code: name for name, code in OPERATIONS.items()}
+MODE_NAMES = {code: name for name, code in MODES.items()}
+
+
+# No formato texto o valor de um VAL pode ter espacos: vai com
+# percent-encoding de tudo que nao e ASCII visivel (e do proprio "%")
+VALUE_SAFE = string.punctuation.replace("%", "")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+# Erros de uma mensagem malformada (campos faltando, modo ou operacao
+# desconhecidos, numeros invalidos): os servidores descartam a mensagem e
+# mantem a conexao
+INVALID_MESSAGE_ERRORS = (ProtocolError, UnicodeDecodeError, LookupError, ValueError)
+
+
+def describe(parts):
+    return " ".join(str(part) for part in parts)
+
+
+def encode_keys(keys):
+    return ",".join(quote(key, safe="") for key in keys)
+
+
+def decode_keys(field):
+    return [unquote(key) for key in field.split(",")]
+
+
+def split_batch(pairs, limit=MAX_BATCH_SIZE):
+    # Divide pares (chave, valor) em lotes cujas listas codificadas cabem em
+    # um quadro; um par que sozinho passa do limite vai em um lote proprio
+    batch, size = [], 0
+    for key, value in pairs:
+        pair_size = len(quote(key, safe="")) + len(quote(value, safe="")) + 2
+        if batch and size + pair_size > limit:
+            yield batch
+            batch, size = [], 0
+        batch.append((key, value))
+        size += pair_size
+    if batch:
+        yield batch
+
+
+def encode_text(parts):
+    if parts[3] == "VAL":
+        parts = parts[:6] + [quote(str(parts[6]), safe=VALUE_SAFE)] + parts[7:]
+    return (describe(parts) + "\n").encode()
+
+
+def decode_text(line):
+    parts = line.split()
+    if parts[3:4] == ["VAL"] and len(parts) > 6:
+        parts[6] = unquote(parts[6])
+    return parts
+
+
+def encode_binary(parts):
+    operation = parts[3]
+    try:
+        origin_address, origin_port = pack_origin(parts[0])
+        if operation in SEARCH_LAYOUT:
+            key = parts[6].encode()
+            return SEARCH_FRAME.pack(
+                MAGIC,
+                VERSION,
+                KEYED_HEADER.size + len(key),
+                OPERATIONS[operation],
+                MODES[parts[4]],
+                origin_address,
+                origin_port,
+                int(parts[1]),
+                int(parts[2]),
+                int(parts[5]),
+                int(parts[7]),
+                len(key),
+            ) + key
+        key, value = parts[5], parts[6]
+        route = reply_route(parts)
+        flags = (
+            (CACHED_FLAG if is_cached(parts) else 0)
+            | (MORE_FLAG if has_more(parts) else 0)
+            | (ROUTED_FLAG if route else 0)
+        )
+        payload = MESSAGE_HEADER.pack(
+            OPERATIONS[operation] | flags,
+            MODES[parts[4]],
+            origin_address,
+            origin_port,
+            int(parts[1]),
+            int(parts[2]),
+            0,
+            int(parts[7]),
+        )
+        payload += pack_string(key) + pack_string(value)
+        # Campo opcional: seq_no da busca que originou o VAL
+        if len(parts) > 8:
+            payload += SEARCH_SEQ.pack(int(parts[8]))
+        if route:
+            payload += ORIGIN.pack(*pack_origin(route))
+        # Cada campo cabe, mas a soma pode passar do tamanho do quadro
+        frame = FRAME_HEADER.pack(MAGIC, VERSION, len(payload)) + payload
+    except (KeyError, ValueError, OSError, struct.error) as e:
+        raise ProtocolError(f"Mensagem nao representavel em binario: {e}")
+    return frame
+
+
+def is_cached(parts):
+    return parts[3] in REPLY_OPERATIONS and CACHED in parts[9:]
+
+
+def has_more(parts):
+    return parts[3] in REPLY_OPERATIONS and MORE in parts[9:]
+
+
+def reply_route(parts):
+    if parts[3] in REPLY_OPERATIONS:
+        for option in parts[9:]:
+            if option.startswith(ROUTE_PREFIX):
+                return option[len(ROUTE_PREFIX) :]
+    return None
+
+
+def encode(parts, binary=False):
+    if binary and parts[3] in OPERATIONS:
+        try:
+            return encode_binary(parts)
+        except ProtocolError:
+            pass
+    return encode_text(parts)
+
+
+@lru_cache(maxsize=4096)
+def pack_origin(origin):
+    address, port = origin.split(":")
+    return socket.inet_aton(address), int(port)
+
+
+@lru_cache(maxsize=4096)
+def unpack_origin(address, port):
+    return f"{socket.inet_ntoa(address)}:{port}"
+
+
+def pack_string(text):
+    data = text.encode()
+    return LENGTH.pack(len(data)) + data
+
+
+def unpack_string(payload, offset, end):
+    (length,) = LENGTH.unpack_from(payload, offset)
+    start = offset + LENGTH.size
+    stop = start + length
+    if stop > end:
+        raise ProtocolError("Campo truncado no quadro binario")
+    return payload[start:stop].decode(), stop
+
+
+def decode_binary(payload, offset=0, end=None):
+    if end is None:
+        end = len(payload)
+    try:
+        (
+            operation,
+            mode,
+            origin_address,
+            origin_port,
+            seq_no,
+            ttl,
+            last_hop_port,
+            hop_count,
+            length,
+        ) = KEYED_HEADER.unpack_from(payload, offset)
+        flags = operation & (CACHED_FLAG | MORE_FLAG | ROUTED_FLAG)
+        operation = OPERATION_NAMES[operation & ~flags]
+        mode = MODE_NAMES[mode]
+        offset += KEYED_HEADER.size
+        if offset + length > end:
+            raise ProtocolError("Campo truncado no quadro binario")
+        key = payload[offset : offset + length].decode()
+        offset += length
+        origin = unpack_origin(origin_address, origin_port)
+        if operation in SEARCH_OPERATIONS:
+            return Frame((origin, seq_no, ttl, operation, mode, last_hop_port, key, hop_count))
+        if operation in SEARCH_LAYOUT:
+            return [origin, seq_no, ttl, operation, mode, last_hop_port, key, hop_count]
+        value, offset = unpack_string(payload, offset, end)
+        parts = [origin, seq_no, ttl, operation, mode, key, value, hop_count]
+        if offset + SEARCH_SEQ.size <= end:
+            parts.append(SEARCH_SEQ.unpack_from(payload, offset)[0])
+            offset += SEARCH_SEQ.size
+            if flags & CACHED_FLAG:
+                parts.append(CACHED)
+            if flags & MORE_FLAG:
+                parts.append(MORE)
+            if flags & ROUTED_FLAG:
+                if offset + ORIGIN.size > end:
+                    raise ProtocolError("Origem da rota truncada no quadro binario")
+                route = unpack_origin(*ORIGIN.unpack_from(payload, offset))
+                parts.append(ROUTE_PREFIX + route)
+        return parts
+    except (KeyError, struct.error) as e:
+        raise ProtocolError(f"Quadro binario invalido: {e}")
+
+
+class Frame(list):
+    # Busca decodificada de um quadro binario, com os bytes do quadro
+    __slots__ = ("raw",)
+
+
+def relay_frame(source, parts):
+    # Quadro de parts a partir do quadro recebido em source, trocando so os
+    # campos de repasse; None se source nao veio de um quadro binario ou se
+    # outro campo mudou (por exemplo, chaves ja respondidas neste no)
+    raw = getattr(source, "raw", None)
+    if raw is None or source[:2] != parts[:2] or source[3:5] != parts[3:5] or source[6] != parts[6]:
+        return None
+    frame = bytearray(raw)
+    RELAY_FIELDS.pack_into(frame, RELAY_OFFSET, int(parts[2]), int(parts[5]), int(parts[7]))
+    return frame
+
+
+class FrameDecoder:
+    # Remonta mensagens a partir de pedacos arbitrarios do fluxo TCP. Aceita
+    # tanto linhas de texto terminadas em \n quanto quadros binarios.
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while self.buffer:
+            if self.buffer[0] == MAGIC:
+                message = self.next_binary()
+            else:
+                message = self.next_text()
+            if message is None:
+                break
+            if message:
+                messages.append(message)
+        return messages
+
+    def next_binary(self):
+        if len(self.buffer) < FRAME_HEADER.size:
+            return None
+        _, version, length = FRAME_HEADER.unpack_from(self.buffer, 0)
+        if version != VERSION:
+            raise ProtocolError(f"Versao de protocolo desconhecida: {version}")
+        end = FRAME_HEADER.size + length
+        if len(self.buffer) < end:
+            return None
+        message = decode_binary(self.buffer, FRAME_HEADER.size, end)
+        if isinstance(message, Frame):
+            message.raw = self.buffer[:end]
+        del self.buffer[:end]
+        return message
+
+    def next_text(self):
+        end = self.buffer.find(b"\n")
+        if end < 0:
+            if len(self.buffer) > self.max_frame_size:
+                raise ProtocolError("Mensagem de texto excede o tamanho maximo")
+            return None
+        line = bytes(self.buffer[:end])
+        del self.buffer[: end + 1]
+        return decode_text(line.decode())
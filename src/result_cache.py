@@ -0,0 +1,45 @@
+import threading
+import time
+from dedup import ExpiringDict
+
+
+class ResultCache:
+    # Cache de respostas VAL observadas por este no. A ExpiringDict e
+    # regravada a cada acerto (LRU); o TTL absoluto e conferido pelo horario
+    # em que a resposta foi armazenada.
+    def __init__(self, max_entries=1024, ttl=60.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = ExpiringDict(max_entries, ttl, clock)
+        self.lock = threading.Lock()
+        self.counters = {"stored": 0, "hits": 0, "misses": 0, "hops_saved": 0}
+
+    def store(self, key, value, holder, hop_count):
+        with self.lock:
+            self.entries[key] = (self.clock(), value, holder, hop_count)
+            self.counters["stored"] += 1
+
+    def lookup(self, key, hop_count=0):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None or self.clock() - item[0] > self.ttl:
+                self.entries.pop(key)
+                self.counters["misses"] += 1
+                return None
+            self.entries[key] = item
+            self.counters["hits"] += 1
+            # Estimativa: o VAL original precisou de item[3] saltos; a busca
+            # atual para aqui, com hop_count saltos.
+            self.counters["hops_saved"] += max(0, item[3] - hop_count)
+            _, value, holder, hops = item
+            return value, holder, hops
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            lookups = snapshot["hits"] + snapshot["misses"]
+            snapshot["hit_ratio"] = snapshot["hits"] / lookups if lookups else 0
+            snapshot["entries"] = len(self.entries)
+            snapshot["evicted_ttl"] = self.entries.evictions["ttl"]
+            snapshot["evicted_size"] = self.entries.evictions["size"]
+        return snapshot
@@ -0,0 +1,69 @@
+import random
+import threading
+from dedup import ExpiringDict
+
+
+class RoutingHints:
+    # Indice de roteamento aprendido com as respostas VAL: para cada prefixo
+    # de chave, quantas vezes cada vizinho levou a uma resposta. O prefixo
+    # None e a chave inteira. Na escolha vale o prefixo mais longo com
+    # alguma informacao; com probabilidade explore (ou sem informacao) a
+    # escolha continua uniforme.
+    def __init__(self, max_entries=10000, ttl=600.0, prefix_lengths=(None, 3), explore=0.1):
+        self.prefix_lengths = prefix_lengths
+        self.explore = explore
+        self.index = ExpiringDict(max_entries, ttl)
+        # (origem, seq_no) -> vizinho para onde este no encaminhou a busca
+        self.forwards = ExpiringDict(max_entries, ttl)
+        self.lock = threading.Lock()
+        self.counters = {"learned": 0, "hinted": 0, "explored": 0, "uniform": 0}
+
+    def prefixes(self, key):
+        return [key if length is None else key[:length] for length in self.prefix_lengths]
+
+    def remember(self, msg_id, neighbor):
+        with self.lock:
+            self.forwards[msg_id] = neighbor
+
+    def learn(self, msg_id, keys, holder, neighbors):
+        with self.lock:
+            neighbor = holder if holder in neighbors else self.forwards.get(msg_id)
+            if neighbor is None:
+                return
+            for key in keys:
+                for prefix in self.prefixes(key):
+                    hits = self.index.get(prefix) or {}
+                    hits[neighbor] = hits.get(neighbor, 0) + 1
+                    self.index[prefix] = hits
+            self.counters["learned"] += 1
+
+    def choose(self, candidates, keys):
+        if random.random() < self.explore:
+            self.count("explored")
+            return random.choice(candidates)
+        with self.lock:
+            for level in range(len(self.prefix_lengths)):
+                scores = dict.fromkeys(candidates, 0)
+                for key in keys:
+                    hits = self.index.get(self.prefixes(key)[level]) or {}
+                    for candidate in candidates:
+                        scores[candidate] += hits.get(candidate, 0)
+                best = max(scores.values())
+                if best:
+                    self.counters["hinted"] += 1
+                    return random.choice(
+                        [candidate for candidate in candidates if scores[candidate] == best]
+                    )
+            self.counters["uniform"] += 1
+        return random.choice(candidates)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = dict(self.counters)
+            snapshot["prefixes"] = len(self.index)
+            snapshot["forwards"] = len(self.forwards)
+        return snapshot
@@ -1,135 +1,576 @@
 import random
+from logger import debug, log
+from protocol import (
+    CACHED,
+    CANCEL,
+    MORE,
+    ROUTE_PREFIX,
+    decode_keys,
+    encode_keys,
+    split_batch,
+)
+from storage import parse_prefix_query, prefix_page
 
 
 class SearchStrategy:
-    def __init__(self, peer_node):
+    mode = None
+    # Se a origem manda CANCEL quando a busca termina
+    cancellable = True
+
+    def __init__(self, peer_node, batched=False):
         self.peer_node = peer_node
+        self.batched = batched
+        self.last_hop_port = None
 
     def search(self, key, parts=None, client_socket=None):
         pass
 
 
-class FloodingSearchStrategy(SearchStrategy):
+class BaseSearchStrategy(SearchStrategy):
+    def parse_message(self, parts):
+        self.batched = parts[3] == "MSEARCH"
+        origin = parts[0]
+        seq_no = int(parts[1])
+        ttl = int(parts[2])
+        last_hop_port = int(parts[5])
+        hop_count = int(parts[7])
+        self.last_hop_port = last_hop_port
+        return origin, seq_no, ttl, last_hop_port, hop_count
+
+    def message_seen(self, origin, seq_no):
+        msg_id = (origin, seq_no)
+        if self.peer_node.seen_messages.check_and_add(msg_id):
+            debug("Mensagem %s já vista, descartando", msg_id)
+            return True
+        return False
+
+    def search_cancelled(self, origin, seq_no):
+        msg_id = (origin, seq_no)
+        if msg_id in self.peer_node.cancelled_searches:
+            debug("Busca %s cancelada pela origem, descartando", msg_id)
+            return True
+        return False
+
+    def remember_next_hop(self, msg_id, *neighbors):
+        # Caminho de ida dos caminhantes (RW/KW), seguido pelo CANCEL; o
+        # roteamento por resumo pode dividir a busca entre varios vizinhos
+        self.peer_node.forward_paths[msg_id] = neighbors
+
+    def cancel(self, parts):
+        # Marca a busca como cancelada e repassa o CANCEL pelo caminho dela;
+        # cada no repassa so o primeiro CANCEL que recebe
+        origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
+        msg_id = (origin, seq_no)
+        if self.peer_node.cancelled_searches.check_and_add(msg_id):
+            return
+        ttl -= 1
+        if ttl == 0:
+            return
+        message = [origin, seq_no, ttl, CANCEL, self.mode, self.peer_node.port, parts[6], hop_count + 1]
+        self.forward_cancel(message, msg_id, last_hop_port)
+
+    def forward_cancel(self, message, msg_id, last_hop_port):
+        for next_hop in self.peer_node.forward_paths.pop(msg_id) or ():
+            self.peer_node.message_handler.send_message(message, next_hop)
+
+    def launch(self, record, keys, ttl):
+        record.rings.append(ttl)
+        parts = self.origin_message(record.seq_no, ttl, keys)
+        self.search(parts[6], parts)
+
+    def origin_message(self, seq_no, ttl, keys):
+        origin = f"{self.peer_node.address}:{self.peer_node.port}"
+        key = encode_keys(keys) if self.batched else keys[0]
+        return self.create_message(origin, seq_no, ttl, key, 0, self.mode)
+
+    def answer_local(self, key, origin, hop_count, seq_no):
+        # Responde o que este no tiver e devolve o campo de chave que ainda
+        # precisa ser buscado, ou None quando nao ha mais nada a buscar.
+        if not self.batched:
+            if parse_prefix_query(key) is not None:
+                self.prefix_found(key, origin, hop_count, seq_no)
+                return key
+            return None if self.key_found(key, origin, hop_count, seq_no) else key
+
+        keys = decode_keys(key)
+        found = {}
+        cached = {}
+        for key in keys:
+            if parse_prefix_query(key) is not None:
+                self.prefix_found(key, origin, hop_count, seq_no)
+                continue
+            value, from_cache = self.lookup_value(key, hop_count)
+            if value is not None:
+                (cached if from_cache else found)[key] = value
+        for values, from_cache in ((found, False), (cached, True)):
+            if values:
+                self.send_batch(values.items(), origin, hop_count, seq_no, from_cache)
+        if found or cached:
+            log(
+                "Valores encontrados para %d de %d chaves",
+                "INFO",
+                len(found) + len(cached),
+                len(keys),
+            )
+        remaining = [key for key in keys if key not in found and key not in cached]
+        return encode_keys(remaining) if remaining else None
+
+    def prefix_found(self, query, origin, hop_count, seq_no):
+        # Busca por prefixo: responde uma pagina das chaves locais e a busca
+        # segue adiante, pois outros nos podem ter mais chaves
+        pairs, more = prefix_page(
+            self.peer_node.key_value_store, query, self.peer_node.prefix_limit
+        )
+        if not pairs:
+            return
+        self.send_batch(pairs, origin, hop_count, seq_no, more=more)
+        log(
+            "%d chaves com o prefixo de %s%s",
+            "INFO",
+            len(pairs),
+            query,
+            " (ha mais)" if more else "",
+        )
+
+    def send_batch(self, pairs, origin, hop_count, seq_no, cached=False, more=False):
+        # Um MVAL por parte que cabe em um quadro; MORE vai so na ultima, cuja
+        # ultima chave e a da pagina
+        batches = list(split_batch(pairs))
+        for i, batch in enumerate(batches):
+            self.send_reply(
+                "MVAL",
+                encode_keys(key for key, _ in batch),
+                encode_keys(value for _, value in batch),
+                origin,
+                hop_count,
+                seq_no,
+                cached,
+                more and i == len(batches) - 1,
+            )
+
+    def key_found(self, key, origin, hop_count, seq_no=None):
+        value, cached = self.lookup_value(key, hop_count)
+        if value is not None:
+            self.send_reply("VAL", key, value, origin, hop_count, seq_no, cached)
+            log("Valor encontrado! Chave: %s valor: %s", "INFO", key, value)
+            return True
+        return False
+
+    def lookup_value(self, key, hop_count):
+        value = self.peer_node.key_value_store.get(key)
+        if value is not None:
+            return value, False
+        if self.peer_node.result_cache is not None:
+            hit = self.peer_node.result_cache.lookup(key, hop_count)
+            if hit is not None:
+                return hit[0], True
+        return None, False
+
+    def send_reply(
+        self, operation, key, value, origin, hop_count, seq_no, cached=False, more=False
+    ):
+        response = [
+            f"{self.peer_node.address}:{self.peer_node.port}",
+            self.peer_node.next_sequence_number(),
+            self.peer_node.ttl_default,
+            operation,
+            self.mode,
+            key,
+            value,
+            hop_count,
+        ]
+        target = self.reply_target(origin, hop_count)
+        if seq_no is not None or cached or more or target != origin:
+            # seq_no da busca original, para a origem associar a resposta
+            response.append(seq_no or 0)
+        if cached:
+            response.append(CACHED)
+        if more:
+            response.append(MORE)
+        if target != origin:
+            response.append(ROUTE_PREFIX + origin)
+        self.peer_node.message_handler.send_message(response, target)
+
+    def reply_target(self, origin, hop_count):
+        # No modo reverso a resposta vai para o salto anterior, que a repassa
+        # ate a origem pelas conexoes ja abertas entre vizinhos.
+        if (
+            self.peer_node.reply_mode != "reverse"
+            or self.last_hop_port is None
+            or hop_count <= 1
+        ):
+            return origin
+        return self.peer_node.neighbor_for_port(self.last_hop_port)
+
+    def route_by_digest(self, origin, seq_no, ttl, key, hop_count, last_hop_port):
+        # Antes da estrategia: se o resumo de chaves de algum vizinho indica
+        # todas as chaves, a busca vai direto para ele. Um falso positivo so
+        # faz o vizinho seguir com a estrategia normal a partir dali.
+        digests = self.peer_node.key_digests
+        if digests is None:
+            return False
+        candidates = self.peer_node.neighbors.excluding_port(last_hop_port)
+        routes = {}
+        for search_key in decode_keys(key) if self.batched else [key]:
+            if parse_prefix_query(search_key) is not None:
+                # O resumo so responde por chaves exatas
+                return False
+            matches = digests.matches(search_key, candidates)
+            if not matches:
+                return False
+            routes.setdefault(matches[0], []).append(search_key)
+        for neighbor, keys in routes.items():
+            field = encode_keys(keys) if self.batched else keys[0]
+            new_message = self.create_message(origin, seq_no, ttl, field, hop_count + 1, self.mode)
+            self.peer_node.message_handler.send_message(new_message, neighbor)
+            digests.count("routed")
+        # Vizinhos para onde a busca foi (verdadeiro se houve roteamento)
+        return list(routes)
+
+    def choose_neighbor(self, candidates, key, msg_id):
+        hints = self.peer_node.routing_hints
+        if hints is None:
+            return random.choice(candidates)
+        neighbor = hints.choose(candidates, decode_keys(key) if self.batched else [key])
+        hints.remember(msg_id, neighbor)
+        return neighbor
+
+    def create_message(self, origin, seq_no, ttl, key, hop_count, method):
+        operation = "MSEARCH" if self.batched else "SEARCH"
+        return [origin, seq_no, ttl, operation, method, self.peer_node.port, key, hop_count]
+
+    def forward_message(self, new_message, last_hop_port, source=None):
+        # source: mensagem recebida, cujo quadro binario pode ser reaproveitado
+        self.peer_node.message_handler.forward(
+            new_message, self.peer_node.neighbors.excluding_port(last_hop_port), source
+        )
+
+
+class FloodingSearchStrategy(BaseSearchStrategy):
+    mode = "FL"
+
     def search(self, key, parts=None, client_socket=None):
         origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
-        if self.message_seen(origin, seq_no):
+        if self.message_seen(origin, seq_no) or self.search_cancelled(origin, seq_no):
             return
-        if self.key_found(key, origin, hop_count):
+        key = self.answer_local(key, origin, hop_count, seq_no)
+        if key is None:
             return
 
         ttl -= 1
         if ttl == 0:
             return
+        if self.route_by_digest(origin, seq_no, ttl, key, hop_count, last_hop_port):
+            return
 
         hop_count += 1
-        new_message = self.create_message(origin, seq_no, ttl, key, hop_count, "FL")
-        self.forward_message(new_message, last_hop_port)
+        new_message = self.create_message(origin, seq_no, ttl, key, hop_count, self.mode)
+        self.forward_message(new_message, last_hop_port, parts)
+
+    def forward_cancel(self, message, msg_id, last_hop_port):
+        # So quem ja repassou a busca repassa o CANCEL; um no que ainda nao
+        # a viu so a marca, e a descarta quando ela chegar
+        if msg_id in self.peer_node.seen_messages:
+            self.forward_message(message, last_hop_port)
+
+
+class ExpandingRingSearchStrategy(FloodingSearchStrategy):
+    # Na origem, inunda com TTL pequeno e, se nenhum VAL chegar dentro do
+    # prazo, repete com TTL multiplicado por ring_growth ate o TTL pedido.
+    # Cada rodada usa um seq_no novo, entao a supressao de duplicatas por
+    # (origem, seq_no) funciona sem mudancas. Nos demais nos e uma inundacao
+    # comum.
+    mode = "ER"
+
+    def launch(self, record, keys, ttl):
+        ring_ttl = min(self.peer_node.ring_initial_ttl, ttl)
+        self.ring(record, keys, ring_ttl, ttl, record.seq_no)
+
+    def ring(self, record, keys, ttl, max_ttl, seq_no=None):
+        keys = [key for key in keys if key not in record.resolved]
+        if not keys or record.finished:
+            return
+        if seq_no is None:
+            seq_no = self.peer_node.next_sequence_number()
+            self.peer_node.searches.alias(seq_no, record)
+            log("Nenhuma resposta com TTL %d, tentando TTL %d", "INFO", record.rings[-1], ttl)
+        record.rings.append(ttl)
+        parts = self.origin_message(seq_no, ttl, keys)
+        self.search(parts[6], parts)
+        if ttl < max_ttl:
+            self.peer_node.schedule(
+                self.peer_node.ring_timeout,
+                self.ring,
+                record,
+                keys,
+                # Cada rodada cresce pelo menos um salto
+                min(max(ttl + 1, ttl * self.peer_node.ring_growth), max_ttl),
+                max_ttl,
+            )
 
 
-class DepthFirstSearchStrategy(SearchStrategy):
+class DepthState:
+    # Estado de um no em uma busca BP: de quem veio a busca (None na
+    # origem), filhos com a busca em andamento e vizinhos ainda nao tentados
+    __slots__ = ("parent", "active", "candidates")
+
+    def __init__(self, parent, candidates):
+        self.parent = parent
+        self.active = set()
+        self.candidates = candidates
+
+
+# Marca de busca BP encerrada neste no: ocupa bem menos que o DepthState e
+# ainda faz o no devolver visitas repetidas ate a entrada expirar
+FINISHED = "FIM"
+
+
+class DepthFirstSearchStrategy(BaseSearchStrategy):
+    # Busca em profundidade: cada no repassa a busca a um vizinho ainda nao
+    # tentado por vez (peer_node.depth_branches por vez, na variante em
+    # paralelo) e so devolve a busca ao pai depois que todos os filhos
+    # voltaram. Um no ja visitado devolve a busca na hora a quem a mandou,
+    # que a trata como um filho que voltou.
+    mode = "BP"
+
     def search(self, key, parts=None, client_socket=None):
         origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
-        if self.key_found(key, origin, hop_count):
+        if self.search_cancelled(origin, seq_no):
             return
+        msg_id = (origin, seq_no)
+        sender = self.peer_node.neighbor_for_port(last_hop_port) if hop_count else None
+        info = self.peer_node.depth_search_info
+        with info.lock_for(msg_id):
+            state = info.get(msg_id)
+            if state is None:
+                candidates = [
+                    neighbor for neighbor in self.peer_node.neighbors if neighbor != sender
+                ]
+                state = info[msg_id] = DepthState(sender, candidates)
+                first_visit = True
+            else:
+                first_visit = False
+        if first_visit:
+            self.visit(msg_id, state, key, ttl, hop_count, last_hop_port)
+        else:
+            self.child_returned(msg_id, state, sender, key, ttl, hop_count)
 
+    def visit(self, msg_id, state, key, ttl, hop_count, last_hop_port):
+        origin, seq_no = msg_id
+        key = self.answer_local(key, origin, hop_count, seq_no)
+        if key is None:
+            # Encontrada aqui: a busca para e os ancestrais expiram
+            self.finish(msg_id)
+            return
         ttl -= 1
         if ttl == 0:
+            self.finish(msg_id)
             return
+        routed = self.route_by_digest(origin, seq_no, ttl, key, hop_count, last_hop_port)
+        info = self.peer_node.depth_search_info
+        with info.lock_for(msg_id):
+            if info.get(msg_id) is not state:
+                # Cancelada enquanto respondia
+                return
+            if routed:
+                # Um falso positivo do resumo volta como um filho qualquer
+                state.active.update(routed)
+                state.candidates = [
+                    neighbor for neighbor in state.candidates if neighbor not in routed
+                ]
+                return
+            children = self.next_children(msg_id, state, key)
+        self.descend(msg_id, state, children, key, ttl, hop_count)
 
-        msg_id = (origin, seq_no)
-        if msg_id not in self.peer_node.depth_search_info:
-            self.init_depth_info(msg_id)
-        info = self.peer_node.depth_search_info[msg_id]
+    def child_returned(self, msg_id, state, sender, key, ttl, hop_count):
+        ttl -= 1
+        info = self.peer_node.depth_search_info
+        with info.lock_for(msg_id):
+            bounce = state is FINISHED or sender not in state.active
+            if not bounce:
+                state.active.discard(sender)
+                children = self.next_children(msg_id, state, key) if ttl > 0 else []
+        if bounce:
+            # Ja visitado por outro caminho: devolve a quem mandou
+            debug("BP: %s ja visitado, devolvendo a mensagem para %s", msg_id, sender)
+            if ttl > 0:
+                self.send_depth(msg_id, key, ttl, hop_count, sender)
+            return
+        if ttl > 0:
+            self.descend(msg_id, state, children, key, ttl, hop_count)
 
-        if not info["vizinhos_candidatos"]:
-            self.backtrack_message(
-                origin, seq_no, ttl, key, hop_count, info, last_hop_port
-            )
+    def next_children(self, msg_id, state, key):
+        # Chamado com o lock da busca: completa os filhos ativos ate o limite
+        children = []
+        while state.candidates and len(state.active) < self.peer_node.depth_branches:
+            child = self.choose_neighbor(state.candidates, key, msg_id)
+            state.candidates.remove(child)
+            state.active.add(child)
+            children.append(child)
+        return children
+
+    def descend(self, msg_id, state, children, key, ttl, hop_count):
+        for child in children:
+            self.send_depth(msg_id, key, ttl, hop_count, child)
+        if children or state.active:
+            return
+        self.finish(msg_id)
+        if state.parent is None:
+            log("BP: Não foi possível localizar a chave %s", "INFO", key)
             return
+        debug("BP: Nenhum vizinho encontrou a chave, retrocedendo para %s", state.parent)
+        self.send_depth(msg_id, key, ttl, hop_count, state.parent)
 
-        next_neighbor = random.choice(info["vizinhos_candidatos"])
-        info["vizinho_ativo"] = next_neighbor
-        info["vizinhos_candidatos"].remove(next_neighbor)
+    def send_depth(self, msg_id, key, ttl, hop_count, neighbor):
+        origin, seq_no = msg_id
+        new_message = self.create_message(origin, seq_no, ttl, key, hop_count + 1, self.mode)
+        self.peer_node.message_handler.send_message(new_message, neighbor)
 
-        new_message = self.create_message(origin, seq_no, ttl, key, hop_count + 1, "BP")
-        self.peer_node.message_handler.send_message(new_message, next_neighbor)
+    def finish(self, msg_id):
+        self.peer_node.depth_search_info[msg_id] = FINISHED
+
+    def forward_cancel(self, message, msg_id, last_hop_port):
+        # O CANCEL desce pelos filhos que ainda estao com a busca
+        info = self.peer_node.depth_search_info
+        with info.lock_for(msg_id):
+            state = info.get(msg_id)
+            children = list(state.active) if isinstance(state, DepthState) else []
+            if state is not None:
+                info[msg_id] = FINISHED
+        for child in children:
+            self.peer_node.message_handler.send_message(message, child)
 
 
-class RandomWalkSearchStrategy(SearchStrategy):
+class RandomWalkSearchStrategy(BaseSearchStrategy):
+    mode = "RW"
+
     def search(self, key, parts=None, client_socket=None):
-        pass
+        origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
+        if self.search_cancelled(origin, seq_no):
+            return
+        key = self.answer_local(key, origin, hop_count, seq_no)
+        if key is None:
+            return
 
+        ttl -= 1
+        if ttl == 0:
+            return
+        self.walk(origin, seq_no, ttl, key, hop_count, last_hop_port)
 
-class SearchStrategyContext:
-    def __init__(self):
-        self.strategy = None
+    def walk(self, origin, seq_no, ttl, key, hop_count, last_hop_port):
+        routed = self.route_by_digest(origin, seq_no, ttl, key, hop_count, last_hop_port)
+        if routed:
+            self.remember_next_hop((origin, seq_no), *routed)
+            return
+        neighbors = self.peer_node.neighbors.snapshot()
+        candidates = self.peer_node.neighbors.excluding_port(last_hop_port)
+        if candidates:
+            next_neighbor = self.choose_neighbor(candidates, key, (origin, seq_no))
+        elif neighbors:
+            next_neighbor = neighbors[0]
+        else:
+            return
+        self.remember_next_hop((origin, seq_no), next_neighbor)
+        new_message = self.create_message(origin, seq_no, ttl, key, hop_count + 1, self.mode)
+        self.peer_node.message_handler.send_message(new_message, next_neighbor)
 
-    def set_strategy(self, strategy):
-        self.strategy = strategy
 
-    def search(self, key, parts=None, client_socket=None):
-        if self.strategy:
-            self.strategy.search(key, parts, client_socket)
+class KRandomWalkSearchStrategy(RandomWalkSearchStrategy):
+    # A origem solta peer_node.walkers caminhantes, cada um com seu seq_no.
+    # A cada peer_node.walk_check_interval saltos o caminhante consulta a
+    # origem (CHECK) e so segue quando ela responde WALK com as chaves que
+    # ainda faltam; se a busca ja terminou, a origem nao responde e o
+    # caminhante para ali. As chaves seguem sempre no formato em lote. No
+    # CHECK o campo de origem leva o no onde o caminhante esta; a origem da
+    # busca e quem recebe o CHECK.
+    mode = "KW"
+    # Os caminhantes ja param na consulta seguinte a origem
+    cancellable = False
 
+    def __init__(self, peer_node, batched=True):
+        super().__init__(peer_node, True)
 
-class BaseSearchStrategy(SearchStrategy):
     def parse_message(self, parts):
-        origin = parts[0]
-        seq_no = int(parts[1])
-        ttl = int(parts[2])
-        last_hop_port = int(parts[5])
-        hop_count = int(parts[7])
-        return origin, seq_no, ttl, last_hop_port, hop_count
+        values = super().parse_message(parts)
+        self.batched = True
+        return values
 
-    def message_seen(self, origin, seq_no):
-        msg_id = (origin, seq_no)
-        if msg_id in self.peer_node.seen_messages:
-            print(f"Mensagem {msg_id} já vista, descartando")
-            return True
-        self.peer_node.seen_messages.add(msg_id)
-        return False
+    def launch(self, record, keys, ttl):
+        record.rings.append(ttl)
+        neighbors = self.peer_node.neighbors.snapshot()
+        if not neighbors:
+            return
+        neighbors = random.sample(neighbors, len(neighbors))
+        key = encode_keys(keys)
+        for walker in range(self.peer_node.walkers):
+            seq_no = record.seq_no
+            if walker:
+                seq_no = self.peer_node.next_sequence_number()
+                self.peer_node.searches.alias(seq_no, record)
+            neighbor = neighbors[walker % len(neighbors)]
+            record.add_walker(seq_no, neighbor)
+            self.peer_node.stats.record_walker("launched")
+            origin = f"{self.peer_node.address}:{self.peer_node.port}"
+            if self.peer_node.routing_hints is not None:
+                self.peer_node.routing_hints.remember((origin, seq_no), neighbor)
+            self.remember_next_hop((origin, seq_no), neighbor)
+            message = self.create_message(origin, seq_no, ttl - 1, key, 1, self.mode)
+            self.peer_node.message_handler.send_message(message, neighbor)
 
-    def key_found(self, key, origin, hop_count):
-        if key in self.peer_node.key_value_store:
-            value = self.peer_node.key_value_store[key]
-            response = f"{self.peer_node.address}:{self.peer_node.port} {self.peer_node.sequence_number} {self.peer_node.ttl_default} VAL BP {key} {value} {hop_count}\n"
-            self.peer_node.sequence_number += 1
-            self.peer_node.message_handler.send_message(response, origin)
-            print(f"Valor encontrado! Chave: {key} valor: {value}")
-            return True
-        return False
+    def search(self, key, parts=None, client_socket=None):
+        origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
+        if self.search_cancelled(origin, seq_no):
+            return
+        key = self.answer_local(key, origin, hop_count, seq_no)
+        if key is None:
+            return
 
-    def create_message(self, origin, seq_no, ttl, key, hop_count, method):
-        return f"{origin} {seq_no} {ttl} SEARCH {method} {self.peer_node.port} {key} {hop_count}\n"
-
-    def forward_message(self, new_message, last_hop_port):
-        for neighbor in self.peer_node.neighbors:
-            if neighbor.split(":")[1] != str(last_hop_port):
-                self.peer_node.message_handler.send_message(new_message, neighbor)
-
-    def init_depth_info(self, msg_id):
-        self.peer_node.depth_search_info[msg_id] = {
-            "noh_mae": f"{self.peer_node.address}:{self.peer_node.port}",
-            "vizinhos_candidatos": self.peer_node.neighbors[:],
-            "vizinho_ativo": None,
-        }
-
-    def backtrack_message(
-        self, origin, seq_no, ttl, key, hop_count, info, last_hop_port
-    ):
-        if (
-            info["vizinho_ativo"]
-            and info["vizinho_ativo"] != f"{self.peer_node.address}:{last_hop_port}"
-        ):
-            print("BP: Ciclo detectado, devolvendo a mensagem...")
-            self.peer_node.message_handler.send_message(
-                f"{origin} {seq_no} {ttl} SEARCH BP {self.peer_node.port} {key} {hop_count + 1}\n",
-                f"{self.peer_node.address}:{last_hop_port}",
-            )
+        # A origem ja desconta um salto ao soltar o caminhante: com TTL 1 ele
+        # chega aqui com 0
+        ttl -= 1
+        if ttl <= 0:
             return
-        if not info["vizinhos_candidatos"]:
-            print("BP: Nenhum vizinho encontrou a chave, retrocedendo...")
-            self.peer_node.message_handler.send_message(
-                f"{origin} {seq_no} {ttl} SEARCH BP {self.peer_node.port} {key} {hop_count + 1}\n",
-                info["noh_mae"],
-            )
+
+        if hop_count % self.peer_node.walk_check_interval == 0:
+            # O CHECK leva a porta do salto anterior, que volta no WALK para
+            # o caminhante nao retornar direto por onde veio
+            here = f"{self.peer_node.address}:{self.peer_node.port}"
+            check = [here, seq_no, ttl, "CHECK", self.mode, last_hop_port, key, hop_count]
+            self.peer_node.message_handler.send_message(check, origin)
+            return
+        self.walk(origin, seq_no, ttl, key, hop_count, last_hop_port)
+
+    def check_back(self, parts):
+        # Executado na origem
+        walker_node, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
+        origin = f"{self.peer_node.address}:{self.peer_node.port}"
+        stats = self.peer_node.stats
+        stats.record_walker("checks")
+        record = self.peer_node.searches.get(seq_no)
+        if record is not None:
+            record.walker_checked(seq_no, hop_count)
+        keys = []
+        if record is not None and not record.finished:
+            keys = [key for key in decode_keys(parts[6]) if key not in record.resolved]
+        if not keys:
+            if record is not None:
+                record.walker_stopped(seq_no)
+            stats.record_walker("stopped")
+            return
+        stats.record_walker("continued")
+        message = [origin, seq_no, ttl, "WALK", self.mode, last_hop_port, encode_keys(keys), hop_count]
+        self.peer_node.message_handler.send_message(message, walker_node)
+
+    def resume(self, parts):
+        # Executado no no onde o caminhante aguardava a resposta da origem
+        origin, seq_no, ttl, last_hop_port, hop_count = self.parse_message(parts)
+        self.walk(origin, seq_no, ttl, parts[6], hop_count, last_hop_port)
+
+
+STRATEGIES = {
+    "FL": FloodingSearchStrategy,
+    "RW": RandomWalkSearchStrategy,
+    "BP": DepthFirstSearchStrategy,
+    "ER": ExpandingRingSearchStrategy,
+    "KW": KRandomWalkSearchStrategy,
+}
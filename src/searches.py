@@ -0,0 +1,260 @@
+import threading
+import time
+from concurrent.futures import Future
+from dedup import StripedExpiringDict
+from storage import parse_prefix_query, prefix_query
+
+
+class SearchRecord:
+    def __init__(self, seq_no, keys, mode, max_matches=256, first=None):
+        self.seq_no = seq_no
+        self.keys = list(keys)
+        self.mode = mode
+        self.max_matches = max_matches
+        # Com first, a busca termina no first-esimo resultado e as respostas
+        # seguintes sao descartadas
+        self.first = first
+        # seq_no de cada rodada (ER) ou caminhante (KW) da busca
+        self.seq_nos = [seq_no]
+        # Consultas por prefixo: chaves aceitas, descartadas pelo limite e
+        # menor ultima chave entre as paginas marcadas com MORE
+        self.prefixes = {}
+        for key in self.keys:
+            query = parse_prefix_query(key)
+            if query is not None:
+                self.prefixes[key] = {
+                    "prefix": query[0],
+                    "after": query[1],
+                    "matches": {},
+                    "dropped": 0,
+                    "more": None,
+                }
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.results = []
+        self.resolved = set()
+        # TTL de cada rodada (mais de uma so na inundacao em aneis crescentes)
+        self.rings = []
+        # seq_no -> estado de cada caminhante (modo KW)
+        self.walkers = {}
+        self.event = threading.Event()
+        # "done" ou "expired" quando a busca termina; o future recebe o
+        # proprio registro
+        self.outcome = None
+        self.future = Future()
+
+    # O estado dos caminhantes muda nas threads que recebem CHECK e VAL
+    def add_walker(self, seq_no, neighbor):
+        with self.lock:
+            self.walkers[seq_no] = {
+                "walker": len(self.walkers),
+                "neighbor": neighbor,
+                "checks": 0,
+                "hops": 0,
+                "status": "walking",
+            }
+
+    def walker_checked(self, seq_no, hop_count):
+        with self.lock:
+            walker = self.walkers.get(seq_no)
+            if walker is not None:
+                walker["checks"] += 1
+                walker["hops"] = hop_count
+
+    def walker_stopped(self, seq_no):
+        with self.lock:
+            walker = self.walkers.get(seq_no)
+            if walker is not None and walker["status"] == "walking":
+                walker["status"] = "stopped"
+
+    def query_for(self, key):
+        # Consulta da busca que a chave responde, ou None
+        if key in self.keys and key not in self.prefixes:
+            return key
+        for query, state in self.prefixes.items():
+            if key.startswith(state["prefix"]) and (state["after"] is None or key > state["after"]):
+                return query
+        return None
+
+    def keep_match(self, query, result):
+        # Mantem as max_matches menores chaves de cada consulta; assim toda
+        # chave descartada fica depois da ultima aceita e a proxima pagina
+        # pode comecar dali
+        state = self.prefixes[query]
+        matches = state["matches"]
+        key = result["key"]
+        with self.lock:
+            if key in matches or not self.accepting(query):
+                return False
+            if len(matches) >= self.max_matches:
+                state["dropped"] += 1
+                largest = max(matches)
+                if key > largest:
+                    return False
+                self.results.remove(matches.pop(largest))
+            matches[key] = result
+            self.results.append(result)
+        return True
+
+    def page_truncated(self, last_key):
+        query = self.query_for(last_key)
+        if query in self.prefixes:
+            state = self.prefixes[query]
+            with self.lock:
+                if state["more"] is None or last_key < state["more"]:
+                    state["more"] = last_key
+
+    def next_page(self, query):
+        state = self.prefixes[query]
+        bounds = [state["more"]] if state["more"] is not None else []
+        if state["dropped"]:
+            bounds.append(max(state["matches"]))
+        return prefix_query(state["prefix"], min(bounds)) if bounds else None
+
+    def add_result(self, holder, key, value, hop_count, cached=False, seq_no=None):
+        # Verdadeiro se o resultado foi aceito
+        query = self.query_for(key)
+        if not self.accepting(query):
+            return False
+        result = {
+            "key": key,
+            "holder": holder,
+            "value": value,
+            "hops": hop_count,
+            "cached": cached,
+            "elapsed": time.monotonic() - self.started,
+        }
+        with self.lock:
+            walker = self.walkers.get(seq_no)
+            if walker is not None and self.accepting(query):
+                walker["status"] = "hit"
+                walker["hops"] = hop_count
+                result["walker"] = walker["walker"]
+        if query in self.prefixes:
+            result["query"] = query
+            if not self.keep_match(query, result):
+                return False
+        else:
+            with self.lock:
+                if not self.accepting(query) or (self.first and len(self.results) >= self.first):
+                    return False
+                self.results.append(result)
+        if query not in self.prefixes:
+            self.resolved.add(query)
+        if self.complete():
+            self.finish("done")
+        return True
+
+    def complete(self):
+        # Uma consulta por prefixo nunca fica resolvida: outros nos podem ter
+        # mais chaves, entao ela so termina com first, ao juntar max_matches
+        # chaves ou no prazo da busca
+        if self.first and len(self.results) >= self.first:
+            return True
+        with self.lock:
+            full = all(
+                len(state["matches"]) >= self.max_matches for state in self.prefixes.values()
+            )
+        return full and len(self.resolved) == len(set(self.keys) - set(self.prefixes))
+
+    def accepting(self, query):
+        # Depois do fim da busca as respostas sao descartadas; so uma busca
+        # por prefixo concluida segue juntando as paginas que ainda chegam
+        return self.outcome is None or (self.outcome == "done" and query in self.prefixes)
+
+    def walker_snapshot(self):
+        with self.lock:
+            return [dict(walker) for walker in self.walkers.values()]
+
+    def finish(self, outcome):
+        # Chamado na resolucao ou no fim do prazo; so a primeira vale
+        with self.lock:
+            if self.outcome is not None:
+                return False
+            self.outcome = outcome
+        self.event.set()
+        self.future.set_result(self)
+        return True
+
+    def add_done_callback(self, callback):
+        # callback(record), chamado na thread que encerrou a busca (ou na
+        # hora, se ela ja terminou)
+        self.future.add_done_callback(lambda future: callback(future.result()))
+
+    @property
+    def finished(self):
+        return self.outcome is not None
+
+    def wait(self, timeout=None):
+        return self.event.wait(timeout)
+
+    def status(self):
+        if self.outcome is not None:
+            return self.outcome
+        return "partial" if self.results else "pending"
+
+    def to_dict(self):
+        return {
+            "request_id": self.seq_no,
+            "keys": self.keys,
+            "mode": self.mode,
+            "status": self.status(),
+            "first": self.first,
+            "rings": list(self.rings),
+            "walkers": self.walker_snapshot(),
+            "prefixes": {
+                query: {
+                    "matches": len(state["matches"]),
+                    "dropped": state["dropped"],
+                    "next": self.next_page(query),
+                }
+                for query, state in self.prefixes.items()
+            },
+            "results": list(self.results),
+        }
+
+
+class SearchTable:
+    # Buscas iniciadas por este no, indexadas pelo seq_no da mensagem SEARCH.
+    def __init__(self, max_entries=100000, ttl=600.0, max_matches=256):
+        self.records = StripedExpiringDict(max_entries, ttl)
+        self.max_matches = max_matches
+        self.outcomes = {"done": 0, "expired": 0}
+        self.lock = threading.Lock()
+
+    def register(self, seq_no, keys, mode, first=None):
+        record = SearchRecord(seq_no, keys, mode, self.max_matches, first)
+        self.records[seq_no] = record
+        record.add_done_callback(self.count_outcome)
+        return record
+
+    def count_outcome(self, record):
+        with self.lock:
+            self.outcomes[record.outcome] += 1
+
+    def alias(self, seq_no, record):
+        # Uma nova rodada da mesma busca usa outro seq_no
+        self.records[seq_no] = record
+        record.seq_nos.append(seq_no)
+
+    def resolve(self, seq_no, holder, key, value, hop_count, cached=False):
+        record = self.records.get(seq_no)
+        if record is None or record.query_for(key) is None:
+            return None
+        if not record.add_result(holder, key, value, hop_count, cached, seq_no):
+            return None
+        return record
+
+    def page_truncated(self, seq_no, last_key):
+        record = self.records.get(seq_no)
+        if record is not None:
+            record.page_truncated(last_key)
+
+    def get(self, seq_no):
+        return self.records.get(seq_no)
+
+    def snapshot(self):
+        snapshot = self.records.snapshot()
+        with self.lock:
+            snapshot.update(self.outcomes)
+        return snapshot
@@ -1,6 +1,8 @@
 import socket
 import threading
+from logger import log
 from message import MessageHandler
+from protocol import INVALID_MESSAGE_ERRORS, FrameDecoder, ProtocolError
 
 
 class PeerServer:
@@ -14,24 +16,48 @@ class PeerServer:
     def start(self):
         self.server_socket.bind((self.address, self.port))
         self.server_socket.listen(5)
+        self.port = self.server_socket.getsockname()[1]
         log(f"Servidor iniciado em {self.address}:{self.port}")
 
-        threading.Thread(target=self.accept_connections).start()
+        threading.Thread(target=self.accept_connections, daemon=True).start()
 
     def accept_connections(self):
         while True:
-            client_socket, client_address = self.server_socket.accept()
+            try:
+                client_socket, client_address = self.server_socket.accept()
+            except OSError:
+                # Socket fechado por close()
+                break
             threading.Thread(
                 target=self.handle_client, args=(client_socket, client_address)
             ).start()
 
     def handle_client(self, client_socket, client_address):
+        decoder = FrameDecoder()
         with client_socket:
-            while True:
-                data = client_socket.recv(1024).decode()
-                if not data:
-                    break
-                self.message_handler.process_message(data.strip(), client_socket)
+            try:
+                self.read_messages(client_socket, client_address, decoder)
+            except OSError as e:
+                log("Conexao com %s encerrada com erro: %s", "WARNING", client_address, e)
+
+    def read_messages(self, client_socket, client_address, decoder):
+        while True:
+            data = client_socket.recv(65536)
+            if not data:
+                return
+            self.peer_node.stats.record_received(len(data))
+            try:
+                messages = decoder.feed(data)
+            except (ProtocolError, UnicodeDecodeError, ValueError) as e:
+                # Depois de um quadro invalido nao da para achar o proximo
+                log("Erro de protocolo vindo de %s: %s", "WARNING", client_address, e)
+                return
+            for parts in messages:
+                # Uma mensagem malformada e descartada sem derrubar a conexao
+                try:
+                    self.peer_node.dispatcher.submit(parts, client_socket)
+                except INVALID_MESSAGE_ERRORS as e:
+                    log("Mensagem invalida vinda de %s: %s", "WARNING", client_address, e)
 
     def close(self):
         self.server_socket.close()
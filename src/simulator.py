@@ -0,0 +1,352 @@
+# Simulador em processo: PeerNodes reais trocando mensagens por uma fila em
+# memoria, entregues em ordem FIFO, com relogio virtual para os
+# temporizadores. Mesma semente, mesmo resultado.
+# Uso (a partir de src/): python simulator.py --topology topologia_grid3x3
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+import logger
+from peer_node import PeerNode
+from protocol import FrameDecoder
+from search_strategy import STRATEGIES
+
+INFRA_DIR = os.path.join(os.path.dirname(__file__), "..", "infra")
+INFRA_BASE_PORT = 5000
+BASE_PORT = 10000
+
+
+def list_topologies(infra_dir=INFRA_DIR):
+    return sorted(
+        name
+        for name in os.listdir(infra_dir)
+        if name.startswith("topologia") and os.path.isdir(os.path.join(infra_dir, name))
+    )
+
+
+def load_topology(name, infra_dir=INFRA_DIR):
+    # Cada topologia_*/<n>.txt lista os vizinhos do no n (porta 5000 + n)
+    directory = name if os.path.isdir(name) else os.path.join(infra_dir, name)
+    graph = {}
+    for file in os.listdir(directory):
+        number, extension = os.path.splitext(file)
+        if extension != ".txt" or not number.isdigit():
+            continue
+        with open(os.path.join(directory, file)) as f:
+            graph[int(number)] = [
+                int(line.strip().rsplit(":", 1)[1]) - INFRA_BASE_PORT
+                for line in f
+                if line.strip()
+            ]
+    return make_undirected(graph)
+
+
+def make_undirected(graph):
+    # Os arquivos nem sempre listam as duas pontas de cada aresta
+    for node, neighbors in list(graph.items()):
+        for neighbor in neighbors:
+            if node not in graph.setdefault(neighbor, []):
+                graph[neighbor].append(node)
+    return graph
+
+
+def random_graph(nodes, degree, rng):
+    # Anel para garantir conectividade, mais arestas aleatorias ate o grau medio
+    graph = {node: [] for node in range(nodes)}
+    edges = set()
+    for node in range(nodes):
+        edges.add(tuple(sorted((node, (node + 1) % nodes))))
+    while len(edges) < nodes * degree // 2:
+        a, b = rng.randrange(nodes), rng.randrange(nodes)
+        if a != b:
+            edges.add(tuple(sorted((a, b))))
+    for a, b in sorted(edges):
+        graph[a].append(b)
+        graph[b].append(a)
+    return graph
+
+
+def scale_free_graph(nodes, edges_per_node, rng):
+    # Barabasi-Albert: cada no novo se liga a edges_per_node nos ja existentes,
+    # com probabilidade proporcional ao grau
+    graph = {node: [] for node in range(nodes)}
+    targets = list(range(edges_per_node))
+    endpoints = []
+    for node in range(edges_per_node, nodes):
+        for target in set(targets):
+            graph[node].append(target)
+            graph[target].append(node)
+            endpoints.extend((node, target))
+        targets = [rng.choice(endpoints) for _ in range(edges_per_node)]
+    return graph
+
+
+def grid_graph(rows, cols):
+    graph = {}
+    for row in range(rows):
+        for col in range(cols):
+            node = row * cols + col
+            graph[node] = [
+                r * cols + c
+                for r, c in ((row - 1, col), (row, col - 1), (row, col + 1), (row + 1, col))
+                if 0 <= r < rows and 0 <= c < cols
+            ]
+    return graph
+
+
+class DiscardOutbound:
+    # Substitui OutboundQueues descartando tudo: mede so o processamento do no
+    def send(self, neighbor, data):
+        return True
+
+    def drop(self, neighbor):
+        pass
+
+    def flush(self, timeout=None):
+        return True
+
+
+class SimulatedOutbound(DiscardOutbound):
+    # Em vez de enviar por TCP, entrega na fila da rede simulada
+    def __init__(self, network, sender):
+        self.network = network
+        self.sender = sender
+
+    def send(self, neighbor, data):
+        self.network.queue.append((self.sender, neighbor, data))
+        return True
+
+
+class SimulatedNetwork:
+    def __init__(self, graph, seed=0, binary=True, ttl=100, **node_options):
+        self.seed = seed
+        # Semente derivada: com a mesma semente do gerador de grafos, os pares
+        # sorteados repetiriam as arestas geradas
+        self.rng = random.Random(f"{seed}-searches")
+        self.queue = deque()
+        self.now = 0.0
+        self.timers = []
+        self.timer_ids = itertools.count()
+        self.decoder = FrameDecoder()
+        self.counters = {"sent": 0, "bytes": 0, "undeliverable": 0}
+        self.nodes = {}
+        numbers = sorted(graph)
+        endpoints = {number: f"127.0.0.1:{BASE_PORT + i}" for i, number in enumerate(numbers)}
+        with self.quiet():
+            for number in numbers:
+                address, port = endpoints[number].split(":")
+                node = PeerNode(address, port, runtime="asyncio", **node_options)
+                node.ttl_default = ttl
+                node.outbound = SimulatedOutbound(self, endpoints[number])
+                node.schedule = self.schedule
+                node.add_key_value(f"chave{number} valor{number}")
+                self.nodes[endpoints[number]] = node
+            for number in numbers:
+                node = self.nodes[endpoints[number]]
+                for neighbor in graph[number]:
+                    node.neighbors.add(endpoints[neighbor])
+                    if binary:
+                        node.binary_neighbors.add(endpoints[neighbor])
+                    # Equivale ao resumo trocado no HELLO
+                    if node.key_digests is not None:
+                        neighbor_node = self.nodes[endpoints[neighbor]]
+                        node.key_digests.update(
+                            endpoints[neighbor], neighbor_node.key_digests.encode()
+                        )
+        self.keys = {endpoint: f"chave{number}" for number, endpoint in endpoints.items()}
+
+    @contextlib.contextmanager
+    def quiet(self):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def schedule(self, delay, callback, *args):
+        heapq.heappush(self.timers, (self.now + delay, next(self.timer_ids), callback, args))
+
+    def run_until_idle(self):
+        while True:
+            self.deliver()
+            if not self.timers:
+                return
+            self.now, _, callback, args = heapq.heappop(self.timers)
+            callback(*args)
+
+    def deliver(self):
+        while self.queue:
+            sender, neighbor, data = self.queue.popleft()
+            node = self.nodes.get(neighbor)
+            if node is None:
+                self.counters["undeliverable"] += 1
+                continue
+            self.counters["sent"] += 1
+            self.counters["bytes"] += len(data)
+            for parts in self.decoder.feed(data):
+                node.message_handler.process_parts(parts, None)
+
+    def duplicates(self):
+        return sum(node.seen_messages.duplicates for node in self.nodes.values())
+
+    def search(self, origin, key, mode, ttl=None, **options):
+        # key pode ser uma lista, buscada em lote; options vao para
+        # start_search (deadline, first, callback)
+        node = self.nodes[origin]
+        keys = [key] if isinstance(key, str) else list(key)
+        with self.quiet():
+            strategy = STRATEGIES[mode](node, batched=len(keys) > 1)
+            record = node.start_search(strategy, keys, ttl, **options)
+            self.run_until_idle()
+        return record
+
+    def run(self, mode, searches, ttl=None):
+        # As estrategias usam o modulo random; semear aqui deixa cada modo
+        # reproduzivel independentemente da ordem em que os modos rodam.
+        random.seed(f"{self.seed}-{mode}")
+        endpoints = sorted(self.nodes)
+        sent, duplicates = self.counters["sent"], self.duplicates()
+        hops = []
+        rings = 0
+        found = 0
+        started = time.perf_counter()
+        for _ in range(searches):
+            origin, holder = self.rng.sample(endpoints, 2)
+            record = self.search(origin, self.keys[holder], mode, ttl)
+            rings += len(record.rings)
+            if record.results:
+                found += 1
+                hops.append(record.results[0]["hops"])
+        elapsed = time.perf_counter() - started
+        hops.sort()
+        return {
+            "mode": mode,
+            "searches": searches,
+            "success_rate": found / searches if searches else 0,
+            "messages": self.counters["sent"] - sent,
+            "messages_per_search": (self.counters["sent"] - sent) / searches if searches else 0,
+            "duplicates": self.duplicates() - duplicates,
+            "rounds_per_search": rings / searches if searches else 0,
+            "mean_hops": sum(hops) / len(hops) if hops else None,
+            "median_hops": hops[len(hops) // 2] if hops else None,
+            "max_hops": hops[-1] if hops else None,
+            "wall_time": elapsed,
+        }
+
+
+def build_graph(args, rng):
+    if args.topology:
+        return args.topology, load_topology(args.topology)
+    if args.graph == "random":
+        return f"random-{args.nodes}-{args.degree}", random_graph(args.nodes, args.degree, rng)
+    if args.graph == "scale-free":
+        name = f"scale-free-{args.nodes}-{args.edges}"
+        return name, scale_free_graph(args.nodes, args.edges, rng)
+    return f"grid-{args.rows}x{args.cols}", grid_graph(args.rows, args.cols)
+
+
+# Apoio aos scripts de benchmarks/
+
+
+def bench_args(*defaults):
+    # Argumentos posicionais opcionais, convertidos para o tipo do padrao
+    values = sys.argv[1 : len(defaults) + 1]
+    return [type(default)(value) for default, value in zip(defaults, values)] + list(
+        defaults[len(values) :]
+    )
+
+
+@contextlib.contextmanager
+def quiet_log(level="WARNING"):
+    # Log e saida padrao descartados durante a medicao
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        logger.configure(level, stream=devnull)
+        try:
+            yield
+        finally:
+            logger.configure()
+
+
+def relay_node(neighbors, **options):
+    # No com vizinhos binarios e saida descartada, para medir o repasse
+    node = PeerNode("127.0.0.1", 5000, dedup_max_entries=10**7, **options)
+    node.outbound = DiscardOutbound()
+    for neighbor in neighbors:
+        node.neighbors.add(neighbor)
+        node.binary_neighbors.add(neighbor)
+    return node
+
+
+def start_nodes(graph, **options):
+    # Um PeerNode real por no do grafo, escutando em 127.0.0.1
+    nodes = {number: PeerNode("127.0.0.1", 0, **options) for number in graph}
+    for node in nodes.values():
+        node.start_server()
+    return nodes
+
+
+def stop_nodes(nodes):
+    for node in nodes.values():
+        node.bootstrap.close()
+        node.connection_pool.close_all()
+        node.server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de buscas FL/RW/BP em memoria")
+    parser.add_argument("--topology", help="diretorio topologia_* de infra/ (ou caminho)")
+    parser.add_argument("--graph", choices=["random", "scale-free", "grid"], default="grid")
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--degree", type=int, default=4)
+    parser.add_argument("--edges", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", choices=sorted(STRATEGIES), default=["FL", "RW", "BP"])
+    parser.add_argument("--searches", type=int, default=100)
+    parser.add_argument("--ttl", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--walkers", type=int, default=4, help="caminhantes do modo KW")
+    parser.add_argument("--walk-check", type=int, default=4)
+    parser.add_argument("--bp-branches", type=int, default=1, help="filhos por vez na BP")
+    parser.add_argument("--routing-hints", action="store_true")
+    parser.add_argument("--key-digests", action="store_true")
+    parser.add_argument("--text", action="store_true", help="usa o formato texto em vez do binario")
+    parser.add_argument("--output", help="grava os resultados em JSON neste arquivo")
+    args = parser.parse_args()
+    if args.walkers < 1 or args.walk_check < 1:
+        parser.error("--walkers e --walk-check precisam ser pelo menos 1")
+
+    rng = random.Random(args.seed)
+    name, graph = build_graph(args, rng)
+    started = time.perf_counter()
+    network = SimulatedNetwork(
+        graph,
+        seed=args.seed,
+        binary=not args.text,
+        ttl=args.ttl,
+        walkers=args.walkers,
+        walk_check_interval=args.walk_check,
+        depth_branches=args.bp_branches,
+        routing_hints=args.routing_hints,
+        key_digests=args.key_digests,
+    )
+    results = {
+        "graph": name,
+        "nodes": len(graph),
+        "edges": sum(len(neighbors) for neighbors in graph.values()) // 2,
+        "seed": args.seed,
+        "setup_time": time.perf_counter() - started,
+        "modes": [network.run(mode, args.searches) for mode in args.modes],
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
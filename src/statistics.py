@@ -1,31 +1,182 @@
+import re
+import threading
+from logger import log
+from metrics import PrometheusWriter, Summary, metric_name
+
+METHODS = {
+    "FL": "flooding",
+    "RW": "random_walk",
+    "BP": "depth_search",
+    "ER": "expanding_ring",
+    "KW": "k_random_walk",
+}
+WALKER_EVENTS = ("launched", "hits", "checks", "continued", "stopped")
+NEIGHBOR_COUNTER = re.compile(r"^(\S+:\d+) (.+)$")
+
+
 class Statistics:
+    # Agregados em memoria constante: saltos e latencia de cada metodo ficam
+    # em Summary (Welford + histograma), sem guardar as amostras.
     def __init__(self):
         self.stats = {
-            "flooding": {"count": 0, "hops": []},
-            "random_walk": {"count": 0, "hops": []},
-            "depth_search": {"count": 0, "hops": []},
+            method: {"count": 0, "hops": Summary(), "latency": Summary(), "cached": 0}
+            for method in METHODS.values()
         }
+        # (operacao, modo) -> mensagens enviadas; bytes recebidos/enviados
+        self.sent = {}
+        self.traffic = {"in": 0, "out": 0}
+        self.sources = {}
+        self.lock = threading.Lock()
+        # Caminhantes do modo KW, no total e acertos por indice de caminhante
+        self.walkers = dict.fromkeys(WALKER_EVENTS, 0)
+        self.walker_hits = {}
+        self.register_source("caminhantes", self.walker_snapshot)
 
     def increment_count(self, method):
-        self.stats[method]["count"] += 1
+        with self.lock:
+            self.stats[METHODS.get(method, method)]["count"] += 1
+
+    def record_hop(self, method, hop_count, cached=False):
+        with self.lock:
+            stats = self.stats[METHODS.get(method, method)]
+            stats["hops"].add(hop_count)
+            if cached:
+                stats["cached"] += 1
+
+    def record_latency(self, method, seconds):
+        # Em microssegundos: o histograma trabalha com inteiros
+        with self.lock:
+            self.stats[METHODS.get(method, method)]["latency"].add(seconds * 1e6)
+
+    def record_sent(self, operation, mode, size, count=1):
+        with self.lock:
+            key = (operation, mode)
+            self.sent[key] = self.sent.get(key, 0) + count
+            self.traffic["out"] += size
+
+    def record_received(self, size):
+        with self.lock:
+            self.traffic["in"] += size
 
-    def record_hop(self, method, hop_count):
-        self.stats[method]["hops"].append(hop_count)
+    def record_walker(self, event, walker=None):
+        with self.lock:
+            self.walkers[event] += 1
+            if event == "hits" and walker is not None:
+                self.walker_hits[walker] = self.walker_hits.get(walker, 0) + 1
+
+    def walker_snapshot(self):
+        with self.lock:
+            snapshot = dict(self.walkers)
+            for walker, hits in sorted(self.walker_hits.items()):
+                snapshot[f"caminhante {walker} hits"] = hits
+        return snapshot
+
+    def register_source(self, name, provider):
+        self.sources[name] = provider
 
     def show_statistics(self):
         log("Estatisticas")
-        self.log_method_stats("flooding")
-        self.log_method_stats("random_walk")
-        self.log_method_stats("depth_search")
+        for method in self.stats:
+            self.log_method_stats(method)
+        for name, provider in self.sources.items():
+            self.log_source_stats(name, provider())
+
+    def method_summary(self, method):
+        with self.lock:
+            stats = self.stats[method]
+            hops = stats["hops"].snapshot()
+            latency = stats["latency"].snapshot(scale=1e-3)
+            return {
+                "count": stats["count"],
+                "answers": hops["count"],
+                "mean_hops": hops["mean"],
+                "stdev_hops": hops["stdev"],
+                "p50_hops": hops["p50"],
+                "p99_hops": hops["p99"],
+                "max_hops": hops["max"],
+                "cached_answers": stats["cached"],
+                "mean_latency_ms": latency["mean"],
+                "p50_latency_ms": latency["p50"],
+                "p99_latency_ms": latency["p99"],
+            }
+
+    def traffic_snapshot(self):
+        with self.lock:
+            snapshot = {"bytes_in": self.traffic["in"], "bytes_out": self.traffic["out"]}
+            for (operation, mode), count in sorted(self.sent.items()):
+                snapshot[f"{operation} {mode}"] = count
+        return snapshot
 
     def log_method_stats(self, method):
-        count = self.stats[method]["count"]
-        hops = self.stats[method]["hops"]
-        if hops:
-            mean = statistics.mean(hops)
-            stdev = statistics.stdev(hops) if len(hops) > 1 else 0
-        else:
-            mean = stdev = 0
-        log(f"Total de mensagens de {method} vistas: {count}")
-        log(f"Media de saltos ate encontrar destino por {method}: {mean}")
-        log(f"Desvio padrão de saltos ate encontrar destino por {method}: {stdev}")
+        summary = self.method_summary(method)
+        log(f"Total de mensagens de {method} vistas: {summary['count']}")
+        log(f"Media de saltos ate encontrar destino por {method}: {summary['mean_hops']}")
+        log(
+            f"Desvio padrão de saltos ate encontrar destino por {method}: {summary['stdev_hops']}"
+        )
+        log(f"Respostas vindas de cache por {method}: {summary['cached_answers']}")
+        log(
+            f"Saltos p50/p99/max por {method}: "
+            f"{summary['p50_hops']}/{summary['p99_hops']}/{summary['max_hops']}"
+        )
+        log(
+            f"Latencia das respostas por {method} (ms): media {summary['mean_latency_ms']:.2f}"
+            f" p50 {summary['p50_latency_ms']} p99 {summary['p99_latency_ms']}"
+        )
+
+    def snapshot(self):
+        snapshot = {method: self.method_summary(method) for method in self.stats}
+        snapshot["trafego"] = self.traffic_snapshot()
+        for name, provider in self.sources.items():
+            snapshot[name] = provider()
+        return snapshot
+
+    def prometheus(self):
+        writer = PrometheusWriter()
+        with self.lock:
+            name = writer.family("search_messages_total", "counter", "Buscas recebidas por metodo")
+            for method, stats in self.stats.items():
+                writer.sample(name, stats["count"], method=method)
+            name = writer.family("cached_answers_total", "counter", "Respostas vindas de cache")
+            for method, stats in self.stats.items():
+                writer.sample(name, stats["cached"], method=method)
+            name = writer.family("hops", "summary", "Saltos ate a resposta")
+            for method, stats in self.stats.items():
+                writer.summary(name, stats["hops"], method=method)
+            name = writer.family(
+                "lookup_latency_seconds", "summary", "Tempo da busca ate cada resposta na origem"
+            )
+            for method, stats in self.stats.items():
+                writer.summary(name, stats["latency"], scale=1e-6, method=method)
+            name = writer.family("messages_sent_total", "counter", "Mensagens enviadas")
+            for (operation, mode), count in sorted(self.sent.items()):
+                writer.sample(name, count, operation=operation, mode=mode)
+            name = writer.family("bytes_total", "counter", "Bytes recebidos e enviados")
+            for direction, count in self.traffic.items():
+                writer.sample(name, count, direction=direction)
+        # Fontes registradas (filas, conexoes, caches...) viram gauges com o
+        # nome da fonte; valores nao numericos ficam so no /stats. Contadores
+        # por vizinho vao para uma familia propria (..._neighbor_...), separada
+        # do total, para um sum() nao contar duas vezes
+        for source, provider in self.sources.items():
+            for counter, value in provider().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                # "127.0.0.1:5001 depth" -> ..._neighbor_depth{neighbor="127.0.0.1:5001"}
+                labels = {}
+                prefix = metric_name(source)
+                match = NEIGHBOR_COUNTER.match(counter)
+                if match:
+                    labels["neighbor"], counter = match.groups()
+                    prefix = f"{prefix}_neighbor"
+                name = writer.family(
+                    f"{prefix}_{metric_name(counter)}", "gauge", f"{source}: {counter}"
+                )
+                writer.sample(name, value, **labels)
+        return writer.text()
+
+    def log_source_stats(self, name, values):
+        for counter, value in values.items():
+            log(f"{name} - {counter}: {value}")
@@ -0,0 +1,232 @@
+import bisect
+import os
+import sqlite3
+import threading
+
+# Busca por prefixo: "fruta*" casa todas as chaves que comecam com "fruta".
+# A pagina seguinte e pedida com o cursor apos o curinga: "fruta*>fruta12"
+# devolve so as chaves depois de fruta12.
+WILDCARD = "*"
+CURSOR = ">"
+
+
+def parse_key_value(line):
+    # Chave e o primeiro campo; o valor e o resto da linha, com espacos
+    fields = line.strip().split(None, 1)
+    if len(fields) != 2:
+        raise ValueError(f"Linha de chave/valor invalida: {line.strip()!r}")
+    return fields[0], fields[1]
+
+
+def read_key_values(file_path):
+    with open(file_path, "r") as file:
+        for line in file:
+            if line.strip():
+                yield parse_key_value(line)
+
+
+def prefix_end(prefix):
+    # Menor string maior que todas as que comecam com prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+def parse_prefix_query(key):
+    # (prefixo, cursor) ou None para uma chave comum. O curinga so vale no
+    # fim da chave ou seguido do cursor: "a*b" e uma chave com "*" no nome
+    if key.endswith(WILDCARD):
+        return key[: -len(WILDCARD)], None
+    prefix, separator, after = key.partition(WILDCARD + CURSOR)
+    return (prefix, after) if separator else None
+
+
+def prefix_query(prefix, after=None):
+    return prefix + WILDCARD + (CURSOR + after if after is not None else "")
+
+
+def prefix_start(prefix, after):
+    # Primeira chave possivel da pagina: o cursor e exclusivo
+    if after is None or after < prefix:
+        return prefix
+    return after + "\0"
+
+
+def prefix_page(store, query, limit):
+    # Ate limit pares em ordem de chave e se ha mais depois deles
+    prefix, after = parse_prefix_query(query)
+    pairs = store.prefix(prefix, limit + 1, after)
+    return pairs[:limit], len(pairs) > limit
+
+
+class DictStore:
+    # Armazenamento em memoria (o dict de sempre) com indice ordenado das
+    # chaves, reconstruido sob demanda, para buscas por prefixo/intervalo.
+    def __init__(self):
+        self.data = {}
+        self.sorted_keys = None
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            if key not in self.data:
+                self.sorted_keys = None
+            self.data[key] = value
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(list(self.data))
+
+    def bulk_load(self, pairs):
+        with self.lock:
+            self.data.update(pairs)
+            self.sorted_keys = None
+        return len(self.data)
+
+    def load_file(self, file_path):
+        return self.bulk_load(read_key_values(file_path))
+
+    def range(self, start=None, end=None, limit=None):
+        with self.lock:
+            if self.sorted_keys is None:
+                self.sorted_keys = sorted(self.data)
+            keys = self.sorted_keys
+        first = bisect.bisect_left(keys, start) if start is not None else 0
+        last = bisect.bisect_left(keys, end) if end is not None else len(keys)
+        if limit is not None:
+            last = min(last, first + limit)
+        return [(key, self.data[key]) for key in keys[first:last]]
+
+    def prefix(self, prefix, limit=None, after=None):
+        return self.range(prefix_start(prefix, after), prefix_end(prefix), limit)
+
+    def close(self):
+        pass
+
+
+class SqliteStore:
+    # Indice ordenado em disco (B-tree do sqlite). A conexao so e aberta no
+    # primeiro acesso; um arquivo ja importado (mesmo caminho, tamanho e
+    # mtime) nao e lido de novo, entao reiniciar o no com a mesma base e
+    # quase instantaneo e os valores ficam fora da memoria do processo.
+    def __init__(self, path, batch_size=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                " WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sources"
+                " (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)"
+            )
+            self.connection.commit()
+        return self.connection
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.connect().execute(sql, parameters).fetchall()
+
+    def get(self, key, default=None):
+        rows = self.query("SELECT value FROM kv WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            connection = self.connect()
+            connection.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, value))
+            connection.commit()
+
+    def __contains__(self, key):
+        return bool(self.query("SELECT 1 FROM kv WHERE key = ?", (key,)))
+
+    def __len__(self):
+        return self.query("SELECT COUNT(*) FROM kv")[0][0]
+
+    def __iter__(self):
+        return (row[0] for row in self.query("SELECT key FROM kv ORDER BY key"))
+
+    def bulk_load(self, pairs):
+        with self.lock:
+            connection = self.connect()
+            connection.execute("PRAGMA synchronous = OFF")
+            batch = []
+            for pair in pairs:
+                batch.append(pair)
+                if len(batch) >= self.batch_size:
+                    connection.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?)", batch)
+                    batch.clear()
+            connection.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?)", batch)
+            connection.commit()
+            connection.execute("PRAGMA synchronous = FULL")
+        return len(self)
+
+    def load_file(self, file_path):
+        source = os.path.abspath(file_path)
+        info = os.stat(source)
+        rows = self.query("SELECT size, mtime FROM sources WHERE path = ?", (source,))
+        if rows and rows[0] == (info.st_size, info.st_mtime):
+            return len(self)
+        count = self.bulk_load(read_key_values(file_path))
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                (source, info.st_size, info.st_mtime),
+            )
+            self.connection.commit()
+        return count
+
+    def range(self, start=None, end=None, limit=None):
+        sql = "SELECT key, value FROM kv WHERE 1"
+        parameters = []
+        if start is not None:
+            sql += " AND key >= ?"
+            parameters.append(start)
+        if end is not None:
+            sql += " AND key < ?"
+            parameters.append(end)
+        sql += " ORDER BY key"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self.query(sql, parameters)
+
+    def prefix(self, prefix, limit=None, after=None):
+        return self.range(prefix_start(prefix, after), prefix_end(prefix), limit)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+def open_store(spec="dict"):
+    # "dict" ou "sqlite:<arquivo>"
+    if spec == "dict":
+        return DictStore()
+    backend, _, path = spec.partition(":")
+    if backend == "sqlite" and path:
+        return SqliteStore(path)
+    raise ValueError(f"Armazenamento desconhecido: {spec}")
@@ -0,0 +1,59 @@
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from peer_node import PeerNode
+
+
+class TestAsyncPeerServer(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 0, runtime="asyncio")
+        self.peer_node.start_server()
+        self.endpoint = ("127.0.0.1", self.peer_node.server.port)
+
+    def tearDown(self):
+        self.peer_node.server.close()
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_hello(self):
+        with socket.create_connection(self.endpoint) as sock:
+            sock.sendall(b"127.0.0.1:9001 0 1 HELLO\n")
+            self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+        self.assertIn("127.0.0.1:9001", self.peer_node.neighbors)
+
+    def test_several_messages_in_one_write(self):
+        with socket.create_connection(self.endpoint) as sock:
+            sock.sendall(b"127.0.0.1:9001 0 1 HELLO\n127.0.0.1:9001 1 1 BYE\n")
+            self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+        self.assertTrue(
+            self.wait_for(lambda: "127.0.0.1:9001" not in self.peer_node.neighbors)
+        )
+
+    def test_malformed_messages_do_not_drop_the_connection(self):
+        with socket.create_connection(self.endpoint, timeout=2) as sock:
+            sock.sendall(
+                b"garbage\n127.0.0.1:9001 0 1 CANCEL XX 1 k 0\n127.0.0.1:9001 1 1 HELLO\n"
+            )
+            self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+
+    def test_bye_does_not_block_the_loop(self):
+        release = threading.Event()
+        with patch.object(
+            self.peer_node.connection_pool, "drop", side_effect=lambda neighbor: release.wait(2)
+        ):
+            with socket.create_connection(self.endpoint, timeout=1) as sock:
+                sock.sendall(b"127.0.0.1:9001 1 1 BYE\n")
+            with socket.create_connection(self.endpoint, timeout=1) as sock:
+                sock.sendall(b"127.0.0.1:9002 0 1 HELLO\n")
+                self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+            release.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
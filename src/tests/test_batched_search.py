@@ -0,0 +1,85 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import protocol
+from message import MessageHandler
+from peer_node import PeerNode
+from search_strategy import STRATEGIES
+
+
+class TestBatchedSearch(unittest.TestCase):
+    def setUp(self):
+        # Linha A -- B -- C: B guarda k1 e C guarda k2
+        self.nodes = [PeerNode("127.0.0.1", 0) for _ in range(3)]
+        for node in self.nodes:
+            node.start_server()
+        a, b, c = self.nodes
+        a.add_neighbor(f"127.0.0.1:{b.port}")
+        b.add_neighbor(f"127.0.0.1:{c.port}")
+        b.add_key_value("k1 v1")
+        c.add_key_value("k2 v2")
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.connection_pool.close_all()
+            node.server.close()
+
+    def wait_results(self, record, count):
+        deadline = time.monotonic() + 5
+        while len(record.results) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_each_mode_resolves_keys_along_the_path(self):
+        a, b, c = self.nodes
+        for mode in ("FL", "RW", "BP"):
+            with self.subTest(mode=mode):
+                strategy = STRATEGIES[mode](a, batched=True)
+                record = a.start_search(strategy, ["k1", "k2", "k3"])
+                self.wait_results(record, 2)
+                results = {result["key"]: result for result in record.results}
+                self.assertEqual(results["k1"]["value"], "v1")
+                self.assertEqual(results["k1"]["hops"], 1)
+                self.assertEqual(results["k2"]["value"], "v2")
+                self.assertEqual(results["k2"]["hops"], 2)
+                self.assertEqual(record.status(), "partial")
+
+        for method in ("flooding", "random_walk", "depth_search"):
+            hops = a.stats.method_summary(method)
+            self.assertEqual((hops["answers"], hops["mean_hops"], hops["max_hops"]), (2, 1.5, 2))
+
+    def test_forwards_only_unresolved_keys(self):
+        a, b, c = self.nodes
+        handler = MessageHandler(b)
+        with patch.object(MessageHandler, "enqueue") as mock_enqueue:
+            handler.process_message(
+                f"127.0.0.1:{a.port} 50 10 MSEARCH FL {a.port} k1,k2,k3 0", MagicMock()
+            )
+        sent = {neighbor: message for message, _, neighbor in (c.args for c in mock_enqueue.call_args_list)}
+        reply = sent[f"127.0.0.1:{a.port}"]
+        self.assertEqual(reply[3:8], ["MVAL", "FL", "k1", "v1", 0])
+        self.assertEqual(reply[8], 50)
+        forwarded = sent[f"127.0.0.1:{c.port}"]
+        self.assertEqual(forwarded[3], "MSEARCH")
+        self.assertEqual(forwarded[6], "k2,k3")
+
+    def test_splits_replies_that_do_not_fit_in_a_frame(self):
+        a, b, c = self.nodes
+        keys = [f"chave{n:04}" for n in range(2000)]
+        for key in keys:
+            b.add_key_value(f"{key} {'v' * 40}")
+        handler = MessageHandler(b)
+        with patch.object(MessageHandler, "enqueue") as mock_enqueue:
+            handler.process_message(
+                f"127.0.0.1:{a.port} 50 10 MSEARCH FL {a.port} {protocol.encode_keys(keys)} 0",
+                MagicMock(),
+            )
+        replies = [c.args[0] for c in mock_enqueue.call_args_list if c.args[0][3] == "MVAL"]
+        self.assertGreater(len(replies), 1)
+        for reply in replies:
+            self.assertEqual(protocol.encode_binary(reply)[0], protocol.MAGIC)
+        answered = [key for reply in replies for key in protocol.decode_keys(reply[5])]
+        self.assertEqual(answered, keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import socket
+import tempfile
+import time
+import unittest
+from peer_node import PeerNode
+
+
+def hung_listener():
+    # Aceita a conexao (backlog) mas nunca responde ao HELLO
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    return sock
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        self.good = PeerNode("127.0.0.1", 0)
+        self.good.start_server()
+        self.hung = [hung_listener() for _ in range(3)]
+        self.nodes = [self.good]
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.bootstrap.close()
+            node.connection_pool.close_all()
+            node.server.close()
+        for sock in self.hung:
+            sock.close()
+
+    def make_node(self, neighbors, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "vizinhos.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(neighbors) + "\n")
+            node = PeerNode("127.0.0.1", 0, neighbors_file=path, hello_timeout=0.3, **options)
+        self.nodes.append(node)
+        return node
+
+    def neighbors(self):
+        hung = [f"127.0.0.1:{sock.getsockname()[1]}" for sock in self.hung]
+        return hung + [f"127.0.0.1:{self.good.port}"]
+
+    def test_hung_neighbors_are_contacted_in_parallel(self):
+        started = time.monotonic()
+        node = self.make_node(self.neighbors())
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertTrue(node.bootstrap.wait(2))
+        snapshot = node.bootstrap.snapshot()
+        self.assertLess(snapshot["startup_time"], 0.6)
+        self.assertEqual(snapshot["ok"], 1)
+        self.assertEqual(snapshot["retrying"], 3)
+        self.assertEqual(len(node.neighbors), 4)
+        self.assertIn(f"127.0.0.1:{self.good.port}", node.binary_neighbors)
+
+    def test_serial_bootstrap_waits_for_each_timeout(self):
+        node = self.make_node(self.neighbors(), bootstrap_concurrency=1)
+        self.assertTrue(node.bootstrap.wait(3))
+        self.assertGreaterEqual(node.bootstrap.snapshot()["startup_time"], 0.9)
+
+    def test_close_cancels_queued_handshakes(self):
+        node = self.make_node(self.neighbors(), bootstrap_concurrency=1)
+        node.bootstrap.close()
+        time.sleep(0.5)
+        # So o HELLO que ja estava em andamento chega a ser feito
+        self.assertEqual(node.bootstrap.snapshot()["attempts"], 1)
+        self.assertEqual(node.bootstrap.futures, set())
+
+    def test_failed_neighbor_is_retried_in_background(self):
+        port = free_port()
+        node = self.make_node([])
+        node.bootstrap.retry_base = 0.05
+        node.bootstrap.start([f"127.0.0.1:{port}"])
+        self.assertTrue(node.bootstrap.wait(2))
+        late = PeerNode("127.0.0.1", port)
+        late.start_server()
+        self.nodes.append(late)
+        deadline = time.monotonic() + 3
+        while node.bootstrap.snapshot()["ok"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        snapshot = node.bootstrap.snapshot()
+        self.assertEqual(snapshot["ok"], 1)
+        self.assertGreater(snapshot["attempts"], 1)
+
+    def test_gives_up_after_retries(self):
+        node = self.make_node([], bootstrap_retries=1)
+        node.bootstrap.retry_base = 0.01
+        node.bootstrap.start([f"127.0.0.1:{free_port()}"])
+        deadline = time.monotonic() + 2
+        while node.bootstrap.snapshot()["failed"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(node.bootstrap.snapshot()["attempts"], 2)
+        self.assertEqual(node.bootstrap.snapshot()["failed"], 1)
@@ -0,0 +1,87 @@
+import socket
+import time
+import unittest
+from unittest.mock import patch
+from connection_pool import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen()
+        self.neighbor = f"127.0.0.1:{self.server.getsockname()[1]}"
+        self.pool = ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close_all()
+        self.server.close()
+
+    def test_reuses_connection(self):
+        self.pool.send(self.neighbor, b"a\n")
+        self.pool.send(self.neighbor, b"b\n")
+        conn, _ = self.server.accept()
+        with conn:
+            data = b""
+            while len(data) < 4:
+                data += conn.recv(1024)
+        self.assertEqual(data, b"a\nb\n")
+        snapshot = self.pool.snapshot()
+        self.assertEqual(snapshot["misses"], 1)
+        self.assertEqual(snapshot["hits"], 1)
+        self.assertEqual(snapshot["open"], 1)
+
+    def test_reconnects_after_peer_closes(self):
+        self.pool.send(self.neighbor, b"a\n")
+        conn, _ = self.server.accept()
+        conn.close()
+        self.pool.send(self.neighbor, b"b\n")
+        conn, _ = self.server.accept()
+        with conn:
+            self.assertEqual(conn.recv(1024), b"b\n")
+        self.assertEqual(self.pool.snapshot()["misses"], 2)
+
+    def test_backoff_after_failure(self):
+        self.server.close()
+        with self.assertRaises(OSError):
+            self.pool.send(self.neighbor, b"a\n")
+        with patch.object(self.pool, "connect") as mock_connect:
+            with self.assertRaises(ConnectionError):
+                self.pool.send(self.neighbor, b"a\n")
+            mock_connect.assert_not_called()
+        snapshot = self.pool.snapshot()
+        self.assertEqual(snapshot["failures"], 1)
+        self.assertEqual(snapshot["skipped"], 1)
+
+    def test_buffers_are_written_in_order(self):
+        self.pool.send(self.neighbor, b"a\n", b"b\n", b"c\n")
+        conn, _ = self.server.accept()
+        with conn:
+            data = b""
+            while len(data) < 6:
+                data += conn.recv(1024)
+        self.assertEqual(data, b"a\nb\nc\n")
+
+    def test_stalled_neighbor_times_out(self):
+        # O servidor aceita a conexao e nunca le: a escrita enche os buffers
+        pool = ConnectionPool(send_timeout=0.2)
+        self.addCleanup(pool.close_all)
+        data = b"x" * (1 << 20)
+        started = time.monotonic()
+        with self.assertRaises(socket.timeout):
+            for _ in range(64):
+                pool.send(self.neighbor, data)
+        self.assertLess(time.monotonic() - started, 5)
+        snapshot = pool.snapshot()
+        self.assertEqual(snapshot["timeouts"], 1)
+        self.assertEqual(snapshot["failures"], 1)
+        self.assertEqual(snapshot["open"], 0)
+
+    def test_drop_closes_connection(self):
+        self.pool.send(self.neighbor, b"a\n")
+        self.pool.drop(self.neighbor)
+        self.assertEqual(self.pool.snapshot()["open"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
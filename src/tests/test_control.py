@@ -0,0 +1,109 @@
+import json
+import unittest
+from http.client import HTTPConnection
+from unittest.mock import patch
+from control import ControlServer
+from peer_node import PeerNode
+
+
+class TestControlServer(unittest.TestCase):
+    def setUp(self):
+        self.holder = PeerNode("127.0.0.1", 0)
+        self.holder.add_key_value("ach2147 SistemasDistribuidos")
+        self.holder.start_server()
+        self.peer_node = PeerNode("127.0.0.1", 0)
+        self.peer_node.add_key_value("local Valor")
+        self.peer_node.start_server()
+        self.peer_node.add_neighbor(f"127.0.0.1:{self.holder.port}")
+        self.control = ControlServer(self.peer_node)
+        self.control.start()
+        self.connection = HTTPConnection("127.0.0.1", self.control.port, timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+        self.control.close()
+        for node in (self.peer_node, self.holder):
+            node.connection_pool.close_all()
+            node.server.close()
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        self.connection.request(method, path, body=data)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_neighbors_and_ttl(self):
+        status, body = self.request("GET", "/neighbors")
+        self.assertEqual(body, {"neighbors": [f"127.0.0.1:{self.holder.port}"]})
+        status, body = self.request("POST", "/ttl", {"ttl": 7})
+        self.assertEqual((status, body), (200, {"ttl": 7}))
+        self.assertEqual(self.peer_node.ttl_default, 7)
+        status, body = self.request("POST", "/ttl", {"ttl": 0})
+        self.assertEqual(status, 400)
+
+    def test_batched_search_results(self):
+        status, body = self.request(
+            "POST",
+            "/search",
+            {
+                "searches": [
+                    {"key": "ach2147", "mode": "FL"},
+                    {"key": "ach2147", "mode": "RW"},
+                    {"key": "local", "mode": "BP"},
+                ]
+            },
+        )
+        self.assertEqual(status, 202)
+        ids = ",".join(str(request_id) for request_id in body["request_ids"])
+        status, body = self.request("GET", f"/search?ids={ids}&wait=5")
+        self.assertEqual(status, 200)
+        results = body["searches"]
+        self.assertEqual([search["status"] for search in results], ["done"] * 3)
+        self.assertEqual(results[0]["results"][0]["value"], "SistemasDistribuidos")
+        self.assertEqual(results[0]["results"][0]["hops"], 1)
+        self.assertEqual(results[2]["results"][0]["hops"], 0)
+
+    def test_stats_and_errors(self):
+        status, body = self.request("GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertIn("flooding", body)
+        status, _ = self.request("POST", "/search", {"keys": ["x"], "mode": "XX"})
+        self.assertEqual(status, 400)
+        for body in (["x"], "x", {"searches": {"key": "x"}}, {"searches": ["x"]}, {"keys": "x"}):
+            status, _ = self.request("POST", "/search", body)
+            self.assertEqual(status, 400, body)
+        keys = [f"chave{n:05}" for n in range(10000)]
+        status, _ = self.request("POST", "/search", {"keys": keys, "batch": True})
+        self.assertEqual(status, 400)
+        status, _ = self.request("GET", "/missing")
+        self.assertEqual(status, 404)
+
+    def test_validates_every_search_before_starting_any(self):
+        valid = {"key": "ach2147", "mode": "RW", "ttl": 5, "first": 1, "deadline": 2}
+        for invalid in ({"ttl": -1}, {"ttl": 0}, {"first": 0}, {"ttl": "x"}, {"deadline": -1}):
+            with patch.object(self.peer_node, "start_search") as start_search:
+                status, _ = self.request(
+                    "POST", "/search", {"searches": [valid, dict(valid, **invalid)]}
+                )
+            self.assertEqual(status, 400, invalid)
+            start_search.assert_not_called()
+
+    def test_prometheus_metrics(self):
+        status, body = self.request("POST", "/search", {"keys": ["ach2147"], "mode": "FL"})
+        self.request("GET", f"/search?ids={body['request_ids'][0]}&wait=5")
+        self.connection.request("GET", "/metrics")
+        response = self.connection.getresponse()
+        text = response.read().decode()
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE p2p_lookup_latency_seconds summary", text)
+        self.assertIn('p2p_hops_count{method="flooding"} 1', text)
+        self.assertIn('p2p_messages_sent_total{operation="SEARCH",mode="FL"} 1', text)
+        self.assertIn("p2p_fila_de_entrada_depth ", text)
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
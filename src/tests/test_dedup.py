@@ -0,0 +1,68 @@
+import unittest
+from dedup import DedupCache, ExpiringDict
+from peer_node import PeerNode
+from search_strategy import FloodingSearchStrategy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestExpiringDict(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.table = ExpiringDict(max_entries=2, ttl=10, clock=self.clock)
+
+    def test_expires_by_ttl(self):
+        self.table["a"] = 1
+        self.clock.now = 11
+        self.assertNotIn("a", self.table)
+        self.table["b"] = 2
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.evictions["ttl"], 1)
+
+    def test_evicts_oldest_by_size(self):
+        for key in "abc":
+            self.table[key] = key
+        self.assertNotIn("a", self.table)
+        self.assertEqual(self.table["c"], "c")
+        self.assertEqual(self.table.snapshot()["evicted_size"], 1)
+        self.assertGreater(self.table.snapshot()["memory_bytes"], 0)
+
+
+class TestDedupCache(unittest.TestCase):
+    def test_exact_entries(self):
+        cache = DedupCache(max_entries=10, ttl=10)
+        self.assertFalse(cache.check_and_add(("127.0.0.1:5001", 1)))
+        self.assertTrue(cache.check_and_add(("127.0.0.1:5001", 1)))
+        self.assertFalse(cache.check_and_add(("127.0.0.1:5001", 2)))
+
+    def test_sliding_window(self):
+        cache = DedupCache(max_entries=10, ttl=10, window=4)
+        origin = "127.0.0.1:5001"
+        self.assertFalse(cache.check_and_add((origin, 5)))
+        self.assertFalse(cache.check_and_add((origin, 3)))
+        self.assertTrue(cache.check_and_add((origin, 3)))
+        self.assertFalse(cache.check_and_add((origin, 9)))
+        self.assertTrue(cache.check_and_add((origin, 5)))
+        self.assertIn((origin, 9), cache)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.snapshot()["stale"], 1)
+
+
+class TestFloodingDedup(unittest.TestCase):
+    def test_message_seen_uses_bounded_cache(self):
+        peer_node = PeerNode("127.0.0.1", 8000, dedup_max_entries=2)
+        strategy = FloodingSearchStrategy(peer_node)
+        for seq_no in range(5):
+            self.assertFalse(strategy.message_seen("127.0.0.1:5001", seq_no))
+        self.assertTrue(strategy.message_seen("127.0.0.1:5001", 4))
+        self.assertLessEqual(len(peer_node.seen_messages), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
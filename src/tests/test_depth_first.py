@@ -0,0 +1,69 @@
+import random
+import unittest
+from unittest.mock import patch
+from peer_node import PeerNode
+from search_strategy import FINISHED, DepthState
+from simulator import SimulatedNetwork, load_topology
+
+
+class TestDepthFirstSearch(unittest.TestCase):
+    def search_all_pairs(self, topology, **options):
+        network = SimulatedNetwork(load_topology(topology), seed=1, **options)
+        endpoints = sorted(network.nodes)
+        hops = 0
+        for origin in endpoints:
+            for holder in endpoints:
+                if holder == origin:
+                    continue
+                record = network.search(origin, network.keys[holder], "BP")
+                self.assertEqual(
+                    [result["holder"] for result in record.results], [holder], (origin, holder)
+                )
+                hops += record.results[0]["hops"]
+        return network, len(endpoints) * (len(endpoints) - 1), hops
+
+    def test_every_key_is_found(self):
+        random.seed(1)
+        for topology, max_messages in (("topologia_ciclo_3", 3.5), ("topologia_grid3x3", 12)):
+            with self.subTest(topology=topology):
+                network, searches, _ = self.search_all_pairs(topology)
+                self.assertLess(network.counters["sent"] / searches, max_messages)
+
+    def test_parallel_branches_find_keys_in_fewer_hops(self):
+        hops = {}
+        for branches in (1, 2):
+            random.seed(1)
+            _, _, hops[branches] = self.search_all_pairs(
+                "topologia_grid3x3", depth_branches=branches
+            )
+        self.assertLess(hops[2], hops[1])
+
+    def test_missing_key_visits_every_node_and_returns(self):
+        graph = load_topology("topologia_grid3x3")
+        network = SimulatedNetwork(graph, seed=1)
+        origin = sorted(network.nodes)[0]
+        with self.assertLogs("p2p", "INFO") as logs:
+            record = network.search(origin, "ausente", "BP")
+        self.assertIn("Não foi possível localizar a chave ausente", "\n".join(logs.output))
+        msg_id = (origin, record.seq_no)
+        for node in network.nodes.values():
+            self.assertEqual(node.depth_search_info.get(msg_id), FINISHED)
+        # Cada aresta e atravessada no maximo duas vezes em cada sentido
+        edges = sum(len(neighbors) for neighbors in graph.values()) // 2
+        self.assertLessEqual(network.counters["sent"], 4 * edges)
+
+    def test_visited_node_bounces_back(self):
+        peer_node = PeerNode("127.0.0.1", 8000)
+        for port in (8001, 8002):
+            peer_node.neighbors.add(f"127.0.0.1:{port}")
+        msg_id = ("127.0.0.1:9000", 3)
+        state = DepthState("127.0.0.1:8001", [])
+        state.active.add("127.0.0.1:8003")
+        peer_node.depth_search_info[msg_id] = state
+        search = ["127.0.0.1:9000", 3, 10, "SEARCH", "BP", 8002, "k1", 4]
+        with patch.object(peer_node.message_handler, "send_message") as send:
+            peer_node.message_handler.process_parts(search, None)
+        message, neighbor = send.call_args.args
+        self.assertEqual(neighbor, "127.0.0.1:8002")
+        self.assertEqual(message[2], 9)
+        self.assertEqual(state.active, {"127.0.0.1:8003"})
@@ -0,0 +1,98 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from digest import BloomFilter, KeyDigests
+from message import MessageHandler
+from peer_node import PeerNode
+from protocol import DIGEST_PREFIX, MAX_DIGEST_BITS, MAX_FRAME_SIZE, FrameDecoder
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_false_positive_rate(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"chave{i}")
+        self.assertTrue(all(f"chave{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"outra{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertAlmostEqual(bloom.false_positive_rate(), 0.01, delta=0.002)
+
+    def test_encode_round_trip(self):
+        bloom = BloomFilter.for_capacity(10, 0.05)
+        bloom.add("ach2147")
+        decoded = BloomFilter.decode(bloom.encode())
+        self.assertIn("ach2147", decoded)
+        self.assertEqual((decoded.size, decoded.hashes, decoded.count), (bloom.size, bloom.hashes, 1))
+
+    def test_size_is_capped_to_fit_a_frame(self):
+        bloom = BloomFilter.for_capacity(200000, 0.01)
+        self.assertEqual(bloom.size, MAX_DIGEST_BITS)
+        self.assertLess(len(bloom.encode()) + len(DIGEST_PREFIX), MAX_FRAME_SIZE - 1024)
+
+    def test_grows_past_capacity(self):
+        digests = KeyDigests(capacity=2, fp_rate=0.01)
+        store = {}
+        for key in ("a", "b", "c"):
+            store[key] = "v"
+            digests.add_local(key, store)
+        self.assertEqual(digests.capacity, 4)
+        self.assertTrue(all(key in digests.local for key in store))
+
+    def test_large_store_still_fits_in_hello(self):
+        peer_node = PeerNode("127.0.0.1", 8000, key_digests=True)
+        store = {f"chave{i}": "v" for i in range(200000)}
+        peer_node.key_digests.rebuild(store, len(store))
+        digests = peer_node.key_digests
+        self.assertEqual(digests.local.size, MAX_DIGEST_BITS)
+        capacity = digests.capacity
+        digests.add_local("outra", store)
+        self.assertEqual(digests.capacity, capacity)
+        with patch.object(MessageHandler, "send_message") as mock_send_message:
+            peer_node.message_handler.send_hello("127.0.0.1:8001")
+        hello = mock_send_message.call_args.args[0].encode()
+        self.assertLess(len(hello), MAX_FRAME_SIZE)
+        self.assertEqual(FrameDecoder().feed(hello)[0][3], "HELLO")
+        self.assertIn("chave123", digests.local)
+
+
+class TestDigestRouting(unittest.TestCase):
+    def test_search_goes_to_matching_neighbor(self):
+        peer_node = PeerNode("127.0.0.1", 8000, key_digests=True)
+        for port in (5002, 5003, 5004):
+            peer_node.neighbors.add(f"127.0.0.1:{port}")
+        remote = KeyDigests()
+        remote.add_local("ach2147", {})
+        peer_node.key_digests.update("127.0.0.1:5003", remote.encode())
+
+        handler = MessageHandler(peer_node)
+        with patch.object(MessageHandler, "send_message") as mock_send_message:
+            handler.process_message("127.0.0.1:5002 4 10 SEARCH FL 5002 ach2147 1", MagicMock())
+        (message, neighbor), = (c.args for c in mock_send_message.call_args_list)
+        self.assertEqual(neighbor, "127.0.0.1:5003")
+        self.assertEqual(message[3:8], ["SEARCH", "FL", 8000, "ach2147", 2])
+        self.assertEqual(peer_node.key_digests.snapshot()["routed"], 1)
+
+    def test_hello_exchanges_digests(self):
+        nodes = [PeerNode("127.0.0.1", 0, key_digests=True) for _ in range(2)]
+        try:
+            for node in nodes:
+                node.start_server()
+            a, b = nodes
+            a.add_key_value("k1 v1")
+            b.add_key_value("k2 v2")
+            with self.assertLogs("p2p", "INFO") as logs:
+                a.add_neighbor(f"127.0.0.1:{b.port}")
+            self.assertNotIn(DIGEST_PREFIX, "\n".join(logs.output))
+            deadline = time.monotonic() + 5
+            while not a.key_digests.neighbors and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(a.key_digests.matches("k2", [f"127.0.0.1:{b.port}"]), [f"127.0.0.1:{b.port}"])
+            self.assertEqual(b.key_digests.matches("k1", [f"127.0.0.1:{a.port}"]), [f"127.0.0.1:{a.port}"])
+        finally:
+            for node in nodes:
+                node.connection_pool.close_all()
+                node.server.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
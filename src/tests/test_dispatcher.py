@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from dispatcher import BoundedQueue, InboundDispatcher, OutboundQueues
+from peer_node import PeerNode
+
+SEARCH = ["127.0.0.1:7000", 1, 10, "SEARCH", "FL", 7000, "missing", 0]
+
+
+class TestBoundedQueue(unittest.TestCase):
+    def test_drop_oldest(self):
+        queue = BoundedQueue(2, "drop_oldest")
+        for item in "abc":
+            self.assertTrue(queue.put(item))
+        self.assertEqual(list(queue.items), ["b", "c"])
+        self.assertEqual(queue.snapshot()["dropped"], 1)
+
+    def test_reject(self):
+        queue = BoundedQueue(2, "reject")
+        self.assertTrue(queue.put("a"))
+        self.assertTrue(queue.put("b"))
+        self.assertFalse(queue.put("c"))
+        self.assertEqual(queue.snapshot(), {"depth": 2, "max_depth": 2, "dropped": 0, "rejected": 1})
+
+
+class TestInboundDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+
+    def test_rejects_with_busy_reply_when_full(self):
+        dispatcher = InboundDispatcher(self.peer_node, workers=0, queue_size=1, policy="reject")
+        client_socket = MagicMock()
+        self.assertTrue(dispatcher.submit(SEARCH, client_socket))
+        self.assertFalse(dispatcher.submit(SEARCH, client_socket))
+        client_socket.sendall.assert_called_with(b"127.0.0.1:8000 0 1 BUSY\n")
+
+    def test_hello_bypasses_the_queue(self):
+        dispatcher = InboundDispatcher(self.peer_node, workers=0, queue_size=1, policy="reject")
+        dispatcher.submit(SEARCH, MagicMock())
+        client_socket = MagicMock()
+        dispatcher.submit(["127.0.0.1:8001", 0, 1, "HELLO"], client_socket)
+        client_socket.sendall.assert_called_with(b"HELLO_OK\n")
+        self.assertIn("127.0.0.1:8001", self.peer_node.neighbors)
+
+    def test_workers_drain_the_queue(self):
+        dispatcher = InboundDispatcher(self.peer_node, workers=2)
+        for seq_no in range(10):
+            dispatcher.submit(["127.0.0.1:7000", seq_no] + SEARCH[2:], MagicMock())
+        self.assertTrue(dispatcher.queue.wait_idle(timeout=2))
+        self.assertEqual(dispatcher.snapshot()["processed"], 10)
+        self.assertEqual(self.peer_node.stats.stats["flooding"]["count"], 10)
+
+
+class TestOutboundQueues(unittest.TestCase):
+    def test_slow_neighbor_does_not_block_others(self):
+        release = threading.Event()
+        delivered = []
+
+        def send(neighbor, data):
+            if neighbor == "slow":
+                release.wait(timeout=2)
+            delivered.append((neighbor, data))
+
+        pool = MagicMock()
+        pool.send.side_effect = send
+        outbound = OutboundQueues(pool, queue_size=4)
+        outbound.send("slow", b"1")
+        outbound.send("fast", b"2")
+        self.assertTrue(outbound.queue_for("fast").wait_idle(timeout=2))
+        self.assertEqual(delivered, [("fast", b"2")])
+        release.set()
+        self.assertTrue(outbound.flush(timeout=2))
+        self.assertEqual(len(delivered), 2)
+
+    def test_drop_stops_the_sender_thread(self):
+        threads = threading.active_count()
+        outbound = OutboundQueues(MagicMock(), queue_size=4)
+        outbound.send("127.0.0.1:8001", b"1")
+        self.assertTrue(outbound.flush(timeout=2))
+        outbound.drop("127.0.0.1:8001")
+        deadline = time.monotonic() + 2
+        while threading.active_count() > threads and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual((outbound.queues, outbound.latencies), ({}, {}))
+        # Um vizinho que volta ganha fila e thread novas
+        outbound.send("127.0.0.1:8001", b"2")
+        self.assertTrue(outbound.flush(timeout=2))
+        self.assertEqual(outbound.snapshot()["127.0.0.1:8001 sent"], 1)
+
+    def test_queued_messages_go_out_in_one_write(self):
+        release = threading.Event()
+        writes = []
+
+        def send(neighbor, *buffers):
+            release.wait(timeout=2)
+            writes.append(buffers)
+
+        pool = MagicMock()
+        pool.send.side_effect = send
+        outbound = OutboundQueues(pool, queue_size=16, batch_size=3)
+        for data in (b"1", b"2", b"3", b"4", b"5"):
+            outbound.send("127.0.0.1:8001", data)
+        release.set()
+        self.assertTrue(outbound.flush(timeout=2))
+        # A primeira escrita leva o que ja estava na fila; o resto sai em lotes
+        self.assertEqual(b"".join(b"".join(buffers) for buffers in writes), b"12345")
+        self.assertLessEqual(max(len(buffers) for buffers in writes), 3)
+        self.assertLess(len(writes), 5)
+        snapshot = outbound.snapshot()
+        self.assertEqual(snapshot["127.0.0.1:8001 sent"], 5)
+        self.assertGreater(snapshot["127.0.0.1:8001 latency_max_ms"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
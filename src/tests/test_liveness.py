@@ -0,0 +1,99 @@
+import time
+import unittest
+from unittest.mock import patch
+from liveness import Liveness
+from peer_node import PeerNode
+
+NEIGHBOR = "127.0.0.1:8001"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLiveness(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+        self.peer_node.neighbors.add(NEIGHBOR)
+        self.clock = FakeClock()
+        self.liveness = Liveness(self.peer_node, timeout=1.0, threshold=2, clock=self.clock)
+        self.peer_node.liveness = self.liveness
+        patcher = patch("message.MessageHandler.send_pooled")
+        self.send_pooled = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def miss(self):
+        self.liveness.ping_all()
+        self.clock.now += 1.0
+        self.liveness.check()
+
+    def test_evicts_after_threshold_and_keeps_pinging(self):
+        self.miss()
+        self.assertIn(NEIGHBOR, self.peer_node.neighbors)
+        self.miss()
+        self.assertNotIn(NEIGHBOR, self.peer_node.neighbors)
+        self.assertEqual(self.liveness.snapshot()["evicted_neighbors"], [NEIGHBOR])
+        self.send_pooled.reset_mock()
+        self.liveness.ping_all()
+        self.send_pooled.assert_called_once()
+        self.assertEqual(self.send_pooled.call_args.args[1], NEIGHBOR)
+
+    def test_pong_measures_rtt_and_readmits(self):
+        self.miss()
+        self.miss()
+        self.liveness.ping_all()
+        seq_no = self.peer_node.sequence_number - 1
+        self.clock.now += 0.25
+        self.peer_node.message_handler.process_message(f"{NEIGHBOR} {seq_no} 1 PONG", None)
+        self.assertIn(NEIGHBOR, self.peer_node.neighbors)
+        state = self.liveness.snapshot()["neighbors"][NEIGHBOR]
+        self.assertEqual(state["last_rtt_ms"], 250)
+        self.assertEqual(state["failures"], 0)
+        self.assertEqual(state["misses"], 2)
+        self.assertEqual(self.liveness.snapshot()["readmitted"], 1)
+
+    def test_answers_ping_with_same_seq(self):
+        self.peer_node.message_handler.process_message(f"{NEIGHBOR} 42 1 PING", None)
+        self.send_pooled.assert_called_with("127.0.0.1:8000 42 1 PONG\n", NEIGHBOR)
+
+    def test_bye_is_not_readmitted(self):
+        self.miss()
+        self.miss()
+        self.peer_node.message_handler.handle_bye(NEIGHBOR)
+        self.send_pooled.reset_mock()
+        self.liveness.ping_all()
+        self.send_pooled.assert_not_called()
+        self.assertNotIn(NEIGHBOR, self.liveness.snapshot()["neighbors"])
+
+
+class TestLivenessNetwork(unittest.TestCase):
+    def test_hung_neighbor_is_evicted_and_readmitted(self):
+        options = {"heartbeat_interval": 0.05, "heartbeat_timeout": 0.05, "heartbeat_threshold": 2}
+        a = PeerNode("127.0.0.1", 0, **options)
+        b = PeerNode("127.0.0.1", 0)
+        a.start_server()
+        b.start_server()
+        a.add_neighbor(f"127.0.0.1:{b.port}")
+        try:
+            deadline = time.monotonic() + 2
+            while a.liveness.snapshot()["pongs"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertGreater(a.liveness.snapshot()["pongs"], 0)
+            # b trava: recebe os PINGs mas nao responde mais
+            with patch.object(b.message_handler, "send_message"):
+                while len(a.neighbors) and time.monotonic() < deadline + 2:
+                    time.sleep(0.01)
+                self.assertEqual(len(a.neighbors), 0)
+            while not len(a.neighbors) and time.monotonic() < deadline + 4:
+                time.sleep(0.01)
+            self.assertEqual(list(a.neighbors), [f"127.0.0.1:{b.port}"])
+            self.assertEqual(a.liveness.snapshot()["readmitted"], 1)
+        finally:
+            a.liveness.stop()
+            for node in (a, b):
+                node.connection_pool.close_all()
+                node.server.close()
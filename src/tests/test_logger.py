@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import logger
+from peer_node import PeerNode
+
+SEARCH = "127.0.0.1:5001 7 10 SEARCH FL 5001 k1 1"
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+        self.addCleanup(logger.configure)
+
+    def test_levels_and_format(self):
+        logger.configure("INFO", stream=self.output)
+        logger.debug("descartado %s", "x")
+        logger.log("Vizinho %s", "WARNING", "127.0.0.1:5002")
+        self.assertRegex(
+            self.output.getvalue(),
+            r"^\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] \[.+\] \[WARNING\]: Vizinho 127.0.0.1:5002\n$",
+        )
+
+    def test_quiet_level_skips_formatting(self):
+        logger.configure("WARNING", stream=self.output)
+        # Vizinho binario: o texto da mensagem so seria montado para o log
+        self.peer_node.binary_neighbors.add("127.0.0.1:5002")
+        with patch.object(self.peer_node.outbound, "send"), patch(
+            "message.protocol.describe"
+        ) as describe, patch("search_strategy.FloodingSearchStrategy.search"):
+            self.peer_node.message_handler.process_message(SEARCH, None)
+            self.peer_node.message_handler.send_message(SEARCH.split(), "127.0.0.1:5002")
+        describe.assert_not_called()
+        self.assertEqual(self.output.getvalue(), "")
+
+    def test_async_output_is_flushed_on_shutdown(self):
+        logger.configure("DEBUG", stream=self.output, async_output=True)
+        with patch("search_strategy.FloodingSearchStrategy.search"):
+            self.peer_node.message_handler.process_message(SEARCH, None)
+        logger.shutdown()
+        self.assertIn("Recebido: 127.0.0.1:5001 7 10 SEARCH FL 5001 k1 1", self.output.getvalue())
+
+    def test_sampled_json_events(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "eventos.jsonl")
+            logger.configure("WARNING", stream=self.output, event_file=path, event_sample=1.0)
+            with patch("search_strategy.FloodingSearchStrategy.search"):
+                self.peer_node.message_handler.process_message(SEARCH, None)
+            reply = ["127.0.0.1:8000", 9, 100, "VAL", "FL", "k1", "v1", 1, 7]
+            with patch.object(self.peer_node.outbound, "send"):
+                self.peer_node.message_handler.send_message(reply, "127.0.0.1:5001")
+            logger.configure("WARNING", stream=self.output, event_file=path, event_sample=0.0)
+            with patch("search_strategy.FloodingSearchStrategy.search"):
+                self.peer_node.message_handler.process_message(SEARCH, None)
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+        self.assertEqual([event["event"] for event in events], ["receive", "send"])
+        # Os dois eventos pertencem a mesma busca (origem, seq_no)
+        self.assertEqual({(event["origin"], event["seq"]) for event in events}, {("127.0.0.1:5001", 7)})
+        self.assertEqual(events[0]["op"], "SEARCH")
+        self.assertEqual(events[1]["neighbor"], "127.0.0.1:5001")
@@ -23,7 +23,7 @@ class TestMessageHandler(unittest.TestCase):
         self.message_handler.send_message(message, neighbor)
 
         # Check that the connection was made correctly
-        mock_create_connection.assert_called_with(("127.0.0.1", 8001))
+        mock_create_connection.assert_called_with(("127.0.0.1", 8001), timeout=2.0)
         # Check that the message was sent correctly
         mock_socket.sendall.assert_called_with(message.encode())
         # Check that recv was called once
@@ -39,7 +39,7 @@ class TestMessageHandler(unittest.TestCase):
 
         self.message_handler.send_message(message, neighbor)
 
-        mock_create_connection.assert_called_with(("127.0.0.1", 8001))
+        mock_create_connection.assert_called_with(("127.0.0.1", 8001), timeout=2.0)
         print("Erro ao conectar-se ao vizinho 127.0.0.1:8001: Connection error")
 
 
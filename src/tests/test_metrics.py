@@ -0,0 +1,72 @@
+import random
+import unittest
+from metrics import Histogram, PrometheusWriter, RunningStats, Summary, metric_name
+from statistics import Statistics
+
+
+class TestRunningStats(unittest.TestCase):
+    def test_matches_two_pass_mean_and_stdev(self):
+        values = [random.Random(1).gauss(1e6, 3) for _ in range(1000)]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        mean = sum(values) / len(values)
+        stdev = (sum((value - mean) ** 2 for value in values) / (len(values) - 1)) ** 0.5
+        self.assertAlmostEqual(stats.mean, mean, places=6)
+        self.assertAlmostEqual(stats.stdev(), stdev, places=6)
+        self.assertEqual((stats.min, stats.max), (min(values), max(values)))
+
+
+class TestHistogram(unittest.TestCase):
+    def test_small_values_are_exact(self):
+        histogram = Histogram()
+        for hop in [1, 2, 2, 3, 7]:
+            histogram.add(hop)
+        self.assertEqual(histogram.percentile(50), 2)
+        self.assertEqual(histogram.percentile(99), 7)
+
+    def test_percentile_error_and_bounded_buckets(self):
+        rng = random.Random(2)
+        values = sorted(int(rng.expovariate(1 / 5000)) for _ in range(100000))
+        histogram = Histogram(precision=5)
+        for value in values:
+            histogram.add(value)
+        for q in (50, 90, 99):
+            exact = values[int(q / 100 * len(values)) - 1]
+            self.assertLessEqual(abs(histogram.percentile(q) - exact), exact / 2**5 + 1)
+        self.assertLess(len(histogram.counts), 500)
+
+
+class TestPrometheus(unittest.TestCase):
+    def test_summary_and_labels(self):
+        summary = Summary()
+        for value in (10, 20, 30):
+            summary.add(value)
+        writer = PrometheusWriter()
+        name = writer.family("lookup_latency_seconds", "summary", "Latencia")
+        writer.summary(name, summary, scale=1e-3, method='a"b')
+        lines = writer.text().splitlines()
+        self.assertEqual(lines[1], "# TYPE p2p_lookup_latency_seconds summary")
+        self.assertIn('p2p_lookup_latency_seconds{quantile="0.5",method="a\\"b"} 0.02', lines)
+        self.assertIn('p2p_lookup_latency_seconds_count{method="a\\"b"} 3', lines)
+        self.assertEqual(metric_name("fila de entrada"), "fila_de_entrada")
+
+    def test_samples_follow_their_family_header(self):
+        stats = Statistics()
+        stats.register_source(
+            "filas de saida",
+            lambda: {"depth": 3, "dropped": 0, "127.0.0.1:5001 depth": 1, "127.0.0.1:5002 depth": 2},
+        )
+        families = {}
+        family = None
+        for line in stats.prometheus().splitlines():
+            if line.startswith("# TYPE"):
+                family = line.split()[2]
+                self.assertNotIn(family, families)
+                families[family] = []
+            elif not line.startswith("#"):
+                name = line.split("{")[0].split()[0]
+                self.assertTrue(name.startswith(family), (family, line))
+                families[family].append(line)
+        self.assertEqual(families["p2p_filas_de_saida_depth"], ["p2p_filas_de_saida_depth 3"])
+        self.assertEqual(len(families["p2p_filas_de_saida_neighbor_depth"]), 2)
@@ -0,0 +1,122 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from message import MessageHandler
+from node_state import NeighborSet, SequenceAllocator
+from peer_node import PeerNode
+
+THREADS = 16
+
+
+def hammer(target, count=THREADS):
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class TestNodeState(unittest.TestCase):
+    def test_sequence_numbers_are_unique(self):
+        allocator = SequenceAllocator()
+        results = [[] for _ in range(THREADS)]
+        errors = hammer(lambda i: results[i].extend(allocator.next() for _ in range(2000)))
+        allocated = [value for result in results for value in result]
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(allocated), list(range(THREADS * 2000)))
+
+    def test_iteration_is_a_snapshot(self):
+        neighbors = NeighborSet(["a", "b", "c"])
+        seen = []
+        for neighbor in neighbors:
+            neighbors.discard("c")
+            seen.append(neighbor)
+        self.assertEqual(seen, ["a", "b", "c"])
+        self.assertEqual(neighbors, ["a", "b"])
+
+    def test_ports_are_parsed_on_admission(self):
+        neighbors = NeighborSet(["127.0.0.1:5001", "127.0.0.1:5002"])
+        neighbors.add("10.0.0.1:5003")
+        self.assertEqual(neighbors.excluding_port(5002), ["127.0.0.1:5001", "10.0.0.1:5003"])
+        self.assertEqual(neighbors.excluding_port(None), list(neighbors))
+        self.assertEqual(neighbors.for_port("5003"), "10.0.0.1:5003")
+        neighbors.discard("10.0.0.1:5003")
+        self.assertIsNone(neighbors.for_port(5003))
+
+
+class TestNodeStress(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+        self.message_handler = MessageHandler(self.peer_node)
+        self.peer_node.neighbors.add("127.0.0.1:9001")
+        self.peer_node.neighbors.add("127.0.0.1:9002")
+        self.sent = []
+        self.sent_lock = threading.Lock()
+
+    def record_send(self, message, data, neighbor):
+        with self.sent_lock:
+            self.sent.append((tuple(message), neighbor))
+
+    def test_flood_is_forwarded_once_under_contention(self):
+        messages = [
+            f"127.0.0.1:7000 {seq_no} 10 SEARCH FL 9001 missing 0" for seq_no in range(200)
+        ]
+
+        def worker(index):
+            for message in messages[index % 2 :] + messages[: index % 2]:
+                self.message_handler.process_message(message, MagicMock())
+
+        with patch.object(MessageHandler, "enqueue", side_effect=self.record_send):
+            errors = hammer(worker)
+
+        self.assertEqual(errors, [])
+        # Cada busca e repassada uma unica vez, apenas para 9002 (9001 e o ultimo salto)
+        self.assertEqual(len(self.sent), len(messages))
+        self.assertEqual({neighbor for _, neighbor in self.sent}, {"127.0.0.1:9002"})
+        self.assertEqual(
+            self.peer_node.stats.stats["flooding"]["count"], THREADS * len(messages)
+        )
+
+    def test_neighbor_churn_during_flooding(self):
+        def worker(index):
+            client_socket = MagicMock()
+            origin = f"127.0.0.1:{10000 + index}"
+            for seq_no in range(100):
+                if index % 2:
+                    self.message_handler.process_message(
+                        f"{origin} {seq_no} 1 HELLO", client_socket
+                    )
+                    self.message_handler.process_message(
+                        f"{origin} {seq_no} 1 BYE", client_socket
+                    )
+                else:
+                    self.message_handler.process_message(
+                        f"{origin} {seq_no} 10 SEARCH FL 1 missing 0", client_socket
+                    )
+
+        with patch.object(MessageHandler, "enqueue", side_effect=self.record_send):
+            errors = hammer(worker)
+
+        self.assertEqual(errors, [])
+        neighbors = list(self.peer_node.neighbors)
+        self.assertEqual(len(neighbors), len(set(neighbors)))
+        self.assertEqual(neighbors, ["127.0.0.1:9001", "127.0.0.1:9002"])
+        seq_numbers = set()
+        for message, _ in self.sent:
+            seq_numbers.add((message[0], message[1]))
+        self.assertEqual(len(seq_numbers), (THREADS // 2) * 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
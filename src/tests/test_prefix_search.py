@@ -0,0 +1,83 @@
+import unittest
+import protocol
+from searches import SearchRecord
+from simulator import SimulatedNetwork, grid_graph
+
+HOLDER = "127.0.0.1:5003"
+# Nos 0..24 da grade 5x5 tem as chaves chave0..chave24
+PREFIX_MATCHES = ["chave1"] + [f"chave1{n}" for n in range(10)]
+
+
+class TestPrefixRecord(unittest.TestCase):
+    def test_keeps_smallest_matches_and_points_to_next_page(self):
+        record = SearchRecord(1, ["k*"], "FL", max_matches=2)
+        for key in ("k3", "k1", "k4", "k2", "x1"):
+            if record.query_for(key):
+                record.add_result(HOLDER, key, "v", 2)
+        self.assertEqual(sorted(result["key"] for result in record.results), ["k1", "k2"])
+        self.assertEqual(record.next_page("k*"), "k*>k2")
+        self.assertEqual(record.to_dict()["prefixes"]["k*"]["dropped"], 2)
+        self.assertEqual(record.status(), "done")
+
+    def test_truncated_page_sets_cursor(self):
+        record = SearchRecord(1, ["k*>k1"], "FL")
+        self.assertIsNone(record.query_for("k1"))
+        record.add_result(HOLDER, "k2", "v", 1)
+        record.add_result("127.0.0.1:5004", "k2", "v", 3)
+        record.page_truncated("k2")
+        self.assertEqual(len(record.results), 1)
+        self.assertEqual(record.next_page("k*>k1"), "k*>k2")
+
+    def test_pages_do_not_finish_search(self):
+        # Nem a pagina local nem as dos vizinhos encerram a consulta
+        record = SearchRecord(1, ["k*", "x"], "ER", max_matches=3)
+        record.add_result(HOLDER, "k1", "v", 0)
+        record.add_result("127.0.0.1:5004", "k2", "v", 2)
+        record.add_result("127.0.0.1:5004", "x", "v", 2)
+        self.assertFalse(record.finished)
+        self.assertEqual(record.status(), "partial")
+        record.add_result("127.0.0.1:5005", "k3", "v", 3)
+        self.assertEqual(record.status(), "done")
+
+    def test_more_flag_round_trip(self):
+        parts = ["127.0.0.1:5009", 3, 100, "MVAL", "FL", "k1%20k2", "a%20b", 2, 7, protocol.MORE]
+        decoded = protocol.FrameDecoder().feed(protocol.encode_binary(parts))
+        self.assertTrue(protocol.has_more(decoded[0]))
+        self.assertFalse(protocol.is_cached(decoded[0]))
+
+
+class TestPrefixSearch(unittest.TestCase):
+    def test_flooding_collects_every_match(self):
+        for binary in (True, False):
+            network = SimulatedNetwork(grid_graph(5, 5), seed=1, binary=binary)
+            record = network.search(sorted(network.nodes)[0], "chave1*", "FL")
+            self.assertEqual(sorted(result["key"] for result in record.results), PREFIX_MATCHES)
+
+    def test_expanding_ring_keeps_growing_after_first_page(self):
+        for mode in ("FL", "ER"):
+            network = SimulatedNetwork(grid_graph(4, 4), seed=1)
+            record = network.search(sorted(network.nodes)[0], "chave*", mode)
+            self.assertEqual(len(record.results), 16, mode)
+
+    def test_all_modes_find_matches(self):
+        for mode in ("FL", "RW", "BP", "ER", "KW"):
+            network = SimulatedNetwork(grid_graph(5, 5), seed=1)
+            record = network.search(sorted(network.nodes)[0], "chave2*", mode)
+            self.assertTrue(record.results, mode)
+            self.assertTrue(all(result["key"].startswith("chave2") for result in record.results))
+
+    def test_pages_are_bounded(self):
+        network = SimulatedNetwork(grid_graph(3, 3), seed=1, prefix_limit=2, prefix_max_results=3)
+        origin, holder = sorted(network.nodes)[:2]
+        for n in range(5):
+            network.nodes[holder].add_key_value(f"fruta{n} valor com espacos {n}")
+        record = network.search(origin, "fruta*", "FL")
+        self.assertEqual([result["key"] for result in record.results], ["fruta0", "fruta1"])
+        self.assertEqual(record.results[0]["value"], "valor com espacos 0")
+        self.assertEqual(record.next_page("fruta*"), "fruta*>fruta1")
+
+        record = network.search(origin, record.next_page("fruta*"), "FL")
+        self.assertEqual([result["key"] for result in record.results], ["fruta2", "fruta3"])
+        record = network.search(origin, "fruta*>fruta3", "FL")
+        self.assertEqual([result["key"] for result in record.results], ["fruta4"])
+        self.assertIsNone(record.next_page("fruta*>fruta3"))
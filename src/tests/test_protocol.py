@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import protocol
+from message import MessageHandler
+from peer_node import PeerNode
+
+
+SEARCH = ["127.0.0.1:5001", 7, 99, "SEARCH", "FL", 5003, "key1234", 2]
+VAL = ["127.0.0.1:5009", 3, 100, "VAL", "RW", "key1234", "ExampleValue", 4]
+
+
+class TestProtocol(unittest.TestCase):
+    def test_binary_round_trip(self):
+        check = ["127.0.0.1:5004", 7, 90, "CHECK", "KW", 5004, "key1234", 8]
+        for parts in (SEARCH, VAL, check):
+            frame = protocol.encode_binary(parts)
+            self.assertEqual(frame[0], protocol.MAGIC)
+            self.assertEqual(protocol.FrameDecoder().feed(frame), [parts])
+
+    def test_reply_options_round_trip(self):
+        parts = VAL + [12, protocol.CACHED, protocol.ROUTE_PREFIX + "127.0.0.1:5001"]
+        frame = protocol.encode_binary(parts)
+        decoded = protocol.FrameDecoder().feed(frame)[0]
+        self.assertEqual(decoded, parts)
+        self.assertTrue(protocol.is_cached(decoded))
+        self.assertEqual(protocol.reply_route(decoded), "127.0.0.1:5001")
+        self.assertIsNone(protocol.reply_route(VAL))
+
+    def test_decodes_across_arbitrary_segmentation(self):
+        stream = (
+            protocol.encode_binary(SEARCH)
+            + protocol.encode_text(VAL)
+            + protocol.encode_binary(VAL)
+        )
+        decoder = protocol.FrameDecoder()
+        messages = []
+        for i in range(len(stream)):
+            messages.extend(decoder.feed(stream[i : i + 1]))
+        self.assertEqual(
+            [protocol.describe(parts) for parts in messages],
+            [protocol.describe(parts) for parts in (SEARCH, VAL, VAL)],
+        )
+
+    def test_falls_back_to_text(self):
+        parts = ["localhost:5001"] + SEARCH[1:]
+        self.assertEqual(protocol.encode(parts, binary=True), protocol.encode_text(parts))
+        self.assertEqual(protocol.encode(SEARCH), protocol.encode_text(SEARCH))
+
+    def test_oversized_payload_falls_back_to_text(self):
+        # Nenhum campo passa do limite, mas juntos nao cabem em um quadro
+        keys = protocol.encode_keys([f"chave{n:05}" for n in range(3000)])
+        values = protocol.encode_keys([f"valor{n:015}" for n in range(3000)])
+        parts = ["127.0.0.1:5009", 3, 100, "MVAL", "FL", keys, values, 2, 7]
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.encode_binary(parts)
+        self.assertEqual(protocol.encode(parts, binary=True), protocol.encode_text(parts))
+
+    def test_rejects_unknown_version(self):
+        frame = bytearray(protocol.encode_binary(SEARCH))
+        frame[1] = protocol.VERSION + 1
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.FrameDecoder().feed(bytes(frame))
+
+
+class TestRelayFastPath(unittest.TestCase):
+    def test_relay_frame_patches_hop_fields(self):
+        received = protocol.FrameDecoder().feed(protocol.encode_binary(SEARCH))[0]
+        self.assertIsInstance(received, protocol.Frame)
+        forwarded = SEARCH[:2] + [98, "SEARCH", "FL", 8000, "key1234", 3]
+        frame = protocol.relay_frame(received, forwarded)
+        self.assertEqual(bytes(frame), protocol.encode_binary(forwarded))
+        # Chave alterada ou mensagem que nao veio de um quadro: recodifica
+        self.assertIsNone(protocol.relay_frame(received, forwarded[:6] + ["k2", 3]))
+        self.assertIsNone(protocol.relay_frame(SEARCH, forwarded))
+        val = protocol.FrameDecoder().feed(protocol.encode_binary(VAL))[0]
+        self.assertNotIsInstance(val, protocol.Frame)
+
+    def test_forward_encodes_once_per_format(self):
+        peer_node = PeerNode("127.0.0.1", 8000)
+        for port in (8001, 8002, 8003, 8004):
+            peer_node.neighbors.add(f"127.0.0.1:{port}")
+            if port != 8004:
+                peer_node.binary_neighbors.add(f"127.0.0.1:{port}")
+        received = protocol.FrameDecoder().feed(protocol.encode_binary(SEARCH))[0]
+        with patch.object(peer_node.outbound, "send") as send:
+            peer_node.message_handler.process_parts(received, None)
+        sent = {call.args[0]: call.args[1] for call in send.call_args_list}
+        self.assertEqual(len(sent), 4)
+        self.assertIs(sent["127.0.0.1:8001"], sent["127.0.0.1:8002"])
+        self.assertEqual(sent["127.0.0.1:8004"], b"127.0.0.1:5001 7 98 SEARCH FL 8000 key1234 3\n")
+        self.assertEqual(peer_node.stats.sent[("SEARCH", "FL")], 4)
+
+
+class TestCapabilityNegotiation(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+        self.message_handler = MessageHandler(self.peer_node)
+
+    def test_hello_with_capability(self):
+        client_socket = MagicMock()
+        self.message_handler.process_message(
+            "127.0.0.1:8001 0 1 HELLO BIN1", client_socket
+        )
+        client_socket.sendall.assert_called_with(b"HELLO_OK BIN1\n")
+        self.assertIn("127.0.0.1:8001", self.peer_node.binary_neighbors)
+
+    def test_hello_from_text_peer(self):
+        client_socket = MagicMock()
+        self.message_handler.process_message("127.0.0.1:8001 0 1 HELLO", client_socket)
+        client_socket.sendall.assert_called_with(b"HELLO_OK\n")
+        self.assertNotIn("127.0.0.1:8001", self.peer_node.binary_neighbors)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import time
+import unittest
+from peer_node import PeerNode
+from search_strategy import FloodingSearchStrategy
+
+
+class TestReplyPath(unittest.TestCase):
+    def start_line(self, reply_mode):
+        # Linha A -- B -- C -- D: D guarda a chave
+        self.nodes = [
+            PeerNode("127.0.0.1", 0, reply_mode=reply_mode, result_cache_size=16)
+            for _ in range(4)
+        ]
+        for node in self.nodes:
+            node.start_server()
+        for left, right in zip(self.nodes, self.nodes[1:]):
+            left.add_neighbor(f"127.0.0.1:{right.port}")
+        self.nodes[3].add_key_value("k1 v1")
+        return self.nodes
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.connection_pool.close_all()
+            node.server.close()
+
+    def search(self, node, key):
+        record = node.start_search(FloodingSearchStrategy(node), [key])
+        self.assertTrue(record.wait(5))
+        return record
+
+    def test_reverse_reply_uses_neighbor_connections(self):
+        a, b, c, d = self.start_line("reverse")
+        record = self.search(a, "k1")
+        self.assertEqual(record.results[0]["holder"], f"127.0.0.1:{d.port}")
+        self.assertEqual(record.results[0]["hops"], 3)
+        self.assertNotIn(f"127.0.0.1:{a.port}", d.connection_pool.connections)
+        # Os nos intermediarios viram a resposta e a guardaram no cache
+        self.assertEqual(b.result_cache.lookup("k1")[0], "v1")
+        self.assertEqual(c.result_cache.lookup("k1")[0], "v1")
+        self.assertEqual(a.stats.method_summary("flooding")["mean_hops"], 3)
+        self.assertEqual(b.stats.method_summary("flooding")["mean_hops"], 0)
+
+    def test_direct_reply_dials_origin(self):
+        a, b, c, d = self.start_line("direct")
+        record = self.search(a, "k1")
+        self.assertEqual(record.results[0]["hops"], 3)
+        deadline = time.monotonic() + 1
+        while f"127.0.0.1:{a.port}" not in d.connection_pool.connections:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertIsNone(b.result_cache.lookup("k1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
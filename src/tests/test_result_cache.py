@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import protocol
+from message import MessageHandler
+from peer_node import PeerNode
+from result_cache import ResultCache
+from search_strategy import FloodingSearchStrategy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResultCache(max_entries=2, ttl=10, clock=self.clock)
+
+    def test_hit_ratio_and_hops_saved(self):
+        self.cache.store("k1", "v1", "127.0.0.1:5003", 3)
+        self.assertEqual(self.cache.lookup("k1", 1), ("v1", "127.0.0.1:5003", 3))
+        self.assertIsNone(self.cache.lookup("k2"))
+        snapshot = self.cache.snapshot()
+        self.assertEqual(snapshot["hit_ratio"], 0.5)
+        self.assertEqual(snapshot["hops_saved"], 2)
+
+    def test_absolute_ttl_despite_hits(self):
+        self.cache.store("k1", "v1", "127.0.0.1:5003", 3)
+        self.clock.now = 6
+        self.assertIsNotNone(self.cache.lookup("k1"))
+        self.clock.now = 11
+        self.assertIsNone(self.cache.lookup("k1"))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.store("k1", "v1", "127.0.0.1:5003", 1)
+        self.cache.store("k2", "v2", "127.0.0.1:5003", 1)
+        self.cache.lookup("k1")
+        self.cache.store("k3", "v3", "127.0.0.1:5003", 1)
+        self.assertIsNone(self.cache.lookup("k2"))
+        self.assertIsNotNone(self.cache.lookup("k1"))
+
+
+class TestCachedAnswers(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000, result_cache_size=16)
+        self.message_handler = MessageHandler(self.peer_node)
+
+    def test_val_is_cached_and_answers_later_search(self):
+        self.message_handler.process_parts(
+            ["127.0.0.1:5009", 3, 100, "VAL", "FL", "k1", "v1", 4, 1], MagicMock()
+        )
+        with patch.object(MessageHandler, "send_message") as mock_send_message:
+            self.message_handler.process_message(
+                "127.0.0.1:5001 7 10 SEARCH FL 5001 k1 1", MagicMock()
+            )
+        reply, neighbor = mock_send_message.call_args.args
+        self.assertEqual(neighbor, "127.0.0.1:5001")
+        self.assertEqual(reply[3:10], ["VAL", "FL", "k1", "v1", 1, 7, protocol.CACHED])
+        self.assertEqual(self.peer_node.result_cache.snapshot()["hops_saved"], 3)
+
+    def test_cached_reply_is_counted_and_not_recached(self):
+        record = self.peer_node.searches.register(9, ["k1"], "FL")
+        frame = protocol.encode_binary(
+            ["127.0.0.1:5009", 3, 100, "VAL", "FL", "k1", "v1", 2, 9, protocol.CACHED]
+        )
+        for parts in protocol.FrameDecoder().feed(frame):
+            self.message_handler.process_parts(parts, MagicMock())
+        self.assertTrue(record.results[0]["cached"])
+        self.assertEqual(self.peer_node.stats.snapshot()["flooding"]["cached_answers"], 1)
+        self.assertEqual(len(self.peer_node.result_cache.entries), 0)
+
+    def test_origin_answers_from_cache(self):
+        self.peer_node.result_cache.store("k1", "v1", "127.0.0.1:5009", 4)
+        strategy = FloodingSearchStrategy(self.peer_node)
+        with patch.object(MessageHandler, "send_message") as mock_send_message:
+            record = self.peer_node.start_search(strategy, ["k1"])
+        mock_send_message.assert_not_called()
+        self.assertEqual(record.status(), "done")
+        self.assertEqual(record.results[0]["holder"], "127.0.0.1:5009")
+
+    def test_disabled_by_default(self):
+        peer_node = PeerNode("127.0.0.1", 8001)
+        self.assertIsNone(peer_node.result_cache)
+        self.assertNotIn("cache de resultados", peer_node.stats.snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from routing import RoutingHints
+from simulator import SimulatedNetwork, load_topology
+
+A, B, C = "127.0.0.1:5001", "127.0.0.1:5002", "127.0.0.1:5003"
+
+
+class TestRoutingHints(unittest.TestCase):
+    def setUp(self):
+        self.hints = RoutingHints(explore=0)
+
+    def test_learns_from_forwarded_search(self):
+        self.hints.remember((A, 7), B)
+        self.hints.learn((A, 7), ["ach2147"], "127.0.0.1:5009", [B, C])
+        for _ in range(20):
+            self.assertEqual(self.hints.choose([B, C], ["ach2147"]), B)
+        self.assertEqual(self.hints.snapshot()["hinted"], 20)
+
+    def test_neighbor_holder_wins_over_forward(self):
+        self.hints.remember((A, 7), B)
+        self.hints.learn((A, 7), ["ach2147"], C, [B, C])
+        self.assertEqual(self.hints.choose([B, C], ["ach2147"]), C)
+
+    def test_longest_prefix_first(self):
+        self.hints.remember((A, 1), B)
+        self.hints.learn((A, 1), ["ach0042"], "127.0.0.1:5009", [B, C])
+        self.hints.remember((A, 2), C)
+        self.hints.learn((A, 2), ["ach2147"], "127.0.0.1:5009", [B, C])
+        self.hints.learn((A, 2), ["ach2147"], "127.0.0.1:5009", [B, C])
+        self.assertEqual(self.hints.choose([B, C], ["ach0042"]), B)
+        self.assertEqual(self.hints.choose([B, C], ["ach9999"]), C)
+
+    def test_unknown_key_is_uniform(self):
+        self.assertIn(self.hints.choose([B, C], ["nada"]), [B, C])
+        self.assertEqual(self.hints.snapshot()["uniform"], 1)
+
+
+class TestRoutingHintsInNetwork(unittest.TestCase):
+    def test_hints_shorten_random_walks(self):
+        graph = load_topology("topologia_grid3x3")
+        hops = {}
+        for hints in (False, True):
+            network = SimulatedNetwork(graph, seed=1, routing_hints=hints)
+            hops[hints] = network.run("RW", 200)["mean_hops"]
+        self.assertLess(hops[True], hops[False])
+
+
+if __name__ == "__main__":
+    unittest.main()
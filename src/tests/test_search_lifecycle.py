@@ -0,0 +1,130 @@
+import random
+import unittest
+from unittest.mock import patch
+import protocol
+from peer_node import PeerNode
+from digest import KeyDigests
+from search_strategy import FloodingSearchStrategy
+from searches import SearchTable
+from simulator import SimulatedNetwork, grid_graph
+
+SEARCH = ["127.0.0.1:5001", 7, 10, "SEARCH", "FL", 5001, "k1", 1]
+
+
+class TestSearchRecord(unittest.TestCase):
+    def test_first_result_wins(self):
+        table = SearchTable()
+        record = table.register(1, ["k1", "k2"], "FL", first=1)
+        finished = []
+        record.add_done_callback(finished.append)
+        table.resolve(1, "127.0.0.1:5002", "k2", "v2", 2)
+        table.resolve(1, "127.0.0.1:5003", "k1", "v1", 3)
+        self.assertEqual(finished, [record])
+        self.assertEqual(record.status(), "done")
+        self.assertEqual([result["key"] for result in record.results], ["k2"])
+        self.assertIs(record.future.result(timeout=0), record)
+        self.assertEqual(table.snapshot()["done"], 1)
+
+    def test_finish_happens_once(self):
+        record = SearchTable().register(1, ["k1"], "FL")
+        self.assertTrue(record.finish("expired"))
+        self.assertFalse(record.add_result("127.0.0.1:5002", "k1", "v1", 1))
+        self.assertEqual(record.status(), "expired")
+        self.assertEqual(record.results, [])
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 8000)
+        self.peer_node.neighbors.add("127.0.0.1:8001")
+
+    def test_search_expires(self):
+        finished = []
+        with patch.object(self.peer_node.outbound, "send"):
+            record = self.peer_node.start_search(
+                FloodingSearchStrategy(self.peer_node),
+                ["k1"],
+                deadline=0.05,
+                callback=finished.append,
+            )
+            self.assertTrue(record.wait(2))
+        self.assertEqual(record.status(), "expired")
+        self.assertEqual(finished, [record])
+        self.assertEqual(self.peer_node.searches.snapshot()["expired"], 1)
+
+    def test_local_hit_is_not_launched(self):
+        self.peer_node.add_key_value("k1 v1")
+        with patch.object(self.peer_node.outbound, "send") as send:
+            record = self.peer_node.start_search(
+                FloodingSearchStrategy(self.peer_node, batched=True), ["k1", "k2"], first=1
+            )
+        self.assertEqual(record.status(), "done")
+        send.assert_not_called()
+
+
+class TestCancel(unittest.TestCase):
+    def test_cancelled_search_is_not_relayed(self):
+        peer_node = PeerNode("127.0.0.1", 8000)
+        peer_node.neighbors.add("127.0.0.1:8002")
+        cancel = ["127.0.0.1:5001", 7, 10, protocol.CANCEL, "FL", 5001, "-", 1]
+        with patch.object(peer_node.outbound, "send") as send:
+            peer_node.message_handler.process_parts(cancel, None)
+            # A busca ainda nao tinha passado por aqui: o CANCEL nao segue
+            send.assert_not_called()
+            peer_node.message_handler.process_parts(list(SEARCH), None)
+        send.assert_not_called()
+        self.assertIn(("127.0.0.1:5001", 7), peer_node.cancelled_searches)
+
+    def test_cancel_text_and_binary_round_trip(self):
+        cancel = ["127.0.0.1:5001", 7, 10, protocol.CANCEL, "RW", 5001, "-", 1]
+        for binary in (False, True):
+            decoded = protocol.FrameDecoder().feed(protocol.encode(cancel, binary))[0]
+            self.assertEqual([str(field) for field in decoded], [str(field) for field in cancel])
+
+    def test_cancel_catches_random_walker(self):
+        # Em uma linha o caminhante volta pelo caminho ja percorrido e
+        # encontra os nos marcados pelo CANCEL
+        sent = {}
+        for cancel in (False, True):
+            network = SimulatedNetwork(grid_graph(1, 8), seed=1, cancel_searches=cancel)
+            endpoints = sorted(network.nodes)
+            random.seed(1)
+            record = network.search(
+                endpoints[0], [network.keys[endpoints[2]], "ausente"], "RW", first=1
+            )
+            self.assertEqual(record.status(), "done")
+            sent[cancel] = network.counters["sent"]
+        self.assertEqual(sent[False], 101)
+        self.assertLess(sent[True], 25)
+
+    def test_prefix_search_is_not_cancelled(self):
+        for mode in ("RW", "BP"):
+            network = SimulatedNetwork(grid_graph(4, 4), seed=1, cancel_searches=True)
+            origin = sorted(network.nodes)[0]
+            record = network.search(origin, "chave*", mode, deadline=5)
+            self.assertEqual(len(record.results), 16, mode)
+            msg_id = (origin, record.seq_no)
+            self.assertFalse(any(msg_id in node.cancelled_searches for node in network.nodes.values()))
+
+    def test_cancel_follows_digest_routed_walker(self):
+        peer_node = PeerNode("127.0.0.1", 8000, key_digests=True)
+        for port in (5002, 5003, 5004):
+            peer_node.neighbors.add(f"127.0.0.1:{port}")
+        remote = KeyDigests()
+        remote.add_local("k1", {})
+        peer_node.key_digests.update("127.0.0.1:5003", remote.encode())
+        search = ["127.0.0.1:5001", 7, 10, "SEARCH", "RW", 5002, "k1", 1]
+        cancel = ["127.0.0.1:5001", 7, 10, protocol.CANCEL, "RW", 5002, "-", 1]
+        with patch.object(peer_node.message_handler, "send_message") as send:
+            peer_node.message_handler.process_parts(search, None)
+            send.reset_mock()
+            peer_node.message_handler.process_parts(cancel, None)
+        message, neighbor = send.call_args.args
+        self.assertEqual((message[3], neighbor), (protocol.CANCEL, "127.0.0.1:5003"))
+
+    def test_flood_cancel_reaches_every_node(self):
+        network = SimulatedNetwork(grid_graph(3, 3), seed=1, cancel_searches=True)
+        endpoints = sorted(network.nodes)
+        record = network.search(endpoints[0], [network.keys[endpoints[4]], "ausente"], "FL", first=1)
+        msg_id = (endpoints[0], record.seq_no)
+        self.assertTrue(all(msg_id in node.cancelled_searches for node in network.nodes.values()))
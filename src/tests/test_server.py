@@ -0,0 +1,39 @@
+import socket
+import unittest
+from peer_node import PeerNode
+
+
+class TestPeerServer(unittest.TestCase):
+    def setUp(self):
+        self.peer_node = PeerNode("127.0.0.1", 0)
+        self.peer_node.start_server()
+        self.endpoint = ("127.0.0.1", self.peer_node.server.port)
+
+    def tearDown(self):
+        self.peer_node.server.close()
+
+    def test_short_message_does_not_drop_the_connection(self):
+        with socket.create_connection(self.endpoint, timeout=2) as sock:
+            with self.assertLogs("p2p", "WARNING"):
+                sock.sendall(b"127.0.0.1:9001 0 1\n127.0.0.1:9001 1 1 HELLO\n")
+                self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+        self.assertIn("127.0.0.1:9001", self.peer_node.neighbors)
+
+    def test_unknown_mode_does_not_drop_the_connection(self):
+        with socket.create_connection(self.endpoint, timeout=2) as sock:
+            with self.assertLogs("p2p", "WARNING"):
+                sock.sendall(b"127.0.0.1:9001 0 1 CANCEL XX 1 k 0\n127.0.0.1:9001 1 1 HELLO\n")
+                self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+
+    def test_invalid_utf8_closes_only_that_connection(self):
+        with socket.create_connection(self.endpoint, timeout=2) as sock:
+            with self.assertLogs("p2p", "WARNING"):
+                sock.sendall(b"\xff\xfe 0 1 HELLO\n")
+                self.assertEqual(sock.recv(1024), b"")
+        with socket.create_connection(self.endpoint, timeout=2) as sock:
+            sock.sendall(b"127.0.0.1:9001 0 1 HELLO\n")
+            self.assertEqual(sock.recv(1024), b"HELLO_OK\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
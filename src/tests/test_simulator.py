@@ -0,0 +1,124 @@
+import random
+import unittest
+from simulator import (
+    SimulatedNetwork,
+    grid_graph,
+    list_topologies,
+    load_topology,
+    random_graph,
+    scale_free_graph,
+)
+
+
+def connected(graph):
+    start = next(iter(graph))
+    seen = {start}
+    pending = [start]
+    while pending:
+        for neighbor in graph[pending.pop()]:
+            if neighbor not in seen:
+                seen.add(neighbor)
+                pending.append(neighbor)
+    return len(seen) == len(graph)
+
+
+class TestGraphs(unittest.TestCase):
+    def test_infra_topologies(self):
+        self.assertIn("topologia_grid3x3", list_topologies())
+        graph = load_topology("topologia_grid3x3")
+        self.assertEqual(sorted(graph[5]), [2, 4, 6, 8])
+        self.assertEqual(sorted(graph[1]), [2, 4])
+
+    def test_generated_graphs_are_connected(self):
+        rng = random.Random(3)
+        for graph in (
+            random_graph(200, 4, rng),
+            scale_free_graph(200, 2, rng),
+            grid_graph(10, 20),
+        ):
+            self.assertEqual(len(graph), 200)
+            self.assertTrue(connected(graph))
+
+
+class TestSimulatedNetwork(unittest.TestCase):
+    def test_flooding_finds_every_key(self):
+        network = SimulatedNetwork(grid_graph(5, 5), seed=1)
+        result = network.run("FL", 20)
+        self.assertEqual(result["success_rate"], 1.0)
+        self.assertGreater(result["duplicates"], 0)
+        self.assertLessEqual(result["max_hops"], 8)
+
+    def test_expanding_ring_stops_at_nearby_key(self):
+        costs = {}
+        for mode in ("FL", "ER"):
+            network = SimulatedNetwork(grid_graph(10, 10), seed=1)
+            origin, holder = sorted(network.nodes)[:2]
+            record = network.search(origin, network.keys[holder], mode)
+            self.assertEqual(record.results[0]["hops"], 1)
+            costs[mode] = network.counters["sent"]
+        self.assertEqual(record.rings, [2])
+        self.assertLess(costs["ER"] * 5, costs["FL"])
+
+    def test_expanding_ring_grows_ttl_until_found(self):
+        network = SimulatedNetwork(grid_graph(1, 12), seed=1)
+        endpoints = sorted(network.nodes)
+        record = network.search(endpoints[0], network.keys[endpoints[-1]], "ER")
+        self.assertEqual(record.rings, [2, 4, 8, 16])
+        self.assertEqual(record.results[0]["hops"], 11)
+        self.assertEqual(record.status(), "done")
+
+    def test_expanding_ring_grows_without_growth_factor(self):
+        network = SimulatedNetwork(grid_graph(1, 6), seed=1)
+        for node in network.nodes.values():
+            node.ring_growth = 1
+        endpoints = sorted(network.nodes)
+        record = network.search(endpoints[0], "ausente", "ER", ttl=5)
+        self.assertEqual(record.rings, [2, 3, 4, 5])
+
+    def test_walkers_stop_after_hit(self):
+        network = SimulatedNetwork(grid_graph(6, 6), seed=2, walkers=4, walk_check_interval=2)
+        endpoints = sorted(network.nodes)
+        origin = network.nodes[endpoints[0]]
+        record = network.search(endpoints[0], network.keys[endpoints[-1]], "KW")
+        self.assertEqual(record.status(), "done")
+        self.assertEqual(len(record.walkers), 4)
+        walkers = list(record.walkers.values())
+        self.assertEqual(walkers[record.results[0]["walker"]]["status"], "hit")
+        # Todos os outros caminhantes pararam na consulta seguinte a origem
+        self.assertTrue(all(walker["status"] != "walking" for walker in walkers))
+        stats = origin.stats.walker_snapshot()
+        self.assertEqual(stats["launched"], 4)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["stopped"], 3)
+        self.assertEqual(stats["checks"], stats["continued"] + stats["stopped"])
+
+    def test_walker_with_ttl_one_stops(self):
+        network = SimulatedNetwork(grid_graph(3, 3), seed=1, walkers=2)
+        endpoints = sorted(network.nodes)
+        record = network.search(endpoints[0], "ausente", "KW", ttl=1)
+        self.assertEqual(record.results, [])
+        self.assertEqual(network.counters["sent"], 2)
+
+    def test_resumed_walker_does_not_turn_back(self):
+        # Em uma linha, um caminhante que nunca volta pelo salto anterior
+        # chega a ponta em linha reta, mesmo consultando a origem a cada salto
+        for seed in range(5):
+            random.seed(seed)
+            network = SimulatedNetwork(grid_graph(1, 6), seed=seed, walkers=1, walk_check_interval=1)
+            endpoints = sorted(network.nodes, key=lambda endpoint: int(endpoint.split(":")[1]))
+            record = network.search(endpoints[0], network.keys[endpoints[-1]], "KW")
+            self.assertEqual(record.results[0]["hops"], 5)
+
+    def test_same_seed_same_results(self):
+        graph = load_topology("topologia_tres_triangulos")
+        results = []
+        for _ in range(2):
+            network = SimulatedNetwork(graph, seed=5)
+            result = network.run("RW", 20)
+            del result["wall_time"]
+            results.append(result)
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
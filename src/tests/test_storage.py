@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+import protocol
+from peer_node import PeerNode
+from search_strategy import FloodingSearchStrategy
+from storage import DictStore, SqliteStore, open_store, parse_key_value, parse_prefix_query
+
+LINES = ["fruta2 banana\n", "\n", "fruta1 maca verde\n", "cor1 azul\n", "fruta3 uva\n"]
+
+
+class StoreTests:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.key_file = os.path.join(self.directory.name, "chaves.txt")
+        with open(self.key_file, "w") as f:
+            f.writelines(LINES)
+        self.store = self.make_store()
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_bulk_load_and_get(self):
+        self.assertEqual(self.store.load_file(self.key_file), 4)
+        self.assertEqual(self.store.get("fruta1"), "maca verde")
+        self.assertIsNone(self.store.get("fruta9"))
+        self.assertIn("cor1", self.store)
+        self.assertEqual(sorted(self.store), ["cor1", "fruta1", "fruta2", "fruta3"])
+
+    def test_prefix_and_range_are_sorted_and_bounded(self):
+        self.store.load_file(self.key_file)
+        self.store["fruta0"] = "kiwi"
+        self.assertEqual(
+            [key for key, _ in self.store.prefix("fruta")],
+            ["fruta0", "fruta1", "fruta2", "fruta3"],
+        )
+        self.assertEqual(self.store.prefix("fruta", limit=2), [("fruta0", "kiwi"), ("fruta1", "maca verde")])
+        self.assertEqual(self.store.range("fruta1", "fruta3"), [("fruta1", "maca verde"), ("fruta2", "banana")])
+        self.assertEqual(self.store.prefix("xyz"), [])
+
+
+class TestDictStore(StoreTests, unittest.TestCase):
+    def make_store(self):
+        return DictStore()
+
+
+class TestSqliteStore(StoreTests, unittest.TestCase):
+    def make_store(self):
+        return SqliteStore(os.path.join(self.directory.name, "chaves.db"), batch_size=2)
+
+    def test_unchanged_file_is_not_reimported(self):
+        self.store.load_file(self.key_file)
+        self.store["fruta1"] = "alterada"
+        self.assertEqual(self.store.load_file(self.key_file), 4)
+        self.assertEqual(self.store.get("fruta1"), "alterada")
+
+    def test_persists_between_opens(self):
+        self.store.load_file(self.key_file)
+        self.store.close()
+        self.assertEqual(self.store.get("fruta3"), "uva")
+
+
+class TestStorageIntegration(unittest.TestCase):
+    def test_open_store(self):
+        self.assertIsInstance(open_store("dict"), DictStore)
+        self.assertIsInstance(open_store("sqlite::memory:"), SqliteStore)
+        with self.assertRaises(ValueError):
+            open_store("lmdb:/tmp/x")
+
+    def test_parse_key_value_keeps_spaces_in_value(self):
+        self.assertEqual(parse_key_value("chave valor com  espacos\n"), ("chave", "valor com  espacos"))
+        with self.assertRaises(ValueError):
+            parse_key_value("sozinha")
+
+    def test_wildcard_only_at_the_end(self):
+        self.assertEqual(parse_prefix_query("fruta*"), ("fruta", None))
+        self.assertEqual(parse_prefix_query("fruta*>fruta12"), ("fruta", "fruta12"))
+        self.assertIsNone(parse_prefix_query("a*b"))
+        self.assertIsNone(parse_prefix_query("fruta"))
+
+    def test_key_with_wildcard_inside_is_found(self):
+        peer_node = PeerNode("127.0.0.1", 8000)
+        peer_node.add_key_value("a*b literal")
+        peer_node.add_key_value("ab outra")
+        record = peer_node.start_search(FloodingSearchStrategy(peer_node), ["a*b"])
+        results = [(result["key"], result["value"]) for result in record.results]
+        self.assertEqual(results, [("a*b", "literal")])
+
+    def test_text_val_round_trip_with_spaces(self):
+        parts = ["127.0.0.1:5009", "3", "100", "VAL", "FL", "chave", "valor com 100% espacos", "2"]
+        decoded = protocol.FrameDecoder().feed(protocol.encode_text(parts))
+        self.assertEqual(decoded, [parts])
+
+    def test_peer_node_uses_configured_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            key_file = os.path.join(directory, "chaves.txt")
+            with open(key_file, "w") as f:
+                f.writelines(LINES)
+            node = PeerNode(
+                "127.0.0.1",
+                5000,
+                key_value_file=key_file,
+                start_server=False,
+                store=f"sqlite:{os.path.join(directory, 'no.db')}",
+                key_digests=True,
+            )
+            self.assertIsInstance(node.key_value_store, SqliteStore)
+            self.assertEqual(node.key_value_store.get("fruta1"), "maca verde")
+            self.assertIn("fruta3", node.key_digests.local)
+            node.key_value_store.close()
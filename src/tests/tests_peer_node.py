@@ -13,7 +13,9 @@ class TestPeerNode(unittest.TestCase):
         self.peer_node.add_neighbor(neighbor)
 
         self.assertIn(neighbor, self.peer_node.neighbors)
-        mock_send_message.assert_called_with("127.0.0.1:8000 0 1 HELLO\n", neighbor)
+        mock_send_message.assert_called_with(
+            "127.0.0.1:8000 0 1 HELLO BIN1\n", neighbor
+        )
 
     @patch("server.PeerServer.close")
     @patch("message.MessageHandler.send_message")